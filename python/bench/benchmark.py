@@ -0,0 +1,312 @@
+"""A benchmark suite for the video player.
+
+Generates a synthetic catalogue for every scale, measures how long it
+takes to load and how much memory it holds, then times each VideoPlayer
+command against it. Results are saved as JSON and can be compared with a
+previous run:
+
+    python3 -m bench.benchmark --scales 1e3,1e5 --output new.json \\
+        --baseline old.json
+"""
+
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+from .catalogue_generator import write_catalogue
+from pathlib import Path
+from unittest import mock
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def _video_id(i, scale):
+    return f"video_{i % scale}_id"
+
+
+def _with_playlist(size):
+    """Returns a setup creating playlist 'bench' holding size videos."""
+    def setup(player, scale):
+        player.create_playlist("bench")
+        player.bulk_add_to_playlist(
+            "bench", [_video_id(i, scale) for i in range(min(size, scale))])
+    return setup
+
+
+def _play_first(player, scale):
+    player.play_video(_video_id(0, scale))
+
+
+def _with_queue(size):
+    """Returns a setup playing playlist 'bench' holding size videos."""
+    create = _with_playlist(size)
+
+    def setup(player, scale):
+        create(player, scale)
+        player.play_playlist("bench")
+    return setup
+
+
+def _with_playlists(size):
+    """Returns a setup creating overlapping playlists 'bench' and 'other'."""
+    create = _with_playlist(size)
+
+    def setup(player, scale):
+        create(player, scale)
+        player.create_playlist("other")
+        player.bulk_add_to_playlist(
+            "other", [_video_id(i, scale)
+                      for i in range(size // 2, min(size * 3 // 2, scale))])
+    return setup
+
+
+def _with_snapshot(player, scale):
+    _with_playlist(100)(player, scale)
+    player.snapshot_playlist("bench")
+
+
+def _remove_and_add(player, i, scale):
+    video_id = _video_id(i % 100, scale)
+    player.remove_from_playlist("bench", video_id)
+    player.add_to_playlist("bench", video_id)
+
+
+def _bulk_flag_and_allow(player, i, scale):
+    video_ids = [_video_id(i * 10 + j, scale) for j in range(10)]
+    player.bulk_flag_videos([(video_id, "bench") for video_id in video_ids])
+    for video_id in video_ids:
+        player.allow_video(video_id)
+
+
+# (name, verbs, setup(player, scale), operation(player, i, scale)); verbs
+# are the commands the operation runs, and an operation must leave the
+# player able to run it again.
+BENCHMARKS = (
+    ("number_of_videos", ("NUMBER_OF_VIDEOS",), None,
+     lambda player, i, scale: player.number_of_videos()),
+    ("show_all_videos", ("SHOW_ALL_VIDEOS",), None,
+     lambda player, i, scale: player.show_all_videos()),
+    ("play_video", ("PLAY",), None,
+     lambda player, i, scale: player.play_video(_video_id(i, scale))),
+    ("play_random_video", ("PLAY_RANDOM",), None,
+     lambda player, i, scale: player.play_random_video()),
+    ("play_random_tag", ("PLAY_RANDOM",), None,
+     lambda player, i, scale: player.play_random_video("#tag1")),
+    ("play_random_popular", ("PLAY_RANDOM",), None,
+     lambda player, i, scale: player.play_random_video(popular=True)),
+    ("play_random_playlist", ("PLAY_RANDOM",), _with_playlist(100),
+     lambda player, i, scale: player.play_random_video("bench")),
+    ("play_similar", ("PLAY_SIMILAR",), None,
+     lambda player, i, scale: player.play_similar_video(_video_id(i, scale))),
+    ("pause_continue_video", ("PAUSE", "CONTINUE"), _play_first,
+     lambda player, i, scale: (player.pause_video(), player.continue_video())),
+    ("show_playing", ("SHOW_PLAYING",), _play_first,
+     lambda player, i, scale: player.show_playing()),
+    ("play_stop_video", ("PLAY", "STOP"), None,
+     lambda player, i, scale: (player.play_video(_video_id(i, scale)),
+                               player.stop_video())),
+    ("play_playlist", ("PLAY_PLAYLIST",), _with_playlist(100),
+     lambda player, i, scale: player.play_playlist("bench")),
+    ("next_prev_video", ("NEXT", "PREV"), _with_queue(100),
+     lambda player, i, scale: (player.play_next_video(),
+                               player.play_previous_video())),
+    ("shuffle_queue", ("SHUFFLE",), _with_queue(100),
+     lambda player, i, scale: player.shuffle_queue()),
+    ("show_queue", ("SHOW_QUEUE",), _with_queue(100),
+     lambda player, i, scale: player.show_queue()),
+    ("create_delete_playlist", ("CREATE_PLAYLIST", "DELETE_PLAYLIST"), None,
+     lambda player, i, scale: (player.create_playlist(f"p{i}"),
+                               player.delete_playlist(f"p{i}"))),
+    ("add_remove_playlist", ("ADD_TO_PLAYLIST", "REMOVE_FROM_PLAYLIST"),
+     _with_playlist(100), _remove_and_add),
+    ("bulk_add_clear_playlist", ("BULK_ADD_TO_PLAYLIST", "CLEAR_PLAYLIST"),
+     _with_playlist(0),
+     lambda player, i, scale: (
+         player.bulk_add_to_playlist(
+             "bench", [_video_id(j, scale) for j in range(100)]),
+         player.clear_playlist("bench"))),
+    ("move_in_playlist", ("MOVE_IN_PLAYLIST",), _with_playlist(100),
+     lambda player, i, scale: player.move_in_playlist(
+         "bench", _video_id(i % min(100, scale), scale),
+         i * 7 % min(100, scale) + 1)),
+    ("show_playlist", ("SHOW_PLAYLIST",), _with_playlist(100),
+     lambda player, i, scale: player.show_playlist("bench")),
+    ("show_all_playlists", ("SHOW_ALL_PLAYLISTS",), _with_playlist(1),
+     lambda player, i, scale: player.show_all_playlists()),
+    ("show_video_playlists", ("SHOW_VIDEO_PLAYLISTS",), _with_playlists(100),
+     lambda player, i, scale: player.show_video_playlists(
+         _video_id(i % 100, scale))),
+    ("clear_playlist", ("CLEAR_PLAYLIST",), _with_playlist(100),
+     lambda player, i, scale: player.clear_playlist("bench")),
+    ("duplicate_playlist", ("DUPLICATE_PLAYLIST", "DELETE_PLAYLIST"),
+     _with_playlist(1000),
+     lambda player, i, scale: (player.duplicate_playlist("bench", f"p{i}"),
+                               player.delete_playlist(f"p{i}"))),
+    ("playlist_union", ("PLAYLIST_UNION",), _with_playlists(100),
+     lambda player, i, scale: player.combine_playlists(
+         "union", "target", ["bench", "other"])),
+    ("playlist_intersection", ("PLAYLIST_INTERSECTION",), _with_playlists(100),
+     lambda player, i, scale: player.combine_playlists(
+         "intersection", "target", ["bench", "other"])),
+    ("playlist_difference", ("PLAYLIST_DIFFERENCE",), _with_playlists(100),
+     lambda player, i, scale: player.combine_playlists(
+         "difference", "target", ["bench", "other"])),
+    ("snapshot_playlist", ("SNAPSHOT_PLAYLIST",), _with_playlist(100),
+     lambda player, i, scale: player.snapshot_playlist("bench")),
+    ("restore_playlist", ("RESTORE_PLAYLIST",), _with_snapshot,
+     lambda player, i, scale: player.restore_playlist("bench", 1)),
+    ("search_videos", ("SEARCH_VIDEOS",), None,
+     lambda player, i, scale: player.search_videos("cat")),
+    ("search_videos_tag", ("SEARCH_VIDEOS_WITH_TAG",), None,
+     lambda player, i, scale: player.search_videos_tag("#tag1")),
+    ("suggest", ("SUGGEST",), None,
+     lambda player, i, scale: player.show_suggestions("Funny")),
+    ("most_played", ("MOST_PLAYED",), None,
+     lambda player, i, scale: player.show_most_played()),
+    ("trending", ("TRENDING",), None,
+     lambda player, i, scale: player.show_trending()),
+    ("recommend", ("RECOMMEND",), None,
+     lambda player, i, scale: player.show_recommendations(_video_id(i, scale))),
+    ("flag_allow_video", ("FLAG_VIDEO", "ALLOW_VIDEO"), None,
+     lambda player, i, scale: (player.flag_video(_video_id(i, scale), "bench"),
+                               player.allow_video(_video_id(i, scale)))),
+    ("bulk_flag_allow_video", ("BULK_FLAG_VIDEO", "ALLOW_VIDEO"), None,
+     _bulk_flag_and_allow),
+    ("flag_allow_matching", ("FLAG_MATCHING", "ALLOW_MATCHING"), None,
+     lambda player, i, scale: (player.flag_matching("tag", "#tag10", "bench"),
+                               player.allow_matching("tag", "#tag10"))),
+    ("reload_library", ("RELOAD_LIBRARY",), None,
+     lambda player, i, scale: player.reload_library()),
+)
+
+# Commands of the parser and the prompt rather than the player.
+UNBENCHMARKED_VERBS = ("STATS", "PROFILE", "PROFILE_NEXT", "HELP", "EXIT")
+
+
+def measure_load(catalogue):
+    """Returns (seconds, peak traced bytes) for loading a catalogue."""
+    gc.collect()
+    start = time.perf_counter()
+    VideoLibrary(catalogue)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    library = VideoLibrary(catalogue)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del library
+    return seconds, peak
+
+
+def measure_command(library, scale, setup, operation, min_time, max_iterations):
+    """Times an operation on a fresh player, returning mean microseconds."""
+    player = VideoPlayer(library)
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull), \
+            mock.patch("builtins.input", lambda *args: "no"):
+        if setup:
+            setup(player, scale)
+        iterations = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while not iterations or (iterations < max_iterations
+                                 and elapsed < min_time):
+            operation(player, iterations, scale)
+            iterations += 1
+            elapsed = time.perf_counter() - start
+    return {"mean_us": elapsed / iterations * 1e6, "iterations": iterations}
+
+
+def run_benchmarks(scales, min_time=0.2, max_iterations=10000, work_dir=None):
+    """Runs the suite at every scale and returns the results document."""
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for scale in scales:
+            catalogue = write_catalogue(Path(tmp) / f"videos_{scale}.txt", scale)
+            load_seconds, peak = measure_load(catalogue)
+            library = VideoLibrary(catalogue)
+            commands = {}
+            for name, _, setup, operation in BENCHMARKS:
+                commands[name] = measure_command(
+                    library, scale, setup, operation, min_time, max_iterations)
+                print(f"{scale:>10} {name:<24} "
+                      f"{commands[name]['mean_us']:>12.2f} us", file=sys.stderr)
+            results["scales"][str(scale)] = {
+                "load_seconds": load_seconds,
+                "load_peak_bytes": peak,
+                "commands": commands,
+            }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Lists the measurements that got worse than the baseline.
+
+    Args:
+        results: A document returned by run_benchmarks.
+        baseline: An earlier document to compare against.
+        threshold: Allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        One human readable line per regression.
+    """
+    regressions = []
+
+    def check(label, new, old):
+        if old and new > old * (1 + threshold):
+            regressions.append(
+                f"{label}: {old:.6g} -> {new:.6g} ({new / old - 1:+.0%})")
+
+    for scale, current in results["scales"].items():
+        previous = baseline["scales"].get(scale)
+        if previous is None:
+            continue
+        check(f"{scale} load_seconds",
+              current["load_seconds"], previous["load_seconds"])
+        check(f"{scale} load_peak_bytes",
+              current["load_peak_bytes"], previous["load_peak_bytes"])
+        for name, measurement in current["commands"].items():
+            if name in previous["commands"]:
+                check(f"{scale} {name} mean_us", measurement["mean_us"],
+                      previous["commands"][name]["mean_us"])
+    return regressions
+
+
+def _scales(value):
+    return [int(float(scale)) for scale in value.split(",")]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--scales", type=_scales, default=[1000, 10000, 100000],
+                            help="Comma separated catalogue sizes, e.g. 1e3,1e7.")
+    arg_parser.add_argument("--min-time", type=float, default=0.2,
+                            help="Seconds to spend timing each command.")
+    arg_parser.add_argument("--max-iterations", type=int, default=10000,
+                            help="Upper bound on the runs of each command.")
+    arg_parser.add_argument("--output", default="benchmark_results.json",
+                            help="Where to save the results.")
+    arg_parser.add_argument("--baseline",
+                            help="Earlier results to flag regressions against.")
+    arg_parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Allowed relative slowdown before flagging.")
+    args = arg_parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.min_time, args.max_iterations)
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,94 @@
+"""A synthetic video catalogue generator.
+
+Writes catalogues in the videos.txt format, optionally compressed when
+the output name ends in .gz, .xz or .bz2:
+
+    python3 -m bench.catalogue_generator 100000 /tmp/videos.txt.gz
+"""
+
+from pathlib import Path
+import argparse
+import bz2
+import gzip
+import itertools
+import lzma
+import random
+
+
+_WORDS = (
+    "amazing another best cat cats career compilation cooking day dog dogs "
+    "epic funny google guide how life live music nothing review science "
+    "short story summer top travel tutorial video vlog week world"
+).split()
+
+_OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+
+
+def generate_videos(count, title_words=(2, 6), num_tags=1000,
+                    tags_per_video=(0, 4), tag_skew=1.1, seed=0):
+    """Yields (title, video_id, tags) tuples for a synthetic catalogue.
+
+    Args:
+        count: Number of videos.
+        title_words: Inclusive range of words per title.
+        num_tags: Size of the tag vocabulary.
+        tags_per_video: Inclusive range of tags per video.
+        tag_skew: Zipf exponent of the tag popularity; 0 picks tags
+            uniformly.
+        seed: Seed making the catalogue reproducible.
+    """
+    rng = random.Random(seed)
+    tags = [f"#tag{i}" for i in range(num_tags)]
+    cumulative = list(itertools.accumulate(
+        1 / (rank ** tag_skew) for rank in range(1, num_tags + 1)))
+    for i in range(count):
+        title = " ".join(rng.choice(_WORDS)
+                         for _ in range(rng.randint(*title_words)))
+        num_video_tags = min(rng.randint(*tags_per_video), num_tags)
+        video_tags = set()
+        while len(video_tags) < num_video_tags:
+            video_tags.update(rng.choices(
+                tags, cum_weights=cumulative,
+                k=num_video_tags - len(video_tags)))
+        yield title.capitalize(), f"video_{i}_id", sorted(video_tags)
+
+
+def write_catalogue(path, count, **options):
+    """Writes a synthetic catalogue and returns its path.
+
+    Args:
+        path: Output file; .gz, .xz and .bz2 names are compressed.
+        count: Number of videos.
+        options: Passed on to generate_videos.
+    """
+    path = Path(path)
+    opener = _OPENERS.get(path.suffix, open)
+    with opener(path, "wt") as catalogue:
+        for title, video_id, tags in generate_videos(count, **options):
+            catalogue.write(f"{title} | {video_id} | {' , '.join(tags)}\n")
+    return path
+
+
+def _range(value):
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("count", type=lambda value: int(float(value)),
+                            help="Number of videos, e.g. 1e6.")
+    arg_parser.add_argument("output", help="Catalogue file to write.")
+    arg_parser.add_argument("--title-words", type=_range, default=(2, 6),
+                            help="Words per title, as N or MIN-MAX.")
+    arg_parser.add_argument("--tags", type=int, default=1000,
+                            help="Size of the tag vocabulary.")
+    arg_parser.add_argument("--tags-per-video", type=_range, default=(0, 4),
+                            help="Tags per video, as N or MIN-MAX.")
+    arg_parser.add_argument("--tag-skew", type=float, default=1.1,
+                            help="Zipf exponent of tag popularity.")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    write_catalogue(args.output, args.count, title_words=args.title_words,
+                    num_tags=args.tags, tags_per_video=args.tags_per_video,
+                    tag_skew=args.tag_skew, seed=args.seed)
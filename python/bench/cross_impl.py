@@ -0,0 +1,238 @@
+"""Runs the python, cpp and java players on the same workload.
+
+Every implementation reads a generated catalogue and the same commands
+through its stdin REPL. Their answers are compared command by command,
+and their startup time, throughput and peak memory are reported:
+
+    cmake -S ../cpp -B ../cpp/build && cmake --build ../cpp/build -t youtube
+    (cd ../java && mvn -q compile)
+    python3 -m bench.cross_impl --videos 10000 --commands 5000
+
+The cpp player loads ./src/videos.txt and the java player the videos.txt
+resource, so each one is started from, or with a classpath led by, a
+scratch directory holding the generated catalogue under that name.
+"""
+
+from src.command_trace import read_trace
+from .catalogue_generator import write_catalogue
+from pathlib import Path
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROMPT = "YT> "
+
+_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CPP_BINARY = _ROOT / "cpp" / "build" / "youtube"
+DEFAULT_JAVA_CLASSES = _ROOT / "java" / "target" / "classes"
+
+
+def generate_commands(num_videos, count, seed=0):
+    """Returns a reproducible mix of commands every implementation supports.
+
+    PLAY_RANDOM and the interactive searches are left out: the former
+    cannot agree between implementations and the latter read answers
+    from stdin in between commands.
+    """
+    rng = random.Random(seed)
+    playlists = ["my_playlist", "Another_List", "empty"]
+
+    def video_id():
+        if rng.random() < 0.05:
+            return "missing_video_id"
+        return f"video_{rng.randrange(num_videos)}_id"
+
+    makers = (
+        (1, lambda: "NUMBER_OF_VIDEOS"),
+        (8, lambda: f"PLAY {video_id()}"),
+        (3, lambda: "STOP"),
+        (3, lambda: "PAUSE"),
+        (3, lambda: "CONTINUE"),
+        (4, lambda: "SHOW_PLAYING"),
+        (2, lambda: f"CREATE_PLAYLIST {rng.choice(playlists)}"),
+        (8, lambda: f"ADD_TO_PLAYLIST {rng.choice(playlists)} {video_id()}"),
+        (3, lambda: f"REMOVE_FROM_PLAYLIST {rng.choice(playlists)} {video_id()}"),
+        (2, lambda: f"SHOW_PLAYLIST {rng.choice(playlists)}"),
+        (1, lambda: "SHOW_ALL_PLAYLISTS"),
+        (1, lambda: f"CLEAR_PLAYLIST {rng.choice(playlists)}"),
+        (1, lambda: f"DELETE_PLAYLIST {rng.choice(playlists)}"),
+        (2, lambda: f"FLAG_VIDEO {video_id()} reason"),
+        (2, lambda: f"ALLOW_VIDEO {video_id()}"),
+    )
+    weights = [weight for weight, _ in makers]
+    return [rng.choices(makers, weights)[0][1]() for _ in range(count)]
+
+
+def implementations(catalogue, work_dir, cpp_binary=DEFAULT_CPP_BINARY,
+                    java_classes=DEFAULT_JAVA_CLASSES):
+    """Returns name -> (argv, cwd) for the implementations that are built.
+
+    Args:
+        catalogue: The plain text catalogue every player should load.
+        work_dir: A scratch directory to stage the catalogue in.
+        cpp_binary: The compiled cpp REPL.
+        java_classes: The compiled java classes directory.
+    """
+    python_dir = Path(__file__).resolve().parents[1]
+    found = {
+        "python": ([sys.executable, "-m", "src.run", "--no-stats",
+                    "--catalogue", str(catalogue)], python_dir),
+    }
+    staged = Path(work_dir) / "stage"
+    (staged / "src").mkdir(parents=True, exist_ok=True)
+    (staged / "src" / "videos.txt").write_bytes(Path(catalogue).read_bytes())
+    (staged / "videos.txt").write_bytes(Path(catalogue).read_bytes())
+    if Path(cpp_binary).is_file():
+        found["cpp"] = ([str(Path(cpp_binary).resolve())], staged)
+    if Path(java_classes).is_dir():
+        classpath = os.pathsep.join([str(staged), str(java_classes)])
+        found["java"] = (["java", "-cp", classpath, "com.google.Run"], staged)
+    return found
+
+
+def run_repl(argv, cwd, commands):
+    """Feeds commands to a REPL followed by EXIT.
+
+    Returns:
+        (stdout, wall clock seconds, peak resident set size in bytes).
+    """
+    with tempfile.TemporaryFile("w+") as stdin, \
+            tempfile.TemporaryFile("w+") as stdout:
+        stdin.write("".join(command + "\n" for command in commands))
+        stdin.write("EXIT\n")
+        stdin.seek(0)
+        start = time.perf_counter()
+        process = subprocess.Popen(argv, cwd=cwd, stdin=stdin, stdout=stdout,
+                                   stderr=subprocess.DEVNULL)
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout.seek(0)
+        output = stdout.read()
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return output, seconds, usage.ru_maxrss * scale
+
+
+def split_outputs(stdout, num_commands):
+    """Cuts a REPL transcript into the output of each command.
+
+    The banner before the first prompt and the goodbye message after EXIT
+    are dropped, and trailing whitespace is ignored.
+    """
+    chunks = stdout.split(PROMPT)[1:num_commands + 1]
+    chunks += [""] * (num_commands - len(chunks))
+    return ["\n".join(line.rstrip() for line in chunk.strip().splitlines())
+            for chunk in chunks]
+
+
+def compare_outputs(commands, outputs):
+    """Lists the commands the implementations answered differently.
+
+    Args:
+        commands: The command lines that were run.
+        outputs: name -> per-command outputs, as returned by split_outputs.
+
+    Returns:
+        (command index, command, {name: output}) for every disagreement.
+    """
+    disagreements = []
+    names = sorted(outputs)
+    for i, command in enumerate(commands):
+        answers = {name: outputs[name][i] for name in names}
+        if len(set(answers.values())) > 1:
+            disagreements.append((i, command, answers))
+    return disagreements
+
+
+def run_harness(commands, catalogue, work_dir, repeats=3, **locations):
+    """Runs every built implementation and returns the results document.
+
+    Args:
+        commands: The command lines to run.
+        catalogue: The plain text catalogue to load.
+        work_dir: A scratch directory.
+        repeats: Runs of each measurement; the median is reported.
+        locations: cpp_binary and java_classes, see implementations.
+    """
+    found = implementations(catalogue, work_dir, **locations)
+    results = {"commands": len(commands), "implementations": {}}
+    outputs = {}
+    for name, (argv, cwd) in found.items():
+        startups = [run_repl(argv, cwd, [])[1] for _ in range(repeats)]
+        runs = [run_repl(argv, cwd, commands) for _ in range(repeats)]
+        startup = statistics.median(startups)
+        seconds = statistics.median(seconds for _, seconds, _ in runs)
+        outputs[name] = split_outputs(runs[0][0], len(commands))
+        results["implementations"][name] = {
+            "startup_seconds": startup,
+            "run_seconds": seconds,
+            # None when the commands took less time than startup jitter.
+            "throughput": (len(commands) / (seconds - startup)
+                           if seconds > startup else None),
+            "peak_rss_bytes": max(rss for _, _, rss in runs),
+        }
+        print(f"{name:<8} startup {startup:8.3f}s  run {seconds:8.3f}s",
+              file=sys.stderr)
+    disagreements = compare_outputs(commands, outputs)
+    results["disagreements"] = len(disagreements)
+    results["examples"] = [
+        {"index": i, "command": command, "outputs": answers}
+        for i, command, answers in disagreements[:10]]
+    return results
+
+
+def print_report(results, file=None):
+    """Prints a results document as a table."""
+    print(f"{'IMPL':<8}{'STARTUP_S':>12}{'CMDS_PER_S':>14}{'PEAK_RSS_MB':>14}",
+          file=file)
+    for name, row in results["implementations"].items():
+        throughput = row["throughput"]
+        throughput = "n/a" if throughput is None else f"{throughput:.1f}"
+        print(f"{name:<8}{row['startup_seconds']:>12.3f}{throughput:>14}"
+              f"{row['peak_rss_bytes'] / 2 ** 20:>14.1f}", file=file)
+    print(f"{results['disagreements']} of {results['commands']} commands "
+          f"answered differently", file=file)
+    for example in results["examples"]:
+        print(f"#{example['index']} {example['command']}", file=file)
+        for name, output in example["outputs"].items():
+            print(f"  {name}: {output!r}", file=file)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--videos", type=lambda value: int(float(value)),
+                            default=10000, help="Size of the catalogue.")
+    arg_parser.add_argument("--commands", type=int, default=5000,
+                            help="Number of generated commands.")
+    arg_parser.add_argument("--trace",
+                            help="Replay a trace recorded by src.run instead.")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeats", type=int, default=3,
+                            help="Runs of each measurement.")
+    arg_parser.add_argument("--cpp-binary", default=DEFAULT_CPP_BINARY)
+    arg_parser.add_argument("--java-classes", default=DEFAULT_JAVA_CLASSES)
+    arg_parser.add_argument("--output", help="Also save the results as JSON.")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalogue = write_catalogue(Path(tmp) / "videos.txt", args.videos,
+                                    seed=args.seed)
+        if args.trace:
+            commands = [" ".join(words) for _, words in read_trace(args.trace)]
+        else:
+            commands = generate_commands(args.videos, args.commands, args.seed)
+        results = run_harness(commands, catalogue, tmp, args.repeats,
+                              cpp_binary=args.cpp_binary,
+                              java_classes=args.java_classes)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    sys.exit(1 if results["disagreements"] else 0)
@@ -0,0 +1,140 @@
+"""Replays a recorded command trace against the video player.
+
+Traces are recorded with `python3 -m src.run --record-trace trace.txt`.
+Commands are sent at their original pace, at a multiple of it, or as
+fast as possible, and the throughput and latency of every verb are
+reported:
+
+    python3 -m bench.replay trace.txt --speed 4
+    python3 -m bench.replay trace.txt --max --catalogue big.txt.gz
+"""
+
+from src.command_parser import CommandException, CommandParser
+from src.command_stats import CommandStats
+from src.command_trace import read_trace
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.video_library import DEFAULT_CATALOGUE, VideoLibrary
+from src.video_player import VideoPlayer
+from unittest import mock
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+
+
+def replay(trace, player, speed=1.0, clock=time.perf_counter, sleep=time.sleep):
+    """Executes the commands of a trace and measures them.
+
+    Output is discarded and search prompts are answered with "no", as
+    the answers typed during the recording are not part of the trace.
+
+    Args:
+        trace: (seconds, command words) pairs, as yielded by read_trace.
+        player: The VideoPlayer to run the commands against.
+        speed: Multiple of the recorded pace, None for as fast as possible.
+        clock: Returns the current time in seconds.
+        sleep: Waits a number of seconds.
+
+    Returns:
+        A results document, see summarize.
+    """
+    stats = CommandStats(sample_every=1)
+    parser = CommandParser(player, stats)
+    max_lag = 0.0
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull), \
+            mock.patch("builtins.input", lambda *args: "no"):
+        start = clock()
+        for timestamp, command in trace:
+            if speed:
+                delay = start + timestamp / speed - clock()
+                if delay > 0:
+                    sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            try:
+                parser.execute_command(command)
+            except CommandException:
+                pass
+        seconds = clock() - start
+    return summarize(stats, seconds, max_lag)
+
+
+def summarize(stats, seconds, max_lag=0.0):
+    """Builds the results document of a replay.
+
+    Args:
+        stats: The CommandStats the replayed commands were recorded in.
+        seconds: Wall clock duration of the replay.
+        max_lag: Longest a command was sent behind its scheduled time.
+
+    Returns:
+        A dict with the overall and per-verb throughput, in commands per
+        second, and per-verb latency percentiles in microseconds.
+    """
+    seconds = max(seconds, 1e-9)
+    verbs = {}
+    for verb in stats.verbs():
+        latency = stats.latency(verb)
+        verbs[verb] = {
+            "calls": stats.calls[verb],
+            "errors": stats.errors.get(verb, 0),
+            "throughput": stats.calls[verb] / seconds,
+            "p50_us": latency.percentile(50) / 1000,
+            "p99_us": latency.percentile(99) / 1000,
+            "p999_us": latency.percentile(99.9) / 1000,
+        }
+    commands = sum(stats.calls.values())
+    return {
+        "commands": commands,
+        "seconds": seconds,
+        "throughput": commands / seconds,
+        "max_lag_seconds": max_lag,
+        "verbs": verbs,
+    }
+
+
+def print_report(results, file=None):
+    """Prints a results document as a table."""
+    print(f"{results['commands']} commands in {results['seconds']:.3f}s, "
+          f"{results['throughput']:.1f} commands/s, "
+          f"max lag {results['max_lag_seconds'] * 1000:.1f}ms", file=file)
+    print(f"{'VERB':<24}{'CALLS':>8}{'ERRORS':>8}{'PER_SEC':>10}"
+          f"{'P50_US':>10}{'P99_US':>10}{'P999_US':>10}", file=file)
+    for verb, row in results["verbs"].items():
+        print(f"{verb:<24}{row['calls']:>8}{row['errors']:>8}"
+              f"{row['throughput']:>10.1f}{row['p50_us']:>10.1f}"
+              f"{row['p99_us']:>10.1f}{row['p999_us']:>10.1f}", file=file)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("trace", help="A trace recorded by src.run.")
+    arg_parser.add_argument("--catalogue", default=DEFAULT_CATALOGUE,
+                            help="Video catalogue to replay against.")
+    arg_parser.add_argument("--library", choices=("memory", "sqlite"),
+                            default="memory",
+                            help="Storage backend for the video catalogue.")
+    pace = arg_parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1.0,
+                      help="Multiple of the recorded pace, e.g. 10.")
+    pace.add_argument("--max", action="store_true",
+                      help="Send commands as fast as possible.")
+    arg_parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of the PLAY_RANDOM draws.")
+    arg_parser.add_argument("--output", help="Also save the results as JSON.")
+    args = arg_parser.parse_args()
+
+    if args.library == "sqlite":
+        video_library = SqliteVideoLibrary(catalogue_path=args.catalogue)
+    else:
+        video_library = VideoLibrary(args.catalogue)
+    player = VideoPlayer(video_library, rng=random.Random(args.seed))
+    results = replay(read_trace(args.trace), player,
+                     None if args.max else args.speed)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
@@ -0,0 +1,123 @@
+"""Measures the tag similarity index at catalogue scale.
+
+Builds the TagSimilarityIndex behind RECOMMEND and PLAY_SIMILAR straight
+from a synthetic catalogue, without loading a library around it, and
+reports how long the build takes, the memory the index holds and the
+latency of queries against it:
+
+    python3 -m bench.similarity --scales 1e6,5e6 --output similarity.json
+"""
+
+from src.tag_similarity import TagSimilarityIndex
+from src.video import Video
+from .catalogue_generator import generate_videos
+from pathlib import Path
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+
+def _videos(scale, seed):
+    # Streamed, so only the index itself grows with the scale.
+    return (Video(title, video_id, tags)
+            for title, video_id, tags in generate_videos(scale, seed=seed))
+
+
+def measure_build(scale, seed=0):
+    """Builds the index twice, the second time under tracemalloc.
+
+    The build time leaves out generating the catalogue, timed on a pass
+    of its own.
+
+    Returns:
+        (index, seconds, peak traced bytes, traced bytes held by the
+        index once built).
+    """
+    start = time.perf_counter()
+    for _ in _videos(scale, seed):
+        pass
+    generating = time.perf_counter() - start
+    gc.collect()
+    start = time.perf_counter()
+    index = TagSimilarityIndex(_videos(scale, seed))
+    seconds = time.perf_counter() - start - generating
+    del index
+    gc.collect()
+    tracemalloc.start()
+    index = TagSimilarityIndex(_videos(scale, seed))
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, seconds, peak, held
+
+
+def measure_queries(index, scale, queries, k=10, seed=0):
+    """Times similar() for random videos, returning latencies in ms."""
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(queries):
+        video_id = f"video_{rng.randrange(scale)}_id"
+        start = time.perf_counter()
+        index.similar(video_id, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    def percentile(percent):
+        return latencies[min(len(latencies) - 1,
+                             int(len(latencies) * percent / 100))]
+
+    return {
+        "queries": queries,
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": latencies[-1],
+    }
+
+
+def run(scales, queries=1000, seed=0):
+    """Measures the index at every scale and returns the results document."""
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": {},
+    }
+    for scale in scales:
+        index, seconds, peak, held = measure_build(scale, seed)
+        latency = measure_queries(index, scale, queries, seed=seed)
+        del index
+        results["scales"][str(scale)] = {
+            "build_seconds": seconds,
+            "build_peak_bytes": peak,
+            "index_bytes": held,
+            "similar": latency,
+        }
+        print(f"{scale:>10} build {seconds:>8.2f} s {held / 2**20:>9.1f} MiB "
+              f"(peak {peak / 2**20:.1f}) similar p50 "
+              f"{latency['p50_ms']:.2f} ms p99 {latency['p99_ms']:.2f} ms",
+              file=sys.stderr)
+    return results
+
+
+def _scales(value):
+    return [int(float(scale)) for scale in value.split(",")]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--scales", type=_scales, default=[5_000_000],
+                            help="Comma separated catalogue sizes, e.g. 1e6,5e6.")
+    arg_parser.add_argument("--queries", type=int, default=1000,
+                            help="Number of similar() calls timed per scale.")
+    arg_parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of the catalogue and the queried videos.")
+    arg_parser.add_argument("--output", default="similarity_results.json",
+                            help="Where to save the results.")
+    args = arg_parser.parse_args()
+
+    results = run(args.scales, args.queries, args.seed)
+    Path(args.output).write_text(json.dumps(results, indent=2))
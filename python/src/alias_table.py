@@ -0,0 +1,57 @@
+"""An alias table class."""
+
+from array import array
+import random
+
+
+class AliasTable:
+    """A class used to draw from a fixed weighted set in O(1).
+
+    Vose's alias method splits the n weights into n equally likely
+    columns, each holding at most two members: its own share, and the
+    remainder filled by an "alias". A draw picks a column and one of its
+    two members with a single random number. Building is O(n).
+    """
+
+    def __init__(self, members, weights=None):
+        """AliasTable constructor.
+
+        Args:
+            members: The members to draw from.
+            weights: Non-negative weight of each member, all equal if None.
+        """
+        self._members = list(members)
+        n = len(self._members)
+        self._probability = array("d", [1.0]) * n
+        self._alias = array("i", range(n))
+        if weights is None or not n:
+            return
+        weights = list(weights)
+        total = sum(weights)
+        if total <= 0:
+            return
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, weight in enumerate(scaled) if weight < 1]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._probability[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] += scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+        # Whatever is left is 1 up to rounding errors.
+        for i in small + large:
+            self._probability[i] = 1.0
+
+    def __len__(self):
+        return len(self._members)
+
+    def sample(self, rng=random):
+        """Returns a random member, None if the table is empty."""
+        if not self._members:
+            return None
+        u = rng.random() * len(self._members)
+        column = int(u)
+        if u - column < self._probability[column]:
+            return self._members[column]
+        return self._members[self._alias[column]]
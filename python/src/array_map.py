@@ -0,0 +1,100 @@
+"""A sorted array map class."""
+
+from array import array
+import bisect
+
+
+class ArrayMap:
+    """A class used to map ints to ints in two parallel sorted arrays.
+
+    An entry costs two machine integers, where a dict entry costs a hash
+    table slot and usually two int objects. Lookups are binary searches.
+    Inserts and deletes shift the entries after them, a memmove that stays
+    cheap up to millions of entries, and large batches are merged in one
+    pass by update.
+    """
+
+    __slots__ = ("_keys", "_values")
+
+    # Batches larger than this are merged rather than inserted one by one.
+    MERGE_BATCH = 128
+
+    def __init__(self, pairs=(), typecode="i"):
+        """ArrayMap constructor.
+
+        Args:
+            pairs: Initial (key, value) pairs, or a mapping.
+            typecode: The array typecode of keys and values.
+        """
+        self._keys = array(typecode)
+        self._values = array(typecode)
+        self.update(pairs)
+
+    def copy(self):
+        clone = ArrayMap.__new__(ArrayMap)
+        clone._keys = self._keys[:]
+        clone._values = self._values[:]
+        return clone
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def _find(self, key):
+        """Returns where key is, or would be inserted, and if it is there."""
+        keys = self._keys
+        index = bisect.bisect_left(keys, key)
+        return index, index < len(keys) and keys[index] == key
+
+    def __contains__(self, key):
+        return self._find(key)[1]
+
+    def __getitem__(self, key):
+        index, found = self._find(key)
+        if not found:
+            raise KeyError(key)
+        return self._values[index]
+
+    def get(self, key, default=None):
+        index, found = self._find(key)
+        return self._values[index] if found else default
+
+    def __setitem__(self, key, value):
+        index, found = self._find(key)
+        if found:
+            self._values[index] = value
+        else:
+            self._keys.insert(index, key)
+            self._values.insert(index, value)
+
+    def __delitem__(self, key):
+        index, found = self._find(key)
+        if not found:
+            raise KeyError(key)
+        del self._keys[index]
+        del self._values[index]
+
+    def items(self):
+        return zip(self._keys, self._values)
+
+    def update(self, pairs):
+        """Sets many entries at once.
+
+        Args:
+            pairs: (key, value) pairs, or a mapping.
+        """
+        if hasattr(pairs, "items"):
+            pairs = pairs.items()
+        pairs = list(pairs)
+        if len(pairs) <= self.MERGE_BATCH:
+            for key, value in pairs:
+                self[key] = value
+            return
+        merged = dict(zip(self._keys, self._values))
+        merged.update(pairs)
+        keys = sorted(merged)
+        self._keys = array(self._keys.typecode, keys)
+        self._values = array(self._values.typecode,
+                             [merged[key] for key in keys])
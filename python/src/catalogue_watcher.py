@@ -0,0 +1,74 @@
+"""A catalogue watcher class."""
+
+from pathlib import Path
+import sys
+import threading
+import traceback
+
+
+class CatalogueWatcher:
+    """A class used to poll a catalogue file and report modifications.
+
+    The callback runs on the watcher's own thread whenever the file's
+    modification time or size changes. It may read the catalogue, as
+    run.py does with VideoPlayer.diff_library, but should leave changing
+    the library to the thread that serves the commands.
+    """
+
+    def __init__(self, path, callback, interval=1.0):
+        """CatalogueWatcher constructor.
+
+        Args:
+            path: The catalogue file to watch.
+            callback: Called without arguments after each modification.
+            interval: Seconds between two polls.
+        """
+        self._path = Path(path)
+        self._callback = callback
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            stat = self._path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """Checks the file once, calling the callback if it changed.
+
+        Returns:
+            True if a modification was detected.
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        self._callback()
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self.poll()
+            except Exception:
+                # Keep polling; the next modification may fix the problem.
+                print("Catalogue watcher error:", file=sys.stderr)
+                traceback.print_exc()
+
+    def start(self):
+        """Starts polling on a daemon thread."""
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="catalogue-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops polling and waits for the thread to finish."""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
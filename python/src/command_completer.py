@@ -0,0 +1,131 @@
+"""A command completer class."""
+
+from .prefix_trie import PrefixTrie
+
+# Number of candidates offered for one word; readline lists them all.
+COMPLETIONS_SHOWN = 100
+
+# What each argument of a command names: a "video" id or a "playlist".
+# The last kind of a tuple ending with "..." repeats for every further
+# argument; arguments past the tuple are not completed.
+COMMAND_ARGUMENTS = {
+    "NUMBER_OF_VIDEOS": (),
+    "SHOW_ALL_VIDEOS": (),
+    "PLAY": ("video",),
+    "PLAY_RANDOM": ("playlist",),
+    "PLAY_SIMILAR": ("video",),
+    "RECOMMEND": ("video",),
+    "PLAY_PLAYLIST": ("playlist",),
+    "NEXT": (),
+    "PREV": (),
+    "SHUFFLE": (),
+    "SHOW_QUEUE": (),
+    "STOP": (),
+    "PAUSE": (),
+    "CONTINUE": (),
+    "SHOW_PLAYING": (),
+    "CREATE_PLAYLIST": (),
+    "ADD_TO_PLAYLIST": ("playlist", "video"),
+    "BULK_ADD_TO_PLAYLIST": ("playlist", "video", "..."),
+    "MOVE_IN_PLAYLIST": ("playlist", "video"),
+    "REMOVE_FROM_PLAYLIST": ("playlist", "video"),
+    "CLEAR_PLAYLIST": ("playlist",),
+    "DELETE_PLAYLIST": ("playlist",),
+    "DUPLICATE_PLAYLIST": ("playlist",),
+    "PLAYLIST_UNION": ("playlist", "playlist", "..."),
+    "PLAYLIST_INTERSECTION": ("playlist", "playlist", "..."),
+    "PLAYLIST_DIFFERENCE": ("playlist", "playlist", "..."),
+    "SNAPSHOT_PLAYLIST": ("playlist",),
+    "RESTORE_PLAYLIST": ("playlist",),
+    "SHOW_PLAYLIST": ("playlist",),
+    "SHOW_ALL_PLAYLISTS": (),
+    "SHOW_VIDEO_PLAYLISTS": ("video",),
+    "MOST_PLAYED": (),
+    "TRENDING": (),
+    "SUGGEST": (),
+    "SEARCH_VIDEOS": (),
+    "SEARCH_VIDEOS_WITH_TAG": (),
+    "FLAG_VIDEO": ("video",),
+    "BULK_FLAG_VIDEO": ("video", "..."),
+    "FLAG_MATCHING": (),
+    "ALLOW_MATCHING": (),
+    "ALLOW_VIDEO": ("video",),
+    "RELOAD_LIBRARY": (),
+    "STATS": (),
+    "PROFILE": (),
+    "PROFILE_NEXT": (),
+    "HELP": (),
+    "EXIT": (),
+}
+
+
+class CommandCompleter:
+    """A class used to complete command words for readline.
+
+    Verbs are completed from COMMAND_ARGUMENTS, video ids from the
+    library, from its sorted ids, and playlist names from the player's
+    prefix trie, so a completion stays fast with millions of ids.
+    """
+
+    def __init__(self, video_player, limit=COMPLETIONS_SHOWN):
+        """CommandCompleter constructor.
+
+        Args:
+            video_player: The VideoPlayer whose videos and playlists are
+                completed.
+            limit: Maximum number of candidates offered for one word.
+        """
+        self._player = video_player
+        self._limit = limit
+        self._verbs = PrefixTrie(COMMAND_ARGUMENTS)
+        self._readline = None
+        self._matches = []
+
+    def candidates(self, line, begidx, text):
+        """Returns the completions of the word being typed.
+
+        Args:
+            line: The whole input line.
+            begidx: Where the word being completed starts in line.
+            text: The word being completed.
+        """
+        words = line[:begidx].split()
+        if not words:
+            return self._verbs.complete(text.upper(), self._limit)
+        kinds = COMMAND_ARGUMENTS.get(words[0].upper(), ())
+        position = len(words) - 1
+        if kinds and kinds[-1] == "...":
+            kinds = kinds[:-1]
+            position = min(position, len(kinds) - 1)
+        if position >= len(kinds):
+            return []
+        if kinds[position] == "video":
+            return self._player.complete_video_ids(text, self._limit)
+        return self._player.complete_playlist_names(text, self._limit)
+
+    def install(self, readline):
+        """Makes this the completer of a readline module, bound to tab.
+
+        Args:
+            readline: The readline module, passed in as it is missing on
+                some platforms.
+        """
+        self._readline = readline
+        readline.set_completer_delims(" \t")
+        readline.set_completer(self.complete)
+        if "libedit" in (readline.__doc__ or ""):
+            readline.parse_and_bind("bind ^I rl_complete")
+        else:
+            readline.parse_and_bind("tab: complete")
+
+    def complete(self, text, state):
+        """The readline completer function.
+
+        readline calls it with state 0, 1, ... until it returns None; the
+        candidates are computed on the first call only.
+        """
+        if state == 0:
+            self._matches = self.candidates(
+                self._readline.get_line_buffer(),
+                self._readline.get_begidx(), text)
+        return self._matches[state] if state < len(self._matches) else None
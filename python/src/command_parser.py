@@ -1,138 +1,491 @@
 """A command parser class."""
 
+from .command_profiler import CommandProfiler
 import textwrap
+import time
 from typing import Sequence
 
+# Directory profiling reports are written to unless told otherwise.
+DEFAULT_PROFILE_DIR = "profiles"
+
 
 class CommandException(Exception):
     """A class used to represent a wrong command exception."""
     pass
 
 
+# Playlist set algebra commands and the operation each one performs.
+_PLAYLIST_OPERATIONS = {
+    "PLAYLIST_UNION": "union",
+    "PLAYLIST_INTERSECTION": "intersection",
+    "PLAYLIST_DIFFERENCE": "difference",
+}
+
+
+# Fields FLAG_MATCHING and ALLOW_MATCHING can select videos by.
+_MATCH_FIELDS = ("tag", "title")
+
+
+def _parse_int(value, command_name):
+    """Converts a numeric argument, raising CommandException if invalid."""
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandException(
+            f"Please enter a whole number for {command_name}.")
+
+
+def _verb(command):
+    """Returns the upper case verb of a command, UNKNOWN if it is empty."""
+    return command[0].upper() if command else "UNKNOWN"
+
+
+def _parse_ttl(value, command_name):
+    """Converts a time to live, raising CommandException unless positive."""
+    ttl = _parse_int(value, command_name)
+    if ttl <= 0:
+        raise CommandException(
+            f"Please enter a positive number of seconds for {command_name}.")
+    return ttl
+
+
+def _read_bulk_arguments(arguments):
+    """Expands '@path' arguments into the lines of that file.
+
+    Each remaining line is split on '|' so a file can carry a flag reason
+    next to each video_id, the same way videos.txt separates its fields.
+
+    Returns:
+        A list of (video_id, extra) pairs, extra being None if absent.
+    """
+    entries = []
+    for argument in arguments:
+        if not argument.startswith("@"):
+            entries.append((argument, None))
+            continue
+        try:
+            with open(argument[1:]) as id_file:
+                for line in id_file:
+                    video_id, _, extra = line.partition("|")
+                    if video_id.strip():
+                        entries.append((video_id.strip(), extra.strip() or None))
+        except OSError as e:
+            raise CommandException(f"Cannot read {argument[1:]}: {e.strerror}")
+    return entries
+
+
 class CommandParser:
     """A class used to parse and execute a user Command."""
 
-    def __init__(self, video_player):
+    def __init__(self, video_player, stats=None,
+                 profile_dir=DEFAULT_PROFILE_DIR):
+        """CommandParser constructor.
+
+        Args:
+            video_player: The VideoPlayer commands are executed against.
+            stats: A CommandStats recording per-verb counts and latencies,
+                or None to skip the instrumentation entirely.
+            profile_dir: Directory PROFILE and PROFILE_NEXT write to.
+        """
         self._player = video_player
+        self._stats = stats
+        self._profile_dir = profile_dir
+        # Only set while profiling is switched on.
+        self._profiler = None
 
     def execute_command(self, command: Sequence[str]):
         """Executes the user command. Expects the command to be upper case.
            Raises CommandException if a command cannot be parsed.
         """
+        profiler = self._profiler
+        if (profiler is not None and command
+                and command[0].upper() not in ("PROFILE", "PROFILE_NEXT")):
+            try:
+                profiler.profile(command, self._execute)
+            finally:
+                if profiler.finished and self._profiler is profiler:
+                    self._profiler = None
+            return
+        self._execute(command)
+
+    def _execute(self, command: Sequence[str]):
+        """Executes a command, recording it in the statistics if enabled."""
+        stats = self._stats
+        if stats is None:
+            self._dispatch(command)
+            return
+        stats.countdown -= 1
+        if stats.countdown:
+            # Untimed fast path: count the call without reading the clock.
+            try:
+                verb = self._dispatch(command)
+            except Exception:
+                stats.record(_verb(command), None, True)
+                raise
+            calls = stats.calls
+            try:
+                calls[verb] += 1
+            except KeyError:
+                calls[verb] = 1
+            return
+        stats.countdown = stats.sample_every
+        start = time.perf_counter_ns()
+        try:
+            verb = self._dispatch(command)
+        except Exception:
+            stats.record(_verb(command), time.perf_counter_ns() - start, True)
+            raise
+        stats.record(verb, time.perf_counter_ns() - start)
+
+    def _dispatch(self, command: Sequence[str]) -> str:
+        """Runs a command, returning its upper case verb, UNKNOWN if not known."""
         if not command:
             raise CommandException(
                 "Please enter a valid command, "
                 "type HELP for a list of available commands.")
 
-        if command[0].upper() == "NUMBER_OF_VIDEOS":
+        verb = command[0].upper()
+        self._player.expire_flags()
+        self._player.advance_playback()
+
+        if verb == "NUMBER_OF_VIDEOS":
             self._player.number_of_videos()
 
-        elif command[0].upper() == "SHOW_ALL_VIDEOS":
+        elif verb == "SHOW_ALL_VIDEOS":
             self._player.show_all_videos()
 
-        elif command[0].upper() == "PLAY":
+        elif verb == "PLAY":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter PLAY command followed by video_id.")
             self._player.play_video(command[1])
 
-        elif command[0].upper() == "PLAY_RANDOM":
-            self._player.play_random_video()
+        elif verb == "PLAY_RANDOM":
+            arguments = command[1:]
+            popular = bool(arguments) and arguments[0].upper() == "POPULAR"
+            if popular:
+                arguments = arguments[1:]
+            if len(arguments) > 1:
+                raise CommandException(
+                    "Please enter PLAY_RANDOM command followed by an optional "
+                    "POPULAR and an optional tag or playlist name.")
+            self._player.play_random_video(*arguments, popular=popular)
+
+        elif verb == "PLAY_SIMILAR":
+            if len(command) > 2:
+                raise CommandException(
+                    "Please enter PLAY_SIMILAR command followed by an "
+                    "optional video_id.")
+            self._player.play_similar_video(*command[1:])
+
+        elif verb == "RECOMMEND":
+            if len(command) == 2:
+                self._player.show_recommendations(command[1])
+            elif len(command) == 3:
+                count = _parse_int(command[2], "RECOMMEND")
+                if count < 1:
+                    raise CommandException(
+                        "Please enter a positive number for RECOMMEND.")
+                self._player.show_recommendations(command[1], count)
+            else:
+                raise CommandException(
+                    "Please enter RECOMMEND command followed by a video_id "
+                    "and an optional number of videos.")
+
+        elif verb == "PLAY_PLAYLIST":
+            if len(command) != 2:
+                raise CommandException(
+                    "Please enter PLAY_PLAYLIST command followed by a "
+                    "playlist name.")
+            self._player.play_playlist(command[1])
+
+        elif verb == "NEXT":
+            self._player.play_next_video()
+
+        elif verb == "PREV":
+            self._player.play_previous_video()
 
-        elif command[0].upper() == "STOP":
+        elif verb == "SHUFFLE":
+            self._player.shuffle_queue()
+
+        elif verb == "SHOW_QUEUE":
+            self._player.show_queue()
+
+        elif verb == "STOP":
             self._player.stop_video()
 
-        elif command[0].upper() == "PAUSE":
+        elif verb == "PAUSE":
             self._player.pause_video()
 
-        elif command[0].upper() == "CONTINUE":
+        elif verb == "CONTINUE":
             self._player.continue_video()
 
-        elif command[0].upper() == "SHOW_PLAYING":
+        elif verb == "SHOW_PLAYING":
             self._player.show_playing()
 
-        elif command[0].upper() == "CREATE_PLAYLIST":
+        elif verb == "CREATE_PLAYLIST":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter CREATE_PLAYLIST command followed by a "
                     "playlist name.")
             self._player.create_playlist(command[1])
 
-        elif command[0].upper() == "ADD_TO_PLAYLIST":
-            if len(command) != 3:
+        elif verb == "ADD_TO_PLAYLIST":
+            if len(command) == 3:
+                self._player.add_to_playlist(command[1], command[2])
+            elif len(command) == 4:
+                self._player.add_to_playlist(
+                    command[1], command[2],
+                    _parse_int(command[3], "ADD_TO_PLAYLIST"))
+            else:
                 raise CommandException(
                     "Please enter ADD_TO_PLAYLIST command followed by a "
-                    "playlist name and video_id to add.")
-            self._player.add_to_playlist(command[1], command[2])
+                    "playlist name, video_id to add and an optional position.")
 
-        elif command[0].upper() == "REMOVE_FROM_PLAYLIST":
+        elif verb == "BULK_ADD_TO_PLAYLIST":
+            if len(command) < 3:
+                raise CommandException(
+                    "Please enter BULK_ADD_TO_PLAYLIST command followed by a "
+                    "playlist name and video_ids or @file arguments.")
+            self._player.bulk_add_to_playlist(
+                command[1],
+                [video_id for video_id, _ in _read_bulk_arguments(command[2:])])
+
+        elif verb == "MOVE_IN_PLAYLIST":
+            if len(command) != 4:
+                raise CommandException(
+                    "Please enter MOVE_IN_PLAYLIST command followed by a "
+                    "playlist name, video_id and new position.")
+            self._player.move_in_playlist(
+                command[1], command[2],
+                _parse_int(command[3], "MOVE_IN_PLAYLIST"))
+
+        elif verb == "REMOVE_FROM_PLAYLIST":
             if len(command) != 3:
                 raise CommandException(
                     "Please enter REMOVE_FROM_PLAYLIST command followed by a "
                     "playlist name and video_id to remove.")
             self._player.remove_from_playlist(command[1], command[2])
 
-        elif command[0].upper() == "CLEAR_PLAYLIST":
+        elif verb == "CLEAR_PLAYLIST":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter CLEAR_PLAYLIST command followed by a "
                     "playlist name.")
             self._player.clear_playlist(command[1])
 
-        elif command[0].upper() == "DELETE_PLAYLIST":
+        elif verb == "DELETE_PLAYLIST":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter DELETE_PLAYLIST command followed by a "
                     "playlist name.")
             self._player.delete_playlist(command[1])
 
-        elif command[0].upper() == "SHOW_PLAYLIST":
+        elif verb == "DUPLICATE_PLAYLIST":
+            if len(command) != 3:
+                raise CommandException(
+                    "Please enter DUPLICATE_PLAYLIST command followed by a "
+                    "playlist name and the name of the copy.")
+            self._player.duplicate_playlist(command[1], command[2])
+
+        elif verb in _PLAYLIST_OPERATIONS:
+            if len(command) < 4:
+                raise CommandException(
+                    f"Please enter {verb} command followed by "
+                    "a target playlist name and at least two playlist names.")
+            self._player.combine_playlists(
+                _PLAYLIST_OPERATIONS[verb], command[1],
+                command[2:])
+
+        elif verb == "SNAPSHOT_PLAYLIST":
             if len(command) != 2:
                 raise CommandException(
-                    "Please enter SHOW_PLAYLIST command followed by a "
+                    "Please enter SNAPSHOT_PLAYLIST command followed by a "
                     "playlist name.")
-            self._player.show_playlist(command[1])
+            self._player.snapshot_playlist(command[1])
 
-        elif command[0].upper() == "SHOW_ALL_PLAYLISTS":
+        elif verb == "RESTORE_PLAYLIST":
+            if len(command) != 3:
+                raise CommandException(
+                    "Please enter RESTORE_PLAYLIST command followed by a "
+                    "playlist name and snapshot version.")
+            self._player.restore_playlist(
+                command[1], _parse_int(command[2], "RESTORE_PLAYLIST"))
+
+        elif verb == "SHOW_PLAYLIST":
+            if len(command) == 2:
+                self._player.show_playlist(command[1])
+            elif len(command) in (3, 4):
+                self._player.show_playlist(
+                    command[1],
+                    *(_parse_int(arg, "SHOW_PLAYLIST")
+                      for arg in command[2:]))
+            else:
+                raise CommandException(
+                    "Please enter SHOW_PLAYLIST command followed by a "
+                    "playlist name, an optional page and page size.")
+
+        elif verb == "SHOW_VIDEO_PLAYLISTS":
+            if len(command) != 2:
+                raise CommandException(
+                    "Please enter SHOW_VIDEO_PLAYLISTS command followed by a "
+                    "video_id.")
+            self._player.show_video_playlists(command[1])
+
+        elif verb == "SHOW_ALL_PLAYLISTS":
             self._player.show_all_playlists()
 
-        elif command[0].upper() == "SEARCH_VIDEOS":
+        elif verb in ("MOST_PLAYED", "TRENDING"):
+            if len(command) > 2:
+                raise CommandException(
+                    f"Please enter {verb} command followed by "
+                    "an optional number of videos.")
+            show = (self._player.show_most_played
+                    if verb == "MOST_PLAYED"
+                    else self._player.show_trending)
+            if len(command) == 2:
+                count = _parse_int(command[1], verb)
+                if count < 1:
+                    raise CommandException(
+                        f"Please enter a positive number for "
+                        f"{verb}.")
+                show(count)
+            else:
+                show()
+
+        elif verb == "SUGGEST":
+            if len(command) < 2:
+                raise CommandException(
+                    "Please enter SUGGEST command followed by the start of "
+                    "a title.")
+            self._player.show_suggestions(" ".join(command[1:]))
+
+        elif verb == "SEARCH_VIDEOS":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter SEARCH_VIDEOS command followed by a "
                     "search term.")
             self._player.search_videos(command[1])
 
-        elif command[0].upper() == "SEARCH_VIDEOS_WITH_TAG":
+        elif verb == "SEARCH_VIDEOS_WITH_TAG":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter SEARCH_VIDEOS_WITH_TAG command followed by a "
                     "video tag.")
             self._player.search_videos_tag(command[1])
 
-        elif command[0].upper() == "FLAG_VIDEO":
-            if len(command) == 3:
+        elif verb == "FLAG_VIDEO":
+            if len(command) == 4:
+                self._player.flag_video(
+                    command[1], command[2],
+                    _parse_ttl(command[3], "FLAG_VIDEO"))
+            elif len(command) == 3:
                 self._player.flag_video(command[1], command[2])
             elif len(command) == 2:
                 self._player.flag_video(command[1])
             else:
                 raise CommandException(
                     "Please enter FLAG_VIDEO command followed by a "
-                    "video_id and an optional flag reason.")
+                    "video_id, an optional flag reason and an optional "
+                    "time to live in seconds.")
+
+        elif verb == "BULK_FLAG_VIDEO":
+            if len(command) < 2:
+                raise CommandException(
+                    "Please enter BULK_FLAG_VIDEO command followed by "
+                    "video_ids or @file arguments.")
+            ttl = None
+            arguments = command[1:]
+            if arguments[0].lower().startswith("ttl="):
+                ttl = _parse_ttl(arguments[0][4:], "BULK_FLAG_VIDEO")
+                arguments = arguments[1:]
+            self._player.bulk_flag_videos(
+                _read_bulk_arguments(arguments), ttl)
+
+        elif verb == "FLAG_MATCHING":
+            if (len(command) not in (3, 4)
+                    or command[1].lower() not in _MATCH_FIELDS):
+                raise CommandException(
+                    "Please enter FLAG_MATCHING command followed by tag or "
+                    "title, a pattern and an optional flag reason.")
+            self._player.flag_matching(command[1].lower(), *command[2:])
 
-        elif command[0].upper() == "ALLOW_VIDEO":
+        elif verb == "ALLOW_MATCHING":
+            if len(command) != 3 or command[1].lower() not in _MATCH_FIELDS:
+                raise CommandException(
+                    "Please enter ALLOW_MATCHING command followed by tag or "
+                    "title and a pattern.")
+            self._player.allow_matching(command[1].lower(), command[2])
+
+        elif verb == "ALLOW_VIDEO":
             if len(command) != 2:
                 raise CommandException(
                     "Please enter ALLOW_VIDEO command followed by a "
                     "video_id.")
             self._player.allow_video(command[1])
 
-        elif command[0].upper() == "HELP":
+        elif verb == "RELOAD_LIBRARY":
+            self._player.reload_library()
+
+        elif verb == "PROFILE":
+            if len(command) != 2 or command[1].upper() not in ("ON", "OFF"):
+                raise CommandException(
+                    "Please enter PROFILE command followed by ON or OFF.")
+            if command[1].upper() == "ON":
+                self._profiler = CommandProfiler(self._profile_dir)
+                print(f"Profiling commands into {self._profile_dir}")
+            else:
+                self._profiler = None
+                print("Profiling stopped")
+
+        elif verb == "PROFILE_NEXT":
+            if len(command) != 2:
+                raise CommandException(
+                    "Please enter PROFILE_NEXT command followed by a number "
+                    "of commands.")
+            count = _parse_int(command[1], "PROFILE_NEXT")
+            if count < 1:
+                raise CommandException(
+                    "Please enter a positive number for PROFILE_NEXT.")
+            self._profiler = CommandProfiler(self._profile_dir, count)
+            print(f"Profiling the next {count} commands into {self._profile_dir}")
+
+        elif verb == "STATS":
+            self._stats_command(command[1:])
+
+        elif verb == "HELP":
             self._get_help()
         else:
             print(
                 "Please enter a valid command, type HELP for a list of "
                 "available commands.")
+            return "UNKNOWN"
+        return verb
+
+    def _stats_command(self, arguments):
+        """Shows, exports or resets the command statistics."""
+        if self._stats is None:
+            print("Command statistics are disabled")
+        elif not arguments:
+            self._stats.show()
+        elif len(arguments) == 1 and arguments[0].upper() == "RESET":
+            self._stats.reset()
+            print("Command statistics reset")
+        elif len(arguments) == 2 and arguments[0].upper() in ("JSON", "PROMETHEUS"):
+            if arguments[0].upper() == "JSON":
+                text = self._stats.to_json()
+            else:
+                text = self._stats.to_prometheus()
+            try:
+                with open(arguments[1], "w") as stats_file:
+                    stats_file.write(text)
+            except OSError as e:
+                raise CommandException(f"Cannot write {arguments[1]}: {e.strerror}")
+            print(f"Command statistics written to {arguments[1]}")
+        else:
+            raise CommandException(
+                "Please enter STATS command, optionally followed by RESET, "
+                "or by JSON or PROMETHEUS and a file path.")
 
     def _get_help(self):
         """Displays all available commands to the user."""
@@ -141,22 +494,48 @@ class CommandParser:
             NUMBER_OF_VIDEOS - Shows how many videos are in the library.
             SHOW_ALL_VIDEOS - Lists all videos from the library.
             PLAY <video_id> - Plays specified video.
-            PLAY_RANDOM - Plays a random video from the library.
+            PLAY_RANDOM [POPULAR] [tag|playlist_name] - Plays a random video from the library, tag or playlist, weighted by plays if POPULAR.
+            PLAY_SIMILAR [video_id] - Plays the video sharing the most tags with the given or current video.
+            RECOMMEND <video_id> [n] - Lists the n videos sharing the most tags with the video.
+            PLAY_PLAYLIST <playlist_name> - Queues the playlist and plays it, moving on as each video ends.
+            NEXT - Plays the next video of the queue.
+            PREV - Plays the previous video of the queue.
+            SHUFFLE - Shuffles the videos queued after the current one.
+            SHOW_QUEUE - Displays the queue and the position in the current video.
             STOP - Stop the current video.
             PAUSE - Pause the current video.
             CONTINUE - Resume the current paused video.
             SHOW_PLAYING - Displays the title, url and paused status of the video that is currently playing (or paused).
             CREATE_PLAYLIST <playlist_name> - Creates a new (empty) playlist with the provided name.
-            ADD_TO_PLAYLIST <playlist_name> <video_id> - Adds the requested video to the playlist.
+            ADD_TO_PLAYLIST <playlist_name> <video_id> [position] - Adds the requested video to the playlist, at the end or the given position.
+            BULK_ADD_TO_PLAYLIST <playlist_name> <video_id|@file>... - Adds many videos to the playlist at once.
+            MOVE_IN_PLAYLIST <playlist_name> <video_id> <position> - Moves a video to a new position in the playlist.
             REMOVE_FROM_PLAYLIST <playlist_name> <video_id> - Removes the specified video from the specified playlist
             CLEAR_PLAYLIST <playlist_name> - Removes all the videos from the playlist.
             DELETE_PLAYLIST <playlist_name> - Deletes the playlist.
-            SHOW_PLAYLIST <playlist_name> - List all the videos in this playlist.
+            DUPLICATE_PLAYLIST <playlist_name> <new_playlist_name> - Creates a copy of the playlist.
+            PLAYLIST_UNION <target> <playlist_name>... - Fills target with the videos in any of the playlists.
+            PLAYLIST_INTERSECTION <target> <playlist_name>... - Fills target with the videos in all of the playlists.
+            PLAYLIST_DIFFERENCE <target> <playlist_name>... - Fills target with the videos of the first playlist not in the others.
+            SNAPSHOT_PLAYLIST <playlist_name> - Records the current videos of the playlist as a new version.
+            RESTORE_PLAYLIST <playlist_name> <version> - Restores the playlist to a recorded version.
+            SHOW_PLAYLIST <playlist_name> [page] [page_size] - List all the videos in this playlist, or one page of them.
             SHOW_ALL_PLAYLISTS - Display all the available playlists.
+            SHOW_VIDEO_PLAYLISTS <video_id> - Display all the playlists containing the video.
+            MOST_PLAYED [n] - Lists the n most played videos.
+            TRENDING [n] - Lists the n videos played the most lately.
+            SUGGEST <title_prefix> - Lists up to 10 titles starting with the prefix, most played first.
             SEARCH_VIDEOS <search_term> - Display all the videos whose titles contain the search_term.
             SEARCH_VIDEOS_WITH_TAG <tag_name> -Display all videos whose tags contains the provided tag.
-            FLAG_VIDEO <video_id> <flag_reason> - Mark a video as flagged.
+            FLAG_VIDEO <video_id> <flag_reason> [ttl_seconds] - Mark a video as flagged, optionally only for a while.
+            BULK_FLAG_VIDEO [ttl=<seconds>] <video_id|@file>... - Flags many videos at once; file lines are video_id|flag_reason.
+            FLAG_MATCHING <tag|title> <pattern> <flag_reason> - Flags every video with the tag, or whose title contains the pattern.
+            ALLOW_MATCHING <tag|title> <pattern> - Removes the flag from every matching video.
             ALLOW_VIDEO <video_id> - Removes a flag from a video.
+            RELOAD_LIBRARY - Re-reads the video catalogue and applies any changes.
+            STATS [RESET | JSON <path> | PROMETHEUS <path>] - Shows, resets or exports per-command call counts and latencies.
+            PROFILE <ON|OFF> - Profiles every following command with cProfile and tracemalloc.
+            PROFILE_NEXT <n> - Profiles the next n commands.
             HELP - Displays help.
             EXIT - Terminates the program execution.
         """)
@@ -0,0 +1,88 @@
+"""A command profiler class."""
+
+from pathlib import Path
+import cProfile
+import io
+import pstats
+import re
+import time
+import tracemalloc
+
+# Verbs used as they are in report names; anything else is UNKNOWN.
+_REPORT_VERB = re.compile(r"[A-Z0-9_]+")
+
+
+class CommandProfiler:
+    """A class used to profile commands with cProfile and tracemalloc.
+
+    Each profiled command gets its own report in the report directory,
+    listing the functions with the highest cumulative time and the source
+    lines that allocated the most memory while it ran.
+    """
+
+    # Number of functions and allocation sites listed in a report.
+    TOP_ENTRIES = 20
+
+    def __init__(self, report_dir, remaining=None):
+        """CommandProfiler constructor.
+
+        Args:
+            report_dir: Directory the reports are written to.
+            remaining: How many commands to profile, None for all of them
+                until profiling is switched off.
+        """
+        self._report_dir = Path(report_dir)
+        self._remaining = remaining
+        self._sequence = 0
+
+    @property
+    def finished(self):
+        """Whether every requested command has been profiled."""
+        return self._remaining is not None and self._remaining <= 0
+
+    def profile(self, command, execute):
+        """Runs execute(command) under the profilers and writes a report."""
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.runcall(execute, command)
+        finally:
+            elapsed = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            if not already_tracing:
+                tracemalloc.stop()
+            self._write_report(command, elapsed, profiler, snapshot)
+            if self._remaining is not None:
+                self._remaining -= 1
+
+    def _write_report(self, command, elapsed, profiler, snapshot):
+        self._sequence += 1
+        verb = command[0].upper() if command else "EMPTY"
+        if not _REPORT_VERB.fullmatch(verb):
+            # Keeps typed words such as "../x" out of the file name.
+            verb = "UNKNOWN"
+        path = self._report_dir / (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{self._sequence:04d}-{verb}.txt")
+
+        out = io.StringIO()
+        out.write(f"Command: {' '.join(command)}\n")
+        out.write(f"Wall time: {elapsed * 1000:.3f} ms\n\n")
+        out.write("Top functions by cumulative time:\n")
+        pstats.Stats(profiler, stream=out).sort_stats(
+            "cumulative").print_stats(self.TOP_ENTRIES)
+        out.write("Top allocation sites:\n")
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ))
+        for stat in snapshot.statistics("lineno")[:self.TOP_ENTRIES]:
+            out.write(f"  {stat}\n")
+        try:
+            self._report_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(out.getvalue())
+        except OSError as e:
+            print(f"Cannot write profile report: {e}")
@@ -0,0 +1,240 @@
+"""Command statistics classes."""
+
+import json
+
+
+class LatencyHistogram:
+    """A class used to represent a log-bucketed latency histogram.
+
+    Like an HDR histogram, every power of two is split into 2 ** SUB_BITS
+    linear buckets, so any recorded value is known to within 12.5% while
+    the whole range of nanosecond latencies fits in a few hundred counters.
+    """
+
+    # record() inlines the bucket computation for this value.
+    SUB_BITS = 3
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        # Enough buckets for any 64-bit value, so recording never resizes.
+        self._buckets = [0] * (65 << self.SUB_BITS)
+
+    @classmethod
+    def bucket_index(cls, value):
+        """Returns the bucket a non-negative integer value falls into."""
+        exact = 1 << (cls.SUB_BITS + 1)
+        if value < exact:
+            return value
+        shift = value.bit_length() - cls.SUB_BITS - 1
+        mask = (1 << cls.SUB_BITS) - 1
+        return ((shift + 1) << cls.SUB_BITS) | ((value >> shift) & mask)
+
+    @classmethod
+    def bucket_upper_bound(cls, index):
+        """Returns the largest value a bucket holds."""
+        if index < 1 << (cls.SUB_BITS + 1):
+            return index
+        shift = (index >> cls.SUB_BITS) - 1
+        mantissa = (index & ((1 << cls.SUB_BITS) - 1)) | (1 << cls.SUB_BITS)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        """Adds one value, typically a latency in nanoseconds."""
+        # Inlined bucket_index: this runs once per command.
+        if value < 16:
+            self._buckets[value] += 1
+        else:
+            shift = value.bit_length() - 4
+            self._buckets[((shift + 1) << 3) | ((value >> shift) & 7)] += 1
+        if not self.count:
+            self.min = self.max = value
+        elif value > self.max:
+            self.max = value
+        elif value < self.min:
+            self.min = value
+        self.count += 1
+        self.total += value
+
+    def buckets(self):
+        """Yields (upper bound, count) for every non-empty bucket."""
+        for index, count in enumerate(self._buckets):
+            if count:
+                yield self.bucket_upper_bound(index), count
+
+    def cumulative_counts(self, bounds):
+        """Yields (bound, count of values at most bound) for sorted bounds.
+
+        A bucket counts towards the first bound at or above its upper
+        bound, so every count is exact to within a bucket.
+        """
+        bounds = iter(bounds)
+        bound = next(bounds, None)
+        seen = 0
+        for upper, count in self.buckets():
+            while bound is not None and upper > bound:
+                yield bound, seen
+                bound = next(bounds, None)
+            if bound is None:
+                return
+            seen += count
+        while bound is not None:
+            yield bound, seen
+            bound = next(bounds, None)
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding a percentile."""
+        if not self.count:
+            return 0
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for upper, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                return min(upper, self.max)
+        return self.max
+
+
+class CommandStats:
+    """A class used to collect per-verb command statistics.
+
+    Calls and errors are counted exactly. Reading the clock twice and
+    updating a histogram costs about as much as a small command, so only
+    one command in sample_every is timed; CommandParser decrements
+    countdown and bumps calls inline for the others.
+    """
+
+    # Upper bounds of the exported Prometheus buckets, in seconds, the
+    # same for every verb so that series can be aggregated.
+    PROMETHEUS_BUCKETS = (
+        1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+        1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5,
+        1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, sample_every=8):
+        """CommandStats constructor.
+
+        Args:
+            sample_every: Time one command out of this many, 1 to time
+                every command.
+
+        Raises:
+            ValueError: If sample_every is less than 1.
+        """
+        if sample_every < 1:
+            raise ValueError(
+                f"sample_every must be at least 1, not {sample_every}")
+        self.sample_every = sample_every
+        # Commands left until the next timed one.
+        self.countdown = 1
+        self.calls = {}
+        self.errors = {}
+        self._latency = {}
+
+    def record(self, verb, elapsed_ns=None, error=False):
+        """Records one command execution.
+
+        Args:
+            verb: The upper case command verb.
+            elapsed_ns: How long the command took, in nanoseconds, or None
+                if it was not timed.
+            error: Whether the command was rejected.
+        """
+        self.calls[verb] = self.calls.get(verb, 0) + 1
+        if error:
+            self.errors[verb] = self.errors.get(verb, 0) + 1
+        if elapsed_ns is not None:
+            latency = self._latency.get(verb)
+            if latency is None:
+                latency = self._latency[verb] = LatencyHistogram()
+            latency.record(elapsed_ns)
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        self.calls = {}
+        self.errors = {}
+        self._latency = {}
+
+    def verbs(self):
+        """Returns the recorded verbs, sorted."""
+        return sorted(self.calls)
+
+    def latency(self, verb):
+        """Returns the LatencyHistogram of the sampled calls of a verb."""
+        return self._latency.get(verb) or LatencyHistogram()
+
+    def to_json(self):
+        """Returns the statistics as a JSON document."""
+        document = {}
+        for verb in self.verbs():
+            latency = self.latency(verb)
+            document[verb] = {
+                "calls": self.calls[verb],
+                "errors": self.errors.get(verb, 0),
+                "latency_ns": {
+                    "count": latency.count,
+                    "sum": latency.total,
+                    "min": latency.min,
+                    "max": latency.max,
+                    "p50": latency.percentile(50),
+                    "p90": latency.percentile(90),
+                    "p99": latency.percentile(99),
+                    "p999": latency.percentile(99.9),
+                    "buckets": {str(upper): count
+                                for upper, count in latency.buckets()},
+                },
+            }
+        return json.dumps(document, indent=2)
+
+    def to_prometheus(self):
+        """Returns the statistics in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE yt_command_calls_total counter",
+            *(f'yt_command_calls_total{{verb="{verb}"}} {self.calls[verb]}'
+              for verb in self.verbs()),
+            "# TYPE yt_command_errors_total counter",
+            *(f'yt_command_errors_total{{verb="{verb}"}} '
+              f'{self.errors.get(verb, 0)}'
+              for verb in self.verbs()),
+            "# TYPE yt_command_latency_seconds histogram",
+        ]
+        for verb in self.verbs():
+            latency = self.latency(verb)
+            bounds = [round(bound * 1e9) for bound in self.PROMETHEUS_BUCKETS]
+            for bound, cumulative in latency.cumulative_counts(bounds):
+                lines.append(
+                    f'yt_command_latency_seconds_bucket{{verb="{verb}",'
+                    f'le="{bound / 1e9:.9g}"}} {cumulative}')
+            lines.append(
+                f'yt_command_latency_seconds_bucket{{verb="{verb}",le="+Inf"}} '
+                f'{latency.count}')
+            lines.append(
+                f'yt_command_latency_seconds_sum{{verb="{verb}"}} '
+                f'{latency.total / 1e9:.9g}')
+            lines.append(
+                f'yt_command_latency_seconds_count{{verb="{verb}"}} '
+                f'{latency.count}')
+        return "\n".join(lines) + "\n"
+
+    def show(self):
+        """Displays a per-verb summary, latencies in microseconds.
+
+        Verbs with no timed call show - for their latencies.
+        """
+        if not self.calls:
+            print("No commands recorded yet")
+            return
+        print(f"{'VERB':<24}{'CALLS':>8}{'ERRORS':>8}"
+              f"{'P50_US':>10}{'P99_US':>10}{'MAX_US':>10}")
+        for verb in self.verbs():
+            latency = self.latency(verb)
+            if latency.count:
+                timings = (f"{latency.percentile(50) / 1000:>10.1f}"
+                           f"{latency.percentile(99) / 1000:>10.1f}"
+                           f"{latency.max / 1000:>10.1f}")
+            else:
+                timings = f"{'-':>10}" * 3
+            print(f"{verb:<24}{self.calls[verb]:>8}{self.errors.get(verb, 0):>8}"
+                  f"{timings}")
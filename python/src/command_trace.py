@@ -0,0 +1,55 @@
+"""Command trace recording and reading."""
+
+import time
+
+# First line of every trace file.
+TRACE_HEADER = "# yt command trace v1"
+
+
+class CommandTraceRecorder:
+    """A class used to append every executed command to a trace file.
+
+    Each line holds the seconds elapsed since the recorder was created and
+    the command as typed, separated by a tab. Lines are flushed as they
+    are written so a trace survives the process being killed.
+    """
+
+    def __init__(self, path, clock=time.monotonic):
+        """CommandTraceRecorder constructor.
+
+        Args:
+            path: The trace file to create, replacing any existing one.
+            clock: Returns the current time in seconds.
+        """
+        self._clock = clock
+        self._start = clock()
+        self._file = open(path, "w", buffering=1)
+        self._file.write(TRACE_HEADER + "\n")
+
+    def record(self, command_line):
+        """Appends one command line to the trace."""
+        elapsed = self._clock() - self._start
+        command_line = " ".join(command_line.split())
+        self._file.write(f"{elapsed:.6f}\t{command_line}\n")
+
+    def close(self):
+        """Closes the trace file."""
+        self._file.close()
+
+
+def read_trace(path):
+    """Reads the commands of a trace file.
+
+    Args:
+        path: A file written by CommandTraceRecorder.
+
+    Yields:
+        (seconds since the start of the recording, command words) pairs.
+    """
+    with open(path) as trace_file:
+        for line in trace_file:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            timestamp, _, command_line = line.partition("\t")
+            yield float(timestamp), command_line.split()
@@ -0,0 +1,392 @@
+"""An indexed list class."""
+
+from .array_map import ArrayMap
+from array import array
+
+class _Fenwick:
+    """A Fenwick tree over block sizes, answering prefix sums in O(log n)."""
+
+    def __init__(self, sizes=()):
+        self.build(sizes)
+
+    def copy(self):
+        clone = _Fenwick.__new__(_Fenwick)
+        clone._tree = list(self._tree)
+        return clone
+
+    def build(self, sizes):
+        tree = [0] + list(sizes)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, index, delta):
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Returns the sum of the first index sizes."""
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, offset):
+        """Returns (block index, offset inside the block) of a position."""
+        index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= offset:
+                index = nxt
+                offset -= self._tree[nxt]
+            step >>= 1
+        return index, offset
+
+
+def _update_bucket(bucket, pairs):
+    """Applies (key, uid) pairs to a bucket, uid None dropping the key."""
+    pairs = list(pairs)
+    if all(uid is not None for _, uid in pairs):
+        bucket.update(pairs)
+        return
+    for key, uid in pairs:
+        if uid is None:
+            if key in bucket:
+                del bucket[key]
+        else:
+            bucket[key] = uid
+
+
+class IndexedList:
+    """A class used to represent an ordered list of uniquely keyed items.
+
+    Items live in blocks of bounded size whose lengths are summed by a
+    Fenwick tree, and every key maps to the block holding it. Lookups by
+    key are O(1); positional reads, inserts, removals and moves cost
+    O(log n) plus a scan of one block.
+
+    copy() is O(1): both lists share every block and key bucket until one
+    of them is modified, at which point only the spine (one entry per
+    block) and the touched blocks are copied. Keys written to a shared
+    bucket are set aside in a small dict of changes, which replaces the
+    bucket with a private merged copy only once it holds an eighth as
+    many keys, so a write costs O(1) amortized.
+
+    Lists of ints can instead keep their blocks in arrays and their key
+    buckets in ArrayMaps, which costs about 12 bytes per item rather than
+    36, for O(log n) key lookups.
+    """
+
+    # Blocks are split in two once they grow past twice this size.
+    BLOCK_SIZE = 256
+    # Number of independently copied buckets the key map is split into.
+    KEY_BUCKETS = 64
+    # Changes kept aside for a shared bucket before it is copied, in
+    # addition to an eighth of its size.
+    BUCKET_CHANGES = 32
+
+    def __init__(self, items=(), key=None, typecode=None):
+        """IndexedList constructor.
+
+        Args:
+            items: Initial items, in order.
+            key: Function returning the unique key of an item, the item
+                itself by default.
+            typecode: If given, the items are ints, their own keys, and
+                are stored in arrays of this typecode.
+        """
+        if typecode is not None and key is not None:
+            raise ValueError("Items stored in arrays are their own keys")
+        self._key = key or (lambda item: item)
+        self._typecode = typecode
+        self.clear()
+        for item in items:
+            self.insert(self._size, item)
+
+    def clear(self):
+        """Removes every item."""
+        self._order = []
+        self._blocks = {}
+        self._rank = {}
+        # Buckets are created on first write; small lists only pay for
+        # the few they use.
+        self._where = [None] * self.KEY_BUCKETS
+        # Keys written to buckets shared with a copy: the uid of their
+        # block, or None once removed.
+        self._changes = [None] * self.KEY_BUCKETS
+        self._next_uid = 0
+        self._size = 0
+        self._fenwick = _Fenwick()
+        # Copy-on-write bookkeeping: whether the spine is shared with
+        # another list, and which blocks, buckets and changes this list
+        # owns.
+        self._shared = False
+        self._owned_blocks = None
+        self._owned_buckets = None
+        self._owned_changes = None
+
+    def copy(self):
+        """Returns a copy sharing all storage with this list until written."""
+        clone = IndexedList.__new__(IndexedList)
+        clone.__dict__.update(self.__dict__)
+        for items in (self, clone):
+            items._shared = True
+            items._owned_blocks = set()
+            items._owned_buckets = set()
+            items._owned_changes = set()
+        return clone
+
+    def _unshare(self):
+        """Gives this list its own spine before a modification."""
+        if self._shared:
+            self._order = list(self._order)
+            self._blocks = dict(self._blocks)
+            self._rank = dict(self._rank)
+            self._where = list(self._where)
+            self._changes = list(self._changes)
+            self._fenwick = self._fenwick.copy()
+            self._shared = False
+
+    def _writable_block(self, uid):
+        if self._owned_blocks is not None and uid not in self._owned_blocks:
+            self._blocks[uid] = self._blocks[uid][:]
+            self._owned_blocks.add(uid)
+        return self._blocks[uid]
+
+    def _uid(self, key):
+        """Returns the uid of the block holding a key, None if absent."""
+        index = hash(key) % self.KEY_BUCKETS
+        changes = self._changes[index]
+        if changes is not None and key in changes:
+            return changes[key]
+        bucket = self._where[index]
+        return None if bucket is None else bucket.get(key)
+
+    def _set_uids(self, index, pairs):
+        """Points keys of one bucket at their blocks.
+
+        Args:
+            index: The bucket of the keys.
+            pairs: (key, uid) pairs, uid being None to drop the key.
+        """
+        bucket = self._where[index]
+        owned = self._owned_buckets
+        if bucket is None or owned is None or index in owned:
+            if bucket is None:
+                bucket = self._where[index] = (
+                    {} if self._typecode is None else ArrayMap())
+                if owned is not None:
+                    owned.add(index)
+            _update_bucket(bucket, pairs)
+            return
+        changes = self._changes[index]
+        if changes is None:
+            changes = {}
+        elif index not in self._owned_changes:
+            changes = dict(changes)
+        self._changes[index] = changes
+        self._owned_changes.add(index)
+        changes.update(pairs)
+        if len(changes) > len(bucket) // 8 + self.BUCKET_CHANGES:
+            bucket = self._where[index] = bucket.copy()
+            owned.add(index)
+            _update_bucket(bucket, changes.items())
+            self._changes[index] = None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return self._uid(key) is not None
+
+    def __iter__(self):
+        for uid in self._order:
+            yield from self._blocks[uid]
+
+    def _new_block(self, items, keyed=None):
+        """Stores a block of items and returns its uid.
+
+        Args:
+            items: The items, as a list or an array of the list's typecode.
+            keyed: A list to append the (key, uid) pairs of the items to,
+                for _index_keys to add later; added right away if None.
+        """
+        uid = self._next_uid
+        self._next_uid += 1
+        if self._typecode is not None and not isinstance(items, array):
+            items = array(self._typecode, items)
+        self._blocks[uid] = items
+        if self._owned_blocks is not None:
+            self._owned_blocks.add(uid)
+        pairs = [(self._key(item), uid) for item in items]
+        if keyed is None:
+            self._index_keys(pairs)
+        else:
+            keyed.extend(pairs)
+        return uid
+
+    def _index_keys(self, pairs):
+        """Points keys at their blocks, one batch per bucket."""
+        buckets = {}
+        for key, uid in pairs:
+            buckets.setdefault(hash(key) % self.KEY_BUCKETS, []).append(
+                (key, uid))
+        for index, bucket_pairs in buckets.items():
+            self._set_uids(index, bucket_pairs)
+
+    def _reindex(self):
+        """Rebuilds block ranks and sizes after blocks were added or dropped."""
+        self._rank = {uid: i for i, uid in enumerate(self._order)}
+        self._fenwick.build(len(self._blocks[uid]) for uid in self._order)
+
+    def _locate(self, key):
+        uid = self._uid(key)
+        if uid is None:
+            raise KeyError(key)
+        block = self._blocks[uid]
+        if self._typecode is not None:
+            return uid, block.index(key)
+        for offset, item in enumerate(block):
+            if self._key(item) == key:
+                return uid, offset
+        raise KeyError(key)
+
+    def _check_index(self, index, upper):
+        if not 0 <= index < upper:
+            raise IndexError("IndexedList index out of range")
+
+    def get(self, key):
+        """Returns the item with the given key, None if it is missing."""
+        if key not in self:
+            return None
+        uid, offset = self._locate(key)
+        return self._blocks[uid][offset]
+
+    def index(self, key):
+        """Returns the position of the item with the given key."""
+        uid, offset = self._locate(key)
+        return self._fenwick.prefix(self._rank[uid]) + offset
+
+    def at(self, index):
+        """Returns the item at the given position."""
+        self._check_index(index, self._size)
+        block_index, offset = self._fenwick.find(index)
+        return self._blocks[self._order[block_index]][offset]
+
+    def slice(self, start, stop):
+        """Yields the items between two positions."""
+        start = max(start, 0)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return
+        block_index, offset = self._fenwick.find(start)
+        remaining = stop - start
+        while remaining:
+            block = self._blocks[self._order[block_index]]
+            chunk = block[offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            block_index += 1
+            offset = 0
+
+    def insert(self, index, item):
+        """Inserts an item before the given position.
+
+        Raises:
+            KeyError: if an item with the same key is already present.
+        """
+        self._check_index(index, self._size + 1)
+        key = self._key(item)
+        if key in self:
+            raise KeyError(key)
+        self._unshare()
+        if not self._order:
+            self._order.append(self._new_block([item]))
+            self._size = 1
+            self._reindex()
+            return
+        if index == self._size:
+            block_index = len(self._order) - 1
+            offset = len(self._blocks[self._order[block_index]])
+        else:
+            block_index, offset = self._fenwick.find(index)
+        uid = self._order[block_index]
+        block = self._writable_block(uid)
+        block.insert(offset, item)
+        self._set_uids(hash(key) % self.KEY_BUCKETS, [(key, uid)])
+        self._size += 1
+        if len(block) > 2 * self.BLOCK_SIZE:
+            tail = block[self.BLOCK_SIZE:]
+            del block[self.BLOCK_SIZE:]
+            self._order.insert(block_index + 1, self._new_block(tail))
+            self._reindex()
+        else:
+            self._fenwick.add(block_index, 1)
+
+    def append(self, item):
+        """Adds an item after the last position."""
+        self.insert(self._size, item)
+
+    def extend(self, items):
+        """Adds many items after the last position, filling whole blocks.
+
+        Raises:
+            KeyError: if an item's key is already present; the items before
+                it have been added.
+        """
+        self._unshare()
+        block, keys = [], set()
+        # The keys are indexed once at the end, so that array buckets are
+        # merged once rather than grown one key at a time.
+        keyed = []
+        filled = self._size > 0
+        try:
+            for item in items:
+                key = self._key(item)
+                if key in keys or (filled and key in self):
+                    raise KeyError(key)
+                block.append(item)
+                keys.add(key)
+                if len(block) == self.BLOCK_SIZE:
+                    self._order.append(self._new_block(block, keyed))
+                    self._size += len(block)
+                    block = []
+        finally:
+            if block:
+                self._order.append(self._new_block(block, keyed))
+                self._size += len(block)
+            self._index_keys(keyed)
+            self._reindex()
+
+    def replace(self, item):
+        """Swaps the stored item sharing the new item's key, keeping its place."""
+        uid, offset = self._locate(self._key(item))
+        self._unshare()
+        self._writable_block(uid)[offset] = item
+
+    def remove(self, key):
+        """Removes and returns the item with the given key."""
+        uid, offset = self._locate(key)
+        self._unshare()
+        block = self._writable_block(uid)
+        item = block.pop(offset)
+        self._set_uids(hash(key) % self.KEY_BUCKETS, [(key, None)])
+        self._size -= 1
+        if block:
+            self._fenwick.add(self._rank[uid], -1)
+        else:
+            del self._order[self._rank[uid]]
+            del self._blocks[uid]
+            self._reindex()
+        return item
+
+    def move(self, key, index):
+        """Moves the item with the given key to a new position."""
+        self._check_index(index, self._size)
+        self.insert(index, self.remove(key))
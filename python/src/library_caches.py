@@ -0,0 +1,59 @@
+"""A library caches class."""
+
+from .random_pool import RandomPool
+from .title_suggestions import TitleSuggestions
+
+
+class LibraryCaches:
+    """A class used to hold the indexes SUGGEST and PLAY_RANDOM read.
+
+    Both cover the whole library, flagged videos included, and are built
+    on first use. They are shared by every session serving the library,
+    each of which skips its own flagged videos when reading them, so
+    their memory does not grow with the number of sessions.
+    """
+
+    def __init__(self, video_library, score=None):
+        """LibraryCaches constructor.
+
+        Args:
+            video_library: The library the indexes cover.
+            score: Returns the popularity of a video_id, which SUGGEST
+                ranks by.
+        """
+        self._video_library = video_library
+        self._score = score
+        self._suggestions = None
+        self._random_pool = None
+
+    def suggestions(self):
+        """Returns the TitleSuggestions of every video, building it if needed."""
+        if self._suggestions is None:
+            self._suggestions = TitleSuggestions(
+                self._video_library.get_all_videos(), self._score)
+        return self._suggestions
+
+    def random_pool(self):
+        """Returns the RandomPool of every video_id, building it if needed."""
+        if self._random_pool is None:
+            self._random_pool = RandomPool(
+                video.video_id for video in self._video_library.get_all_videos())
+        return self._random_pool
+
+    def record_play(self, video_id):
+        """Moves a video up the suggestions after it was played."""
+        if self._suggestions is not None:
+            self._suggestions.update(video_id)
+
+    def apply_diff(self, diff):
+        """Follows a LibraryDiff applied to the library.
+
+        Args:
+            diff: The LibraryDiff the library was changed by.
+        """
+        if self._random_pool is not None:
+            self._random_pool.discard_all(video.video_id for video in diff.removed)
+            self._random_pool.add_all(video.video_id for video in diff.added)
+        if diff:
+            # Changed titles move videos across the whole index.
+            self._suggestions = None
@@ -0,0 +1,102 @@
+"""A background library loader class."""
+
+from concurrent import futures
+import sys
+import threading
+import time
+
+
+class LibraryLoader:
+    """A class used to load a video library on a background thread.
+
+    The loader stands in for the library it loads: attribute lookups wait
+    for the load to finish and are then forwarded to the library. A
+    VideoPlayer given the loader thus answers the commands that never
+    touch the catalogue at once, and any other command waits for it.
+    Completions are the exception: they must not freeze the prompt, so
+    there are none until the library is ready.
+    """
+
+    def __init__(self, load, clock=time.monotonic):
+        """LibraryLoader constructor. The load starts right away.
+
+        Args:
+            load: Called on the loader's thread with a progress callable,
+                which it gives the number of videos read so far, and
+                returns the library.
+            clock: Returns the current time in seconds.
+        """
+        # Resolved with the library, or the exception raised loading it.
+        self.future = futures.Future()
+        self._clock = clock
+        self._started = clock()
+        self._videos_read = 0
+        self._thread = threading.Thread(
+            target=self._run, args=(load,), name="library-loader",
+            daemon=True)
+        self._thread.start()
+
+    def _run(self, load):
+        self.future.set_running_or_notify_cancel()
+        try:
+            library = load(self._progress)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(library)
+
+    def _progress(self, videos_read):
+        self._videos_read = videos_read
+
+    def ready(self):
+        """Returns whether the load has finished, successfully or not."""
+        return self.future.done()
+
+    def wait(self, interval=0.2, file=None):
+        """Waits for the load, showing the number of videos read so far.
+
+        Nothing is shown if the load has already finished.
+
+        Args:
+            interval: Seconds between two updates of the progress line.
+            file: Where progress is shown, sys.stderr by default.
+
+        Returns:
+            The library; the exception raised loading it is re-raised.
+        """
+        if self.future.done():
+            return self.future.result()
+        file = sys.stderr if file is None else file
+        try:
+            while True:
+                shown = f"Loading video library: {self._videos_read} videos read"
+                print("\r" + shown, end="", file=file, flush=True)
+                try:
+                    library = self.future.result(interval)
+                except futures.TimeoutError:
+                    continue
+                done = (f"Loaded video library: {len(library)} videos in "
+                        f"{self._clock() - self._started:.1f}s")
+                # Padded to overwrite the whole progress line.
+                print("\r" + done.ljust(len(shown)), file=file)
+                return library
+        except BaseException:
+            print(file=file)
+            raise
+
+    def __len__(self):
+        return len(self.future.result())
+
+    def complete_ids(self, prefix, limit):
+        """Returns the library's completions, or none while it loads.
+
+        Args:
+            prefix: The start of the video ids.
+            limit: Maximum number of ids returned.
+        """
+        if not self.future.done() or self.future.exception() is not None:
+            return []
+        return self.future.result().complete_ids(prefix, limit)
+
+    def __getattr__(self, name):
+        return getattr(self.future.result(), name)
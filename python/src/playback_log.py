@@ -0,0 +1,155 @@
+"""A playback event log class."""
+
+from pathlib import Path
+import threading
+import time
+
+# What emit does when the ring buffer is full.
+POLICIES = ("drop", "block")
+
+
+class PlaybackEventLog:
+    """A class used to write playback events to rotating files off-thread.
+
+    emit() only stores a (timestamp, event, video_id) tuple in a fixed
+    size ring buffer; a background thread drains it in batches, writing
+    one tab separated line per event. Producers only advance the tail,
+    under a lock of their own so events may come from any thread, and
+    the writer only advances the head, so the writer is never waited on
+    unless the "block" policy finds the buffer full. Should the writer
+    die, a full buffer drops events whatever the policy.
+    """
+
+    def __init__(self, path, capacity=4096, policy="drop", batch_size=256,
+                 max_bytes=1 << 20, backups=5, flush_interval=0.5,
+                 clock=time.time):
+        """PlaybackEventLog constructor; starts the writer thread.
+
+        Args:
+            path: The log file; full files are renamed path.1, path.2...
+            capacity: Number of events the ring buffer holds.
+            policy: "drop" to discard events while the buffer is full,
+                "block" to wait for the writer to make room.
+            batch_size: Buffered events that wake the writer early.
+            max_bytes: Size after which the log file is rotated.
+            backups: Number of rotated files kept.
+            flush_interval: Longest, in seconds, an event stays buffered.
+            clock: Returns the timestamp stored with each event.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy}, expected one of "
+                             f"{', '.join(POLICIES)}")
+        self._path = Path(path)
+        self._capacity = capacity
+        self._policy = policy
+        self._batch_size = min(batch_size, capacity)
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._slots = [None] * capacity
+        # Total events ever read and written; slot = counter % capacity.
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+        self._closed = False
+        self._emitting = threading.Lock()
+        self._wake = threading.Event()
+        self._drained = threading.Condition()
+        self._file = open(self._path, "a")
+        self._thread = threading.Thread(
+            target=self._run, name="playback-event-log", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        """Returns the number of events waiting to be written."""
+        return self._tail - self._head
+
+    def emit(self, event, video_id):
+        """Buffers one playback event.
+
+        Args:
+            event: The transition, e.g. "PLAY" or "PAUSE".
+            video_id: The video it applies to.
+
+        Returns:
+            False if the event was dropped.
+        """
+        with self._emitting:
+            tail = self._tail
+            if tail - self._head >= self._capacity:
+                if self._policy == "drop" or not self._writing():
+                    self.dropped += 1
+                    return False
+                self._wake.set()
+                with self._drained:
+                    while tail - self._head >= self._capacity:
+                        if not self._writing():
+                            self.dropped += 1
+                            return False
+                        self._drained.wait(self._flush_interval)
+            self._slots[tail % self._capacity] = (
+                self._clock(), event, video_id)
+            self._tail = tail + 1
+            if tail + 1 - self._head >= self._batch_size:
+                self._wake.set()
+            return True
+
+    def _writing(self):
+        """Whether the writer thread will still make room in the buffer."""
+        return not self._closed and self._thread.is_alive()
+
+    def flush(self):
+        """Waits until every event emitted so far has been written."""
+        target = self._tail
+        self._wake.set()
+        with self._drained:
+            while self._head < target and self._thread.is_alive():
+                self._drained.wait(self._flush_interval)
+
+    def close(self):
+        """Writes the buffered events and stops the writer thread."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            self._drain()
+            if self._closed and self._head == self._tail:
+                break
+
+    def _drain(self):
+        head, tail = self._head, self._tail
+        if head == tail:
+            return
+        slots, capacity = self._slots, self._capacity
+        lines = []
+        for i in range(head, tail):
+            timestamp, event, video_id = slots[i % capacity]
+            slots[i % capacity] = None
+            lines.append(f"{timestamp:.6f}\t{event}\t{video_id}\n")
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self._file.tell() >= self._max_bytes:
+            self._rotate()
+        with self._drained:
+            self._head = tail
+            self._drained.notify_all()
+
+    def _rotate(self):
+        """Renames path to path.1, path.1 to path.2... and reopens path."""
+        self._file.close()
+        for index in range(self._backups - 1, 0, -1):
+            older = self._path.with_name(f"{self._path.name}.{index}")
+            if older.exists():
+                older.replace(self._path.with_name(
+                    f"{self._path.name}.{index + 1}"))
+        if self._backups:
+            self._path.replace(self._path.with_name(f"{self._path.name}.1"))
+        else:
+            self._path.unlink()
+        self._file = open(self._path, "a")
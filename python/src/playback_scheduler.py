@@ -0,0 +1,73 @@
+"""A playback scheduler class."""
+
+from .timer_wheel import TimerWheel
+import time
+import zlib
+
+
+def simulated_duration(video_id):
+    """Returns a stable made-up duration, 1 to 10 minutes, for a video.
+
+    The catalogue carries no durations, so one is derived from the id.
+    """
+    return 60 + zlib.crc32(video_id.encode()) % 540
+
+
+class PlaybackScheduler:
+    """A class used to fire the end-of-video timers of many players.
+
+    Every VideoPlayer of the process shares one scheduler by default, so
+    any number of sessions cost one TimerWheel entry each rather than a
+    timer or thread each. Nothing runs in the background: the wheel is
+    advanced when a player handles its next command.
+    """
+
+    def __init__(self, resolution=1.0, start=None):
+        """PlaybackScheduler constructor.
+
+        Args:
+            resolution: Seconds per tick of the underlying TimerWheel.
+            start: The time the wheel starts at, now by default.
+        """
+        self._wheel = TimerWheel(
+            resolution, start=time.monotonic() if start is None else start)
+
+    def __len__(self):
+        return len(self._wheel)
+
+    def schedule(self, callback, deadline):
+        """Calls callback, without arguments, once deadline has passed.
+
+        The callback is also the timer's key: scheduling it again moves
+        its timer. Bound methods of the same object compare equal, so a
+        player's method always refers to that player's one timer.
+        """
+        self._wheel.schedule(callback, deadline)
+
+    def cancel(self, callback):
+        """Cancels the timer of a callback, if any."""
+        self._wheel.cancel(callback)
+
+    def advance(self, now):
+        """Runs the callbacks of every timer due at or before now.
+
+        Callbacks may schedule new timers that are already due, e.g. when
+        several queued videos ended while a session was idle; those run
+        in the same call.
+        """
+        expired = self._wheel.advance(now)
+        while expired:
+            for callback in expired:
+                callback()
+            expired = self._wheel.advance(now)
+
+
+_shared_scheduler = None
+
+
+def shared_scheduler():
+    """Returns the process wide PlaybackScheduler, creating it on first use."""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        _shared_scheduler = PlaybackScheduler()
+    return _shared_scheduler
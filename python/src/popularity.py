@@ -0,0 +1,195 @@
+"""Streaming popularity tracking classes."""
+
+from array import array
+import heapq
+import time
+import zlib
+
+
+class CountMinSketch:
+    """A class used to estimate the counts of a stream in fixed memory.
+
+    Every key increments one counter in each of depth rows of width
+    counters. Estimates never undercount, and overcount by at most
+    e / width of the stream total with probability 1 - e ** -depth.
+    Updates are conservative: only the counters holding the current
+    minimum grow, which keeps the overcount well below that bound.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        """CountMinSketch constructor.
+
+        Args:
+            width: Counters per row.
+            depth: Number of rows, each hashing keys differently.
+        """
+        self._width = width
+        self._depth = depth
+        self._counters = array("d", bytes(8 * width * depth))
+
+    def _indexes(self, key):
+        # Double hashing derives every row's hash from two checksums;
+        # unlike hash() they do not change between runs, so neither do
+        # the estimates.
+        data = key.encode()
+        h1 = zlib.crc32(data)
+        h2 = zlib.adler32(data) | 1
+        width = self._width
+        return [row * width + (h1 + row * h2) % width
+                for row in range(self._depth)]
+
+    def add(self, key, amount=1.0):
+        """Adds amount to the count of key and returns its new estimate."""
+        counters = self._counters
+        indexes = self._indexes(key)
+        estimate = min(counters[i] for i in indexes) + amount
+        for i in indexes:
+            if counters[i] < estimate:
+                counters[i] = estimate
+        return estimate
+
+    def estimate(self, key):
+        """Returns an upper bound of the count of key."""
+        counters = self._counters
+        return min(counters[i] for i in self._indexes(key))
+
+    def scale(self, factor):
+        """Multiplies every count by factor."""
+        counters = self._counters
+        for i in range(len(counters)):
+            counters[i] *= factor
+
+
+class SpaceSaving:
+    """A class used to keep the heaviest keys of a stream in fixed memory.
+
+    At most capacity keys are monitored. A new key replaces the one with
+    the smallest count and inherits that count, so any key whose true
+    count exceeds total / capacity is guaranteed to be monitored. The
+    smallest count is found through a min-heap whose stale entries are
+    skipped lazily and compacted away once they outnumber the live ones.
+    """
+
+    def __init__(self, capacity=100):
+        """SpaceSaving constructor.
+
+        Args:
+            capacity: Number of keys monitored.
+        """
+        self._capacity = capacity
+        self._counts = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, key, amount=1.0):
+        """Adds amount to the count of key, monitoring it if needed."""
+        counts = self._counts
+        if key in counts:
+            count = counts[key] + amount
+        elif len(counts) < self._capacity:
+            count = amount
+        else:
+            while True:
+                smallest, evicted = heapq.heappop(self._heap)
+                if counts.get(evicted) == smallest:
+                    break
+            del counts[evicted]
+            count = smallest + amount
+        counts[key] = count
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 2 * self._capacity + 16:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(count, key) for key, count in self._counts.items()]
+        heapq.heapify(self._heap)
+
+    def items(self):
+        """Returns the monitored (key, count) pairs."""
+        return self._counts.items()
+
+    def scale(self, factor):
+        """Multiplies every count by factor."""
+        for key in self._counts:
+            self._counts[key] *= factor
+        self._rebuild()
+
+
+class PopularityTracker:
+    """A class used to rank the most frequent keys of a stream.
+
+    Counts live in a CountMinSketch and the top candidates in a
+    SpaceSaving summary; a candidate's count is the smaller of their two
+    overestimates. Memory is fixed whatever the number of distinct keys.
+
+    With a half life, counts decay exponentially. Rather than touching
+    every counter as time passes, later events are given exponentially
+    larger weights (forward decay) and the weights are divided out when
+    reading; everything is renormalised once the weights grow large.
+    """
+
+    # Weights past 2 ** this rescale every count, avoiding overflow.
+    _MAX_EXPONENT = 40
+
+    def __init__(self, width=2048, depth=4, capacity=100, half_life=None,
+                 clock=time.monotonic):
+        """PopularityTracker constructor.
+
+        Args:
+            width: Counters per row of the Count-Min sketch.
+            depth: Rows of the Count-Min sketch.
+            capacity: Number of candidate keys monitored for the ranking.
+            half_life: Seconds over which a count halves, None to never
+                decay.
+            clock: Returns the current time in seconds.
+        """
+        self._sketch = CountMinSketch(width, depth)
+        self._top = SpaceSaving(capacity)
+        self._half_life = half_life
+        self._clock = clock
+        self._landmark = clock()
+
+    def _weight(self):
+        if self._half_life is None:
+            return 1.0
+        now = self._clock()
+        exponent = (now - self._landmark) / self._half_life
+        if exponent > self._MAX_EXPONENT:
+            # Underflows to zero, rather than overflowing, after long idles.
+            factor = 2.0 ** -exponent
+            self._sketch.scale(factor)
+            self._top.scale(factor)
+            self._landmark = now
+            return 1.0
+        return 2.0 ** exponent
+
+    def record(self, key):
+        """Counts one occurrence of key."""
+        weight = self._weight()
+        self._sketch.add(key, weight)
+        self._top.add(key, weight)
+
+    def estimate(self, key):
+        """Returns the (decayed) count of key, possibly overestimated."""
+        return self._sketch.estimate(key) / self._weight()
+
+    def top(self, n, include=None):
+        """Returns the n keys with the highest counts.
+
+        Args:
+            n: Number of keys wanted, at most the monitored capacity.
+            include: Optional predicate a key must satisfy to be listed.
+
+        Returns:
+            (key, count) pairs, highest count first, ties by key.
+        """
+        weight = self._weight()
+        ranked = []
+        for key, count in self._top.items():
+            if include is None or include(key):
+                count = min(count, self._sketch.estimate(key))
+                ranked.append((-count, key))
+        return [(key, -count / weight)
+                for count, key in heapq.nsmallest(n, ranked)]
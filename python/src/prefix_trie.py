@@ -0,0 +1,206 @@
+"""A compressed prefix trie class."""
+
+
+class _Node:
+    """A trie node, reached from its parent by the edge label."""
+
+    __slots__ = ("label", "children", "terminal", "data")
+
+    def __init__(self, label, children=None, terminal=False):
+        self.label = label
+        # Maps the first character of each child's label to the child;
+        # None for leaves, which are the bulk of the nodes.
+        self.children = children
+        self.terminal = terminal
+        # Free for users of the trie, e.g. to cache what lies below the
+        # node; new nodes, including those made by splitting an edge,
+        # start with None.
+        self.data = None
+
+
+class PrefixTrie:
+    """A class used to complete keys from a prefix.
+
+    Chains of single-child nodes are merged into one edge labelled with
+    the whole substring (a radix tree), so there are at most two nodes
+    per key whatever the key lengths. Reaching the node of a prefix costs
+    O(len(prefix)); each completion then costs the depth of its node.
+    """
+
+    def __init__(self, keys=()):
+        """PrefixTrie constructor.
+
+        Args:
+            keys: Keys to insert.
+        """
+        self._root = _Node("", {})
+        self._size = 0
+        for key in keys:
+            self.insert(key)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        node, rest = self._find(key)
+        return node is not None and not rest and node.terminal
+
+    def _find(self, prefix):
+        """Returns the highest node whose path starts with prefix.
+
+        Returns:
+            (node, extra) where extra is the part of the node's label past
+            the end of prefix, or (None, None) if no key has the prefix.
+        """
+        node = self._root
+        depth = 0
+        while depth < len(prefix):
+            child = node.children.get(prefix[depth]) if node.children else None
+            if child is None:
+                return None, None
+            label = child.label
+            overlap = min(len(label), len(prefix) - depth)
+            if label[:overlap] != prefix[depth:depth + overlap]:
+                return None, None
+            node = child
+            depth += overlap
+            if overlap < len(label):
+                return node, label[overlap:]
+        return node, ""
+
+    def node(self, prefix):
+        """Returns the node every key starting with prefix lies under.
+
+        Returns:
+            The node, the root for an empty prefix, or None if no key
+            starts with prefix.
+        """
+        return self._find(prefix)[0]
+
+    def nodes(self, key):
+        """Returns the nodes on the path to a key, root first.
+
+        Args:
+            key: A key present in the trie.
+        """
+        node = self._root
+        path = [node]
+        depth = 0
+        while depth < len(key):
+            node = node.children[key[depth]]
+            path.append(node)
+            depth += len(node.label)
+        return path
+
+    def insert(self, key):
+        """Adds a key, doing nothing if it is already present."""
+        node = self._root
+        depth = 0
+        while True:
+            if depth == len(key):
+                if not node.terminal:
+                    node.terminal = True
+                    self._size += 1
+                return
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(key[depth])
+            if child is None:
+                node.children[key[depth]] = _Node(key[depth:], terminal=True)
+                self._size += 1
+                return
+            label = child.label
+            common = 0
+            limit = min(len(label), len(key) - depth)
+            while common < limit and label[common] == key[depth + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge where the key leaves it.
+                child.label = label[common:]
+                middle = _Node(label[:common], {label[common]: child})
+                node.children[key[depth]] = middle
+                child = middle
+            node = child
+            depth += common
+
+    def remove(self, key):
+        """Removes a key, doing nothing if it is absent.
+
+        Nodes left without a key below them are dropped, and a node left
+        with a single child is merged with it, so the trie stays as small
+        as if the key had never been inserted.
+        """
+        path = [self._root]
+        depth = 0
+        while depth < len(key):
+            node = path[-1]
+            child = node.children.get(key[depth]) if node.children else None
+            if child is None or not key.startswith(child.label, depth):
+                return
+            path.append(child)
+            depth += len(child.label)
+        node = path[-1]
+        if depth != len(key) or not node.terminal:
+            return
+        node.terminal = False
+        self._size -= 1
+        while len(path) > 1 and not node.terminal:
+            parent = path[-2]
+            if not node.children:
+                del parent.children[node.label[0]]
+                if not parent.children:
+                    parent.children = None
+            elif len(node.children) == 1:
+                (child,) = node.children.values()
+                child.label = node.label + child.label
+                parent.children[node.label[0]] = child
+            else:
+                return
+            path.pop()
+            node = parent
+
+    def complete(self, prefix, limit=None):
+        """Returns the keys starting with prefix, in sorted order.
+
+        Args:
+            prefix: The start every returned key shares.
+            limit: Maximum number of keys returned, all if None. When more
+                keys match, the last one returned is the greatest match so
+                the list keeps the common prefix of every match, which is
+                what a line editor extends the word to.
+        """
+        node, extra = self._find(prefix)
+        if node is None or limit == 0:
+            return []
+        top = (prefix + extra, node)
+        matches = []
+        # Children are visited lazily so a short listing from a crowded
+        # prefix does not touch the siblings it never reaches.
+        stack = [iter([top])]
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+            path, node = entry
+            if node.terminal:
+                if limit is not None and len(matches) == limit - 1:
+                    matches.append(self._greatest(*top))
+                    return matches
+                matches.append(path)
+            if node.children:
+                stack.append(self._children(path, node))
+        return matches
+
+    @staticmethod
+    def _children(path, node):
+        for first in sorted(node.children):
+            child = node.children[first]
+            yield path + child.label, child
+
+    @staticmethod
+    def _greatest(path, node):
+        while node.children:
+            node = node.children[max(node.children)]
+            path += node.label
+        return path
@@ -0,0 +1,95 @@
+"""A random pool class."""
+
+import random
+
+
+class RandomPool:
+    """A class used to represent a set supporting O(1) random draws.
+
+    Members are kept in a list with a position map, so adds, discards
+    (swap with the last member) and draws are all O(1).
+    """
+
+    # Draws rejected before choosing among the accepted members directly.
+    REJECTIONS = 16
+
+    def __init__(self, members=()):
+        self._members = []
+        self._positions = {}
+        self.add_all(members)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, member):
+        return member in self._positions
+
+    def add_all(self, members):
+        """Adds every member not already in the pool."""
+        for member in members:
+            if member not in self._positions:
+                self._positions[member] = len(self._members)
+                self._members.append(member)
+
+    def discard_all(self, members):
+        """Removes every given member that is in the pool."""
+        for member in members:
+            position = self._positions.pop(member, None)
+            if position is None:
+                continue
+            last = self._members.pop()
+            if position < len(self._members):
+                self._members[position] = last
+                self._positions[last] = position
+
+    def choice(self, rng=random, include=None):
+        """Returns a random member, None if the pool is empty.
+
+        Members failing include are drawn again, so a pool shared by
+        callers who each exclude a few members serves them all without a
+        copy. After REJECTIONS failed draws the accepted members are
+        listed and one of them chosen, which keeps the draw uniform when
+        most members are excluded.
+
+        Args:
+            rng: The random.Random to draw with.
+            include: Optional predicate the member must satisfy.
+        """
+        members = self._members
+        if not members:
+            return None
+        if include is None:
+            return members[rng.randrange(len(members))]
+        for _ in range(self.REJECTIONS):
+            member = members[rng.randrange(len(members))]
+            if include(member):
+                return member
+        accepted = [member for member in members if include(member)]
+        return accepted[rng.randrange(len(accepted))] if accepted else None
+
+
+class FilteredPool:
+    """A class used to draw from the members of a RandomPool satisfying a
+    predicate, without copying them.
+
+    Draws like an AliasTable of equal weights, so it can stand in for one.
+    """
+
+    def __init__(self, pool, include, size):
+        """FilteredPool constructor.
+
+        Args:
+            pool: The RandomPool to draw from.
+            include: The predicate a member drawn must satisfy.
+            size: The number of members satisfying it.
+        """
+        self._pool = pool
+        self._include = include
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def sample(self, rng=random):
+        """Returns a random accepted member, None if there is none."""
+        return self._pool.choice(rng, self._include)
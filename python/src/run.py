@@ -2,20 +2,165 @@
 from .video_player import VideoPlayer
 from .command_parser import CommandException
 from .command_parser import CommandParser
+from .command_parser import DEFAULT_PROFILE_DIR
+from .video_library import DEFAULT_CATALOGUE, VideoLibrary
+from .sqlite_video_library import SqliteVideoLibrary
+from .catalogue_watcher import CatalogueWatcher
+from .library_loader import LibraryLoader
+from .command_completer import CommandCompleter
+from .command_stats import CommandStats
+from .command_trace import CommandTraceRecorder
+from .playback_log import POLICIES, PlaybackEventLog
+import argparse
+import queue
+import random
+
+
+# Commands answered at once, while the catalogue may still be loading.
+NO_LIBRARY_COMMANDS = ("HELP", "CREATE_PLAYLIST")
+
+
+def _positive_int(value):
+    """Converts an argument that must be a whole number of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def _diff_library(video_player, pending):
+    """Diffs the changed catalogue, on the watcher's thread."""
+    try:
+        pending.put(video_player.diff_library())
+    except (OSError, ValueError) as e:
+        pending.put(e)
+
+
+def _apply_pending_diff(video_player, pending):
+    """Applies the latest diff the watcher left, between two commands."""
+    prepared = None
+    while True:
+        try:
+            prepared = pending.get_nowait()
+        except queue.Empty:
+            break
+    if isinstance(prepared, Exception):
+        print(f"Cannot reload library: {prepared}")
+    elif prepared is not None:
+        video_player.apply_library_diff(prepared)
+
+
+def _wait_for_library(video_library):
+    """Waits for the catalogue to load, returning whether it did."""
+    try:
+        video_library.wait()
+    except (OSError, ValueError) as e:
+        print(f"Cannot load video library: {e}")
+        return False
+    return True
+
+
+def _parse_args():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--catalogue", default=DEFAULT_CATALOGUE,
+        help="Video catalogue to load, optionally gzip, xz or bz2 compressed.")
+    arg_parser.add_argument(
+        "--library", choices=("memory", "sqlite"), default="memory",
+        help="Storage backend for the video catalogue.")
+    arg_parser.add_argument(
+        "--db", default=":memory:",
+        help="SQLite database file used by the sqlite backend.")
+    arg_parser.add_argument(
+        "--watch", type=float, metavar="SECONDS",
+        help="Poll the catalogue and reload it when it changes.")
+    arg_parser.add_argument(
+        "--no-stats", action="store_true",
+        help="Do not record per-command statistics.")
+    arg_parser.add_argument(
+        "--stats-sample", type=_positive_int, default=8, metavar="N",
+        help="Time one command in N for the latency histograms.")
+    arg_parser.add_argument(
+        "--profile-dir", default=DEFAULT_PROFILE_DIR,
+        help="Directory PROFILE and PROFILE_NEXT write their reports to.")
+    arg_parser.add_argument(
+        "--record-trace", metavar="PATH",
+        help="Record every command with a timestamp, for bench.replay.")
+    arg_parser.add_argument(
+        "--seed", type=int,
+        help="Seed PLAY_RANDOM so its draws can be reproduced.")
+    arg_parser.add_argument(
+        "--event-log", metavar="PATH",
+        help="Write playback events to this file, rotated as it grows.")
+    arg_parser.add_argument(
+        "--event-log-policy", choices=POLICIES, default="drop",
+        help="Whether to drop events or wait when the event buffer is full.")
+    arg_parser.add_argument(
+        "--event-log-capacity", type=int, default=4096, metavar="N",
+        help="Number of playback events buffered in memory.")
+    return arg_parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = _parse_args()
     print("""Hello and welcome to YouTube, what would you like to do?
     Enter HELP for list of available commands or EXIT to terminate.""")
-    video_player = VideoPlayer()
-    parser = CommandParser(video_player)
+    # The catalogue loads in the background while the prompt is shown.
+    if args.library == "sqlite":
+        video_library = LibraryLoader(lambda progress: SqliteVideoLibrary(
+            args.db, args.catalogue, progress))
+    else:
+        video_library = LibraryLoader(
+            lambda progress: VideoLibrary(args.catalogue, progress))
+    event_log = (PlaybackEventLog(args.event_log, args.event_log_capacity,
+                                  args.event_log_policy)
+                 if args.event_log else None)
+    video_player = VideoPlayer(
+        video_library, event_log=event_log,
+        rng=None if args.seed is None else random.Random(args.seed))
+    parser = CommandParser(
+        video_player,
+        None if args.no_stats else CommandStats(args.stats_sample),
+        args.profile_dir)
+    # The watcher thread re-reads the catalogue and leaves the diff here;
+    # only applying it runs on this thread, between two commands.
+    pending_diffs = queue.SimpleQueue()
+    if args.watch:
+        CatalogueWatcher(
+            args.catalogue,
+            lambda: _diff_library(video_player, pending_diffs),
+            args.watch).start()
+    try:
+        import readline
+    except ImportError:
+        # Not available on Windows; commands are then typed in full.
+        pass
+    else:
+        CommandCompleter(video_player).install(readline)
+    recorder = (CommandTraceRecorder(args.record_trace)
+                if args.record_trace else None)
     while True:
         command = input("YT> ")
         if command.upper() == "EXIT":
             break
+        if recorder:
+            recorder.record(command)
+        words = command.split()
+        if not words or words[0].upper() not in NO_LIBRARY_COMMANDS:
+            # Returns at once when the catalogue has loaded. A catalogue
+            # that failed to load leaves only NO_LIBRARY_COMMANDS working.
+            if not _wait_for_library(video_library):
+                continue
+            _apply_pending_diff(video_player, pending_diffs)
         try:
-            parser.execute_command(command.split())
+            parser.execute_command(words)
         except CommandException as e:
             print(e)
+    if recorder:
+        recorder.close()
+    if event_log:
+        event_log.close()
+        if event_log.dropped:
+            print(f"{event_log.dropped} playback events were dropped")
     print("YouTube has now terminated its execution. "
           "Thank you and goodbye!")
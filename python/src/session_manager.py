@@ -0,0 +1,252 @@
+"""A multi-tenant session manager class."""
+
+from .command_parser import CommandParser
+from .library_caches import LibraryCaches
+from .playback_scheduler import PlaybackScheduler, shared_scheduler
+from .popularity import PopularityTracker
+from .video_library import VideoLibrary
+from .video_player import TRENDING_HALF_LIFE, VideoPlayer
+from collections import OrderedDict
+from pathlib import Path
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+
+# Number of sessions kept in memory by default.
+ACTIVE_SESSIONS = 1000
+
+# Estimated bytes of an active session with its player and parser, of a
+# playlist, of a playlist video with its reverse index entry, of a flag
+# or queued video and of a video held for PLAY_RANDOM draws; rounded up
+# from tracemalloc measurements.
+SESSION_BYTES = 2048
+PLAYLIST_BYTES = 2048
+VIDEO_BYTES = 448
+ENTRY_BYTES = 16
+DRAW_BYTES = 80
+
+# Commands that can grow a session, refused once it is over its quota.
+GROWING_COMMANDS = frozenset((
+    "CREATE_PLAYLIST", "ADD_TO_PLAYLIST", "BULK_ADD_TO_PLAYLIST",
+    "DUPLICATE_PLAYLIST", "PLAYLIST_UNION", "PLAYLIST_INTERSECTION",
+    "PLAYLIST_DIFFERENCE", "SNAPSHOT_PLAYLIST", "PLAY_PLAYLIST",
+    "FLAG_VIDEO", "BULK_FLAG_VIDEO", "FLAG_MATCHING",
+))
+
+
+def estimate_bytes(num_playlists, num_videos, num_entries, num_drawn=0):
+    """Returns the estimated memory of a session holding so much state.
+
+    Args:
+        num_playlists: The number of playlists.
+        num_videos: The number of videos held by playlists and snapshots.
+        num_entries: The number of flags and queued videos.
+        num_drawn: The number of videos held for PLAY_RANDOM draws.
+    """
+    return (SESSION_BYTES + PLAYLIST_BYTES * num_playlists
+            + VIDEO_BYTES * num_videos + ENTRY_BYTES * num_entries
+            + DRAW_BYTES * num_drawn)
+
+
+class SessionManager:
+    """A class used to run the commands of many tenants in one process.
+
+    Every tenant gets its own VideoPlayer, with its own playlists, flags
+    and playback, all serving the same library, popularity rankings and
+    playback scheduler. Only the most recently used sessions stay in
+    memory: the least recently used one is saved to disk whenever there
+    are more than max_active, or their estimated memory passes the
+    budget, and is loaded again by its tenant's next command. Memory thus
+    depends on the active sessions alone, however many tenants there are.
+    The estimate counts the caches a session builds for its PLAY_RANDOM
+    draws, which are not saved. The SUGGEST index and the random pool of
+    the whole library are built once and shared by every session.
+
+    A saved session is a zlib compressed JSON document under a name
+    derived from a hash of the tenant, in one of 256 subdirectories so
+    that no directory grows too large.
+    """
+
+    def __init__(self, directory, video_library=None,
+                 max_active=ACTIVE_SESSIONS, memory_budget=None, quota=None,
+                 clock=time.monotonic, wall_clock=time.time, stats=None):
+        """SessionManager constructor.
+
+        Args:
+            directory: Directory the idle sessions are saved to.
+            video_library: The library every session serves videos from,
+                an in-memory VideoLibrary by default.
+            max_active: Most sessions kept in memory at a time.
+            memory_budget: Most estimated bytes of the sessions kept in
+                memory, None for no limit beyond max_active.
+            quota: Estimated bytes of saved state past which a tenant's
+                commands that would grow its session are refused, None for
+                no quota.
+            clock: Returns the current time in seconds.
+            wall_clock: Returns the seconds since the epoch, stored with a
+                saved session to tell how long it was idle, even when it
+                is loaded by a later process.
+            stats: A CommandStats every session records its commands in.
+        """
+        self._directory = Path(directory)
+        if video_library is None:
+            video_library = VideoLibrary()
+        self._video_library = video_library
+        self._max_active = max_active
+        self._memory_budget = memory_budget
+        self._quota = quota
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._stats = stats
+        self._popularity = (
+            PopularityTracker(clock=clock),
+            PopularityTracker(half_life=TRENDING_HALF_LIFE, clock=clock))
+        self._caches = LibraryCaches(video_library, self._popularity[0].estimate)
+        self._scheduler = (shared_scheduler() if clock is time.monotonic
+                           else PlaybackScheduler(start=clock()))
+        # (player, parser) of the sessions in memory, least recently
+        # used first, and the estimated bytes of each.
+        self._sessions = OrderedDict()
+        self._sizes = {}
+        self._active_bytes = 0
+        self.loads = 0
+        self.saves = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, tenant):
+        return tenant in self._sessions
+
+    def active_bytes(self):
+        """Returns the estimated memory of the sessions in memory."""
+        return self._active_bytes
+
+    def session_bytes(self, tenant):
+        """Returns the estimated memory of a session in memory."""
+        return self._sizes[tenant]
+
+    def _path(self, tenant):
+        digest = hashlib.sha1(tenant.encode("utf-8")).hexdigest()
+        return self._directory / digest[:2] / f"{digest}.session"
+
+    def execute(self, tenant, command):
+        """Executes a command in the session of a tenant.
+
+        The session is loaded from disk, or started, if it is not in
+        memory. Raises CommandException if the command cannot be parsed.
+
+        Args:
+            tenant: The name of the tenant.
+            command: The command words, as for CommandParser.
+        """
+        player, parser = self._session(tenant)
+        try:
+            if (self._quota is not None and command
+                    and command[0].upper() in GROWING_COMMANDS
+                    and estimate_bytes(*player.state_size()[:3])
+                    > self._quota):
+                print(f"Cannot {command[0].lower()}: "
+                      "Session storage quota exceeded")
+                return
+            parser.execute_command(command)
+        finally:
+            self._resize(tenant, estimate_bytes(*player.state_size()))
+            self._evict()
+
+    def _session(self, tenant):
+        """Returns the session of a tenant, the most recently used now."""
+        session = self._sessions.get(tenant)
+        if session is not None:
+            self._sessions.move_to_end(tenant)
+            return session
+        player = VideoPlayer(
+            self._video_library, clock=self._clock,
+            scheduler=self._scheduler, popularity=self._popularity,
+            caches=self._caches)
+        path = self._path(tenant)
+        if path.exists():
+            state = json.loads(zlib.decompress(path.read_bytes()))
+            # A wall clock set back leaves the session as if just saved.
+            player.load_state(
+                state, max(0.0, self._wall_clock() - state["saved_at"]))
+            self.loads += 1
+        session = self._sessions[tenant] = (
+            player, CommandParser(player, self._stats))
+        self._sizes[tenant] = 0
+        self._resize(tenant, estimate_bytes(*player.state_size()))
+        return session
+
+    def _resize(self, tenant, size):
+        self._active_bytes += size - self._sizes[tenant]
+        self._sizes[tenant] = size
+
+    def _over_limits(self):
+        return (len(self._sessions) > self._max_active
+                or (self._memory_budget is not None
+                    and self._active_bytes > self._memory_budget))
+
+    def _evict(self):
+        """Saves least recently used sessions until within the limits.
+
+        The most recently used session always stays in memory, as do the
+        sessions that cannot be saved; they are tried again by the next
+        command.
+        """
+        if not self._over_limits():
+            return
+        for tenant in list(self._sessions)[:-1]:
+            if self._save(tenant) and not self._over_limits():
+                return
+
+    def _save(self, tenant):
+        """Writes a session to disk, then drops it from memory.
+
+        Returns:
+            Whether the session was saved. One that cannot be written
+            stays in memory, after the error is shown on stderr rather
+            than raised into the command of whichever tenant caused the
+            eviction.
+        """
+        player, _ = self._sessions[tenant]
+        state = player.save_state()
+        path = self._path(tenant)
+        # Written aside and renamed, so a crash never leaves half a session.
+        partial = path.with_suffix(".tmp")
+        try:
+            if not (state["playlists"] or state["flags"] or state["queue"]
+                    or state["playing"]):
+                # Nothing worth keeping; tenants that only browse take no
+                # disk.
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            else:
+                state["saved_at"] = self._wall_clock()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                partial.write_bytes(zlib.compress(
+                    json.dumps(state, separators=(",", ":")).encode("utf-8")))
+                os.replace(partial, path)
+                self.saves += 1
+        except OSError as e:
+            with contextlib.suppress(OSError):
+                partial.unlink()
+            print(f"Cannot save session of {tenant}: {e}", file=sys.stderr)
+            return False
+        del self._sessions[tenant]
+        self._active_bytes -= self._sizes.pop(tenant)
+        player.close()
+        return True
+
+    def close(self):
+        """Saves every session in memory to disk.
+
+        Sessions that cannot be saved stay in memory.
+        """
+        for tenant in list(self._sessions):
+            self._save(tenant)
@@ -0,0 +1,390 @@
+"""A video library class backed by an on-disk SQLite database."""
+
+from .tag_similarity import TagSimilarityIndex
+from .video import Video
+from .video_library import DEFAULT_CATALOGUE, LibraryDiff, read_catalogue
+from pathlib import Path
+import functools
+import sqlite3
+import threading
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    rowid INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS video_tags (
+    video_rowid INTEGER NOT NULL REFERENCES videos(rowid),
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (video_rowid, position)
+);
+CREATE INDEX IF NOT EXISTS video_tags_by_tag ON video_tags(tag, video_rowid);
+CREATE VIRTUAL TABLE IF NOT EXISTS video_titles USING fts5(
+    title, content='videos', content_rowid='rowid', tokenize='trigram'
+);
+"""
+
+
+# Separator used when a video's tags are folded into a single column.
+_TAG_SEPARATOR = "\x1f"
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _locked(method):
+    """Runs a method holding the library's lock.
+
+    The command, catalogue watcher and loader threads share the
+    connection; a method's statements, the cursors it reads and the
+    transactions it runs must not interleave with another thread's.
+    """
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class SqliteVideoLibrary:
+    """A Video Library answering lookups from SQLite indexes.
+
+    The catalogue is imported once into the database; later instances
+    pointed at the same file reuse it as long as the catalogue has not
+    changed since.
+    """
+
+    def __init__(self, db_path=":memory:", catalogue_path=DEFAULT_CATALOGUE,
+                 progress=None):
+        """The SqliteVideoLibrary class is initialized.
+
+        Args:
+            db_path: Where the database lives, ':memory:' for a private
+                in-memory database.
+            catalogue_path: The catalogue file to import.
+            progress: Optional callable given the number of videos read
+                so far, as read_catalogue does. Not called when the
+                database is reused.
+        """
+        self._catalogue_path = catalogue_path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        source = self._source_signature(catalogue_path)
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = 'source'").fetchone()
+        if not row or row[0] != source:
+            self._import(catalogue_path, source, progress)
+        # Built from the tags table by the first similarity query and
+        # dropped by every reload that changes the catalogue, so opening
+        # an imported database reads none of it.
+        self._similarity = None
+
+    @staticmethod
+    def _source_signature(catalogue_path):
+        stat = Path(catalogue_path).stat()
+        return f"{Path(catalogue_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _import(self, catalogue_path, source, progress=None):
+        with self._db:
+            self._db.execute("DELETE FROM video_tags")
+            self._db.execute("DELETE FROM videos")
+            self._db.execute(
+                "INSERT INTO video_titles(video_titles) VALUES ('delete-all')")
+            for video in read_catalogue(catalogue_path, progress):
+                self._insert_video(video)
+            self._db.execute(
+                "INSERT INTO video_titles(video_titles) VALUES ('rebuild')")
+            self._set_source(source)
+
+    def _set_source(self, source):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES ('source', ?)",
+            (source,))
+
+    def _insert_video(self, video):
+        rowid = self._db.execute(
+            "INSERT INTO videos(video_id, title) VALUES (?, ?)",
+            (video.video_id, video.title)).lastrowid
+        self._insert_tags(rowid, video)
+        return rowid
+
+    def _insert_tags(self, rowid, video):
+        self._db.executemany(
+            "INSERT INTO video_tags(video_rowid, position, tag) "
+            "VALUES (?, ?, ?)",
+            ((rowid, i, tag) for i, tag in enumerate(video.tags)))
+
+    def _unindex_title(self, rowid):
+        """Drops a row from the external content FTS index.
+
+        Must run before the row in videos is changed or deleted.
+        """
+        self._db.execute(
+            "INSERT INTO video_titles(video_titles, rowid, title) "
+            "SELECT 'delete', rowid, title FROM videos WHERE rowid = ?",
+            (rowid,))
+
+    def _index_title(self, rowid, title):
+        self._db.execute(
+            "INSERT INTO video_titles(rowid, title) VALUES (?, ?)",
+            (rowid, title))
+
+    @_locked
+    def diff_catalogue(self):
+        """Re-reads the catalogue file and compares it with the library.
+
+        The new catalogue is staged in a temporary table and compared with
+        SQL joins, so neither catalogue has to fit in memory.
+
+        Returns:
+            A LibraryDiff describing what apply_diff would change.
+        """
+        db = self._db
+        with db:
+            db.execute("DROP TABLE IF EXISTS temp.staged_videos")
+            db.execute(
+                "CREATE TEMP TABLE staged_videos ("
+                "video_id TEXT PRIMARY KEY, title TEXT NOT NULL, "
+                "tags TEXT NOT NULL)")
+            db.executemany(
+                "INSERT OR REPLACE INTO staged_videos VALUES (?, ?, ?)",
+                ((video.video_id, video.title, _TAG_SEPARATOR.join(video.tags))
+                 for video in read_catalogue(self._catalogue_path)))
+
+        current_tags = (
+            "(SELECT IFNULL(group_concat(tag, char(31)), '') FROM "
+            "(SELECT tag FROM video_tags WHERE video_rowid = v.rowid "
+            "ORDER BY position))")
+        diff = LibraryDiff()
+        for video_id, title, tags in db.execute(
+                "SELECT s.video_id, s.title, s.tags FROM staged_videos s "
+                "LEFT JOIN videos v ON v.video_id = s.video_id "
+                "WHERE v.rowid IS NULL ORDER BY s.rowid"):
+            diff.added.append(
+                Video(title, video_id, tags.split(_TAG_SEPARATOR) if tags else []))
+        for video_id, title, tags in db.execute(
+                "SELECT s.video_id, s.title, s.tags FROM staged_videos s "
+                "JOIN videos v ON v.video_id = s.video_id "
+                f"WHERE s.title != v.title OR s.tags != {current_tags} "
+                "ORDER BY v.rowid"):
+            diff.changed.append(
+                Video(title, video_id, tags.split(_TAG_SEPARATOR) if tags else []))
+        diff.removed = self._videos_from_rows(db.execute(
+            "SELECT v.rowid, v.video_id, v.title FROM videos v "
+            "WHERE NOT EXISTS (SELECT 1 FROM staged_videos s "
+            "WHERE s.video_id = v.video_id) ORDER BY v.rowid"))
+        db.execute("DROP TABLE temp.staged_videos")
+        return diff
+
+    @_locked
+    def apply_diff(self, diff):
+        """Applies the entries of a LibraryDiff to the database and its indexes.
+
+        Args:
+            diff: The LibraryDiff returned by diff_catalogue.
+        """
+        with self._db:
+            for video in diff.removed:
+                rowid = self._rowid(video.video_id)
+                self._unindex_title(rowid)
+                self._db.execute(
+                    "DELETE FROM video_tags WHERE video_rowid = ?", (rowid,))
+                self._db.execute("DELETE FROM videos WHERE rowid = ?", (rowid,))
+            for video in diff.changed:
+                rowid = self._rowid(video.video_id)
+                self._unindex_title(rowid)
+                self._db.execute(
+                    "UPDATE videos SET title = ? WHERE rowid = ?",
+                    (video.title, rowid))
+                self._db.execute(
+                    "DELETE FROM video_tags WHERE video_rowid = ?", (rowid,))
+                self._insert_tags(rowid, video)
+                self._index_title(rowid, video.title)
+            for video in diff.added:
+                self._index_title(self._insert_video(video), video.title)
+            self._set_source(self._source_signature(self._catalogue_path))
+        if diff:
+            self._similarity = None
+
+    def _rowid(self, video_id):
+        return self._db.execute(
+            "SELECT rowid FROM videos WHERE video_id = ?",
+            (video_id,)).fetchone()[0]
+
+    def _videos_from_rows(self, rows):
+        """Builds Video objects for (rowid, video_id, title) rows."""
+        rows = list(rows)
+        tags = {}
+        for start in range(0, len(rows), 500):
+            chunk = [row[0] for row in rows[start:start + 500]]
+            placeholders = ",".join("?" * len(chunk))
+            for rowid, tag in self._db.execute(
+                    "SELECT video_rowid, tag FROM video_tags "
+                    f"WHERE video_rowid IN ({placeholders}) "
+                    "ORDER BY video_rowid, position", chunk):
+                tags.setdefault(rowid, []).append(tag)
+        return [Video(title, video_id, tags.get(rowid, []))
+                for rowid, video_id, title in rows]
+
+    @_locked
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    @_locked
+    def get_all_videos(self):
+        """Returns all available video information from the video library."""
+        return self._videos_from_rows(self._db.execute(
+            "SELECT rowid, video_id, title FROM videos ORDER BY rowid"))
+
+    @_locked
+    def get_video(self, video_id):
+        """Returns the video object (title, url, tags) from the video library.
+
+        Args:
+            video_id: The video url.
+
+        Returns:
+            The Video object for the requested video_id. None if the video
+            does not exist.
+        """
+        videos = self._videos_from_rows(self._db.execute(
+            "SELECT rowid, video_id, title FROM videos WHERE video_id = ?",
+            (video_id,)))
+        return videos[0] if videos else None
+
+    @_locked
+    def get_videos(self, video_ids):
+        """Looks up many videos at once.
+
+        Args:
+            video_ids: The video urls to look up.
+
+        Returns:
+            A dict mapping each existing video_id to its Video object.
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        videos = {}
+        for start in range(0, len(video_ids), 500):
+            chunk = video_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for video in self._videos_from_rows(self._db.execute(
+                    "SELECT rowid, video_id, title FROM videos "
+                    f"WHERE video_id IN ({placeholders})", chunk)):
+                videos[video.video_id] = video
+        return videos
+
+    @_locked
+    def handle(self, video_id):
+        """Returns the integer handle of a video, None if it does not exist.
+
+        The handle is the video's rowid, which AUTOINCREMENT keeps from
+        being reused by another video.
+        """
+        row = self._db.execute(
+            "SELECT rowid FROM videos WHERE video_id = ?",
+            (video_id,)).fetchone()
+        return row[0] if row else None
+
+    def video_at(self, handle):
+        """Returns the Video behind a handle, None if it was removed."""
+        return self.videos_at([handle])[0]
+
+    @_locked
+    def videos_at(self, handles):
+        """Returns the Video behind each handle, None for removed ones."""
+        handles = list(handles)
+        videos = {}
+        for start in range(0, len(handles), 500):
+            chunk = handles[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._db.execute(
+                "SELECT rowid, video_id, title FROM videos "
+                f"WHERE rowid IN ({placeholders})", chunk).fetchall()
+            videos.update(zip((row[0] for row in rows),
+                              self._videos_from_rows(rows)))
+        return [videos.get(handle) for handle in handles]
+
+    @_locked
+    def search_titles(self, search_term):
+        """Returns the videos whose titles contain the search_term.
+
+        Args:
+            search_term: The case insensitive query to look for.
+        """
+        return self._videos_from_rows(self._db.execute(
+            "SELECT v.rowid, v.video_id, v.title FROM video_titles t "
+            "JOIN videos v ON v.rowid = t.rowid "
+            "WHERE t.title LIKE ? ESCAPE '\\' ORDER BY v.rowid",
+            (f"%{_escape_like(search_term)}%",)))
+
+    @_locked
+    def get_videos_with_tag(self, video_tag):
+        """Returns the videos carrying the given tag.
+
+        Args:
+            video_tag: The tag, including its leading '#'.
+        """
+        return self._videos_from_rows(self._db.execute(
+            "SELECT v.rowid, v.video_id, v.title FROM video_tags t "
+            "JOIN videos v ON v.rowid = t.video_rowid "
+            "WHERE t.tag = ? ORDER BY v.rowid",
+            (video_tag,)))
+
+    @_locked
+    def similar_videos(self, video_id, k, include=None):
+        """Returns the videos sharing the most tags with a video.
+
+        Answered from a TagSimilarityIndex, streamed from the tags table
+        on first use.
+
+        Args:
+            video_id: The video to compare with.
+            k: Number of videos wanted.
+            include: Optional predicate a video_id must satisfy.
+
+        Returns:
+            Up to k (video_id, similarity) pairs, most similar first.
+        """
+        if self._similarity is None:
+            self._similarity = TagSimilarityIndex.from_tag_rows(self._db.execute(
+                "SELECT v.video_id, t.tag FROM videos v "
+                "LEFT JOIN video_tags t ON t.video_rowid = v.rowid "
+                "ORDER BY v.rowid, t.position"))
+        return self._similarity.similar(video_id, k, include)
+
+    @_locked
+    def complete_ids(self, prefix, limit):
+        """Returns the video ids starting with a prefix, in sorted order.
+
+        Reads one range of the unique index on video_id.
+
+        Args:
+            prefix: The start of the video ids.
+            limit: Maximum number of ids returned. When more ids match,
+                the last one returned is the greatest match.
+        """
+        if limit <= 0:
+            return []
+        if prefix:
+            # Every id starting with prefix sorts before this bound.
+            bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            where, params = "video_id >= ? AND video_id < ?", (prefix, bound)
+        else:
+            where, params = "1", ()
+        ids = [row[0] for row in self._db.execute(
+            f"SELECT video_id FROM videos WHERE {where} "
+            "ORDER BY video_id LIMIT ?", params + (limit + 1,))]
+        if len(ids) > limit:
+            ids[limit - 1:] = self._db.execute(
+                f"SELECT max(video_id) FROM videos WHERE {where}",
+                params).fetchone()
+        return ids
@@ -0,0 +1,149 @@
+"""A tag similarity index class."""
+
+from array import array
+import heapq
+import itertools
+import math
+
+
+class TagSimilarityIndex:
+    """A class used to find the videos sharing the most tags with another.
+
+    The catalogue is held as a sparse video x tag matrix in compressed
+    sparse row form, each row listing the tag numbers of one video, along
+    with its transpose listing the videos of each tag. Both live in flat
+    machine-integer arrays, a few bytes per (video, tag) pair.
+
+    Videos are compared by the cosine of their binary tag vectors, each
+    tag weighted by its inverse document frequency so rare shared tags
+    count for more than ubiquitous ones.
+    """
+
+    # Most postings scanned to gather candidates for one query.
+    SCAN_LIMIT = 100_000
+    # Candidates rescored exactly against every tag of the query, per
+    # result wanted.
+    RESCORED_PER_RESULT = 8
+
+    def __init__(self, videos):
+        """TagSimilarityIndex constructor.
+
+        Args:
+            videos: Every Video of the catalogue.
+        """
+        self._build((video.video_id, video.tags) for video in videos)
+
+    @classmethod
+    def from_tag_rows(cls, rows):
+        """Builds the index from one row per tag of every video.
+
+        Lets a database stream its tags straight into the index without
+        building a Video for each of its videos.
+
+        Args:
+            rows: (video_id, tag) pairs in catalogue order, those of a
+                video next to each other. A video without tags has a
+                single row whose tag is None.
+        """
+        index = cls.__new__(cls)
+        index._build(
+            (video_id, [tag for _, tag in group if tag is not None])
+            for video_id, group in itertools.groupby(
+                rows, key=lambda row: row[0]))
+        return index
+
+    def _build(self, tagged_videos):
+        """Fills the arrays from (video_id, tags) pairs in catalogue order."""
+        tag_numbers = {}
+        self._video_ids = []
+        self._rows = {}
+        indptr = array("i", [0])
+        indices = array("i")
+        for video_id, tags in tagged_videos:
+            self._rows[video_id] = len(self._video_ids)
+            self._video_ids.append(video_id)
+            for tag in dict.fromkeys(tags):
+                indices.append(tag_numbers.setdefault(tag, len(tag_numbers)))
+            indptr.append(len(indices))
+        num_videos, num_tags = len(self._video_ids), len(tag_numbers)
+
+        frequency = array("i", bytes(4 * num_tags))
+        for tag in indices:
+            frequency[tag] += 1
+        # Transpose by counting sort: tag_indptr[t] is where tag t starts.
+        tag_indptr = array("i", [0])
+        for count in frequency:
+            tag_indptr.append(tag_indptr[-1] + count)
+        tag_indices = array("i", bytes(4 * len(indices)))
+        fill = array("i", tag_indptr)
+        for row in range(num_videos):
+            for tag in indices[indptr[row]:indptr[row + 1]]:
+                tag_indices[fill[tag]] = row
+                fill[tag] += 1
+
+        self._weights = array("d", (math.log(1 + num_videos / count) ** 2
+                                    for count in frequency))
+        self._norms = array("d", (
+            math.sqrt(sum(self._weights[tag]
+                          for tag in indices[indptr[row]:indptr[row + 1]]))
+            for row in range(num_videos)))
+        self._indptr, self._indices = indptr, indices
+        self._tag_indptr, self._tag_indices = tag_indptr, tag_indices
+
+    def _tags(self, row):
+        return self._indices[self._indptr[row]:self._indptr[row + 1]]
+
+    def _postings(self, tag):
+        return self._tag_indices[self._tag_indptr[tag]:self._tag_indptr[tag + 1]]
+
+    def similar(self, video_id, k, include=None):
+        """Returns the videos most similar to a video.
+
+        Candidates come from the query's rarest tags first, at most
+        SCAN_LIMIT postings in all, so tags carried by a large share of
+        the catalogue only refine the ranking of those candidates.
+
+        Args:
+            video_id: The video to compare with.
+            k: Number of videos wanted.
+            include: Optional predicate a video_id must satisfy.
+
+        Returns:
+            Up to k (video_id, cosine similarity) pairs, most similar
+            first, ties in catalogue order.
+        """
+        row = self._rows.get(video_id)
+        if row is None or not self._norms[row]:
+            return []
+        weights = self._weights
+        query = {tag: weights[tag] for tag in self._tags(row)}
+
+        partial = {}
+        get = partial.get
+        scanned = 0
+        for tag in sorted(query, key=lambda tag: -query[tag]):
+            postings = self._postings(tag)
+            if scanned and scanned + len(postings) > self.SCAN_LIMIT:
+                break
+            postings = postings[:self.SCAN_LIMIT]
+            scanned += len(postings)
+            weight = query[tag]
+            for candidate in postings:
+                partial[candidate] = get(candidate, 0.0) + weight
+        partial.pop(row, None)
+
+        norms, video_ids = self._norms, self._video_ids
+        ranked = ((score / norms[candidate], -candidate)
+                  for candidate, score in partial.items()
+                  if include is None or include(video_ids[candidate]))
+        shortlist = heapq.nlargest(k * self.RESCORED_PER_RESULT, ranked)
+
+        query_norm = norms[row]
+        rescored = []
+        for _, candidate in shortlist:
+            candidate = -candidate
+            score = sum(query.get(tag, 0.0) for tag in self._tags(candidate))
+            rescored.append(
+                (score / (norms[candidate] * query_norm), -candidate))
+        return [(video_ids[-candidate], score)
+                for score, candidate in heapq.nlargest(k, rescored)]
@@ -0,0 +1,165 @@
+"""A hierarchical timer wheel class."""
+
+import math
+
+
+class TimerWheel:
+    """A class used to schedule many timers and collect the expired ones.
+
+    Timers are bucketed by deadline into a hierarchy of wheels; each tick
+    fires one bucket of the lowest wheel and, every full turn, cascades a
+    bucket of the wheel above into the ones below. Scheduling, cancelling
+    and expiring a timer are O(1) amortized, whatever the number pending.
+    Ticks with nothing to fire or cascade are jumped over, so advancing
+    after a long idle period costs the buckets visited rather than the
+    ticks elapsed.
+    """
+
+    def __init__(self, resolution=1.0, slots=256, levels=4, start=0.0):
+        """TimerWheel constructor.
+
+        Args:
+            resolution: Length of one tick, in the same unit as deadlines.
+            slots: Number of buckets in each wheel.
+            levels: Number of wheels; deadlines up to slots ** levels ticks
+                ahead are placed exactly, later ones are re-placed as
+                the wheel turns.
+            start: The time the wheel starts at.
+        """
+        self._resolution = resolution
+        self._slots = slots
+        self._levels = levels
+        self._tick = math.floor(start / resolution)
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        # Where every pending key lives: (level, slot), or None when due.
+        self._timers = {}
+        self._due = {}
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def _place(self, key, tick):
+        delta = tick - self._tick
+        if delta <= 0:
+            self._due[key] = tick
+            self._timers[key] = None
+            return
+        level = 0
+        span = self._slots
+        while delta >= span and level < self._levels - 1:
+            level += 1
+            span *= self._slots
+        slot = (tick // (span // self._slots)) % self._slots
+        self._wheels[level][slot][key] = tick
+        self._timers[key] = (level, slot)
+
+    def schedule(self, key, deadline):
+        """Schedules, or reschedules, the timer of a key.
+
+        Args:
+            key: Any hashable identifying the timer.
+            deadline: When the timer should expire.
+        """
+        self.cancel(key)
+        self._place(key, math.ceil(deadline / self._resolution))
+
+    def deadline(self, key):
+        """Returns when the timer of a key expires, None if it has none.
+
+        The deadline is rounded up to the tick the timer fires on.
+        """
+        where = self._timers.get(key, False)
+        if where is False:
+            return None
+        if where is None:
+            tick = self._due[key]
+        else:
+            level, slot = where
+            tick = self._wheels[level][slot][key]
+        return tick * self._resolution
+
+    def cancel(self, key):
+        """Cancels the timer of a key, if any."""
+        where = self._timers.pop(key, False)
+        if where is None:
+            del self._due[key]
+        elif where:
+            level, slot = where
+            del self._wheels[level][slot][key]
+
+    def advance(self, now):
+        """Moves the wheel forward to a time.
+
+        Returns:
+            The keys whose deadline is at or before now.
+        """
+        target = math.floor(now / self._resolution)
+        expired = []
+        while self._tick < target:
+            if not self._timers:
+                self._tick = target
+                break
+            self._tick = self._next_event(target)
+            self._cascade()
+            slot = self._tick % self._slots
+            bucket = self._wheels[0][slot]
+            self._wheels[0][slot] = {}
+            for key, tick in bucket.items():
+                if tick > self._tick:
+                    # Only a single wheel holds timers a turn or more ahead.
+                    self._place(key, tick)
+                else:
+                    del self._timers[key]
+                    expired.append(key)
+        # Timers scheduled in the past, or cascaded onto the current tick.
+        for key in self._due:
+            del self._timers[key]
+        expired.extend(self._due)
+        self._due.clear()
+        return expired
+
+    def _next_event(self, limit):
+        """Returns the first tick, after the current one and at most
+        limit, at which a bucket fires or a non-empty bucket cascades.
+
+        Looks at no more than one turn of each wheel.
+        """
+        slots = self._slots
+        tick = self._tick
+        best = limit
+        lowest = self._wheels[0]
+        for step in range(1, min(slots, limit - tick) + 1):
+            if lowest[(tick + step) % slots]:
+                best = tick + step
+                break
+        span = slots
+        for level in range(1, self._levels):
+            wheel = self._wheels[level]
+            boundary = (tick // span + 1) * span
+            for _ in range(slots):
+                if boundary >= best:
+                    break
+                if wheel[(boundary // span) % slots]:
+                    best = boundary
+                    break
+                boundary += span
+            span *= slots
+        return best
+
+    def _cascade(self):
+        """Re-places the higher level buckets whose period starts now."""
+        levels = []
+        span = self._slots
+        for level in range(1, self._levels):
+            if self._tick % span:
+                break
+            levels.append((level, (self._tick // span) % self._slots))
+            span *= self._slots
+        for level, slot in reversed(levels):
+            bucket = self._wheels[level][slot]
+            self._wheels[level][slot] = {}
+            for key, tick in bucket.items():
+                self._place(key, tick)
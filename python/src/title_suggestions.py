@@ -0,0 +1,130 @@
+"""A title suggestions class."""
+
+from .prefix_trie import PrefixTrie
+import bisect
+import heapq
+import itertools
+
+# Number of videos each prefix remembers, more than are shown so that a
+# few flagged ones can be skipped without ranking the whole prefix.
+SUGGESTIONS_CACHED = 20
+
+
+class TitleSuggestions:
+    """A class used to suggest the best titles starting with a prefix.
+
+    The lowercased titles are kept in a PrefixTrie, and every node of the
+    trie caches the best few videos whose titles lie below it, ranked by
+    score, then title, then id. A suggestion is a walk down the prefix
+    and a read of one cache, however many titles share the prefix.
+    The index is shared by every session serving the library: each one
+    skips its own flagged videos when reading a cache.
+
+    A score is read when the index is built and again whenever update
+    re-ranks that video. Scores that change in between are not noticed:
+    with Count-Min estimates, the score of a video that is not played can
+    still creep up through hash collisions with videos that are. Among
+    rarely played videos the order is thus approximate, while the most
+    played, whose counters their own plays dominate, rank by close to
+    exact counts.
+    """
+
+    def __init__(self, videos, score=None, cached=SUGGESTIONS_CACHED):
+        """TitleSuggestions constructor.
+
+        Args:
+            videos: The videos to suggest.
+            score: Returns the popularity of a video_id; scores should only
+                grow, as update moves videos up. Videos rank alphabetically
+                if None.
+            cached: Number of videos cached at each prefix.
+        """
+        self._score = score
+        self._cached = cached
+        self._titles = {}
+        self._ranks = {}
+        for video in videos:
+            title = video.title.lower()
+            self._titles.setdefault(title, []).append(video.video_id)
+            self._ranks[video.video_id] = self._rank(title, video.video_id)
+        self._trie = PrefixTrie(self._titles)
+        self._build()
+
+    def __len__(self):
+        """Returns the number of videos indexed."""
+        return len(self._ranks)
+
+    def _rank(self, title, video_id):
+        score = self._score(video_id) if self._score else 0
+        return (-score, title, video_id)
+
+    def _build(self):
+        """Fills the cache of every node from its own titles and children."""
+        root = self._trie.node("")
+        stack = [(root, "", False)]
+        while stack:
+            node, title, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, title, True))
+                if node.children:
+                    stack.extend((child, title + child.label, False)
+                                 for child in node.children.values())
+                continue
+            self._fill(node, title)
+
+    def _fill(self, node, title):
+        """Recomputes the cache of a node whose children are up to date."""
+        own = ([self._ranks[video_id] for video_id in self._titles[title]]
+               if node.terminal else ())
+        children = node.children.values() if node.children else ()
+        node.data = heapq.nsmallest(self._cached, itertools.chain(
+            own, *(child.data for child in children)))
+
+    def update(self, video_id):
+        """Re-ranks a video after its score grew.
+
+        Only the caches on the path to its title are touched.
+        """
+        old = self._ranks.get(video_id)
+        if old is None:
+            return
+        new = self._ranks[video_id] = self._rank(old[1], video_id)
+        for node in self._trie.nodes(old[1]):
+            cache = node.data
+            index = bisect.bisect_left(cache, old)
+            if index < len(cache) and cache[index] == old:
+                del cache[index]
+            elif len(cache) == self._cached and new >= cache[-1]:
+                continue
+            bisect.insort(cache, new)
+            del cache[self._cached:]
+
+    def suggest(self, prefix, n, include=None):
+        """Returns the best videos whose titles start with prefix.
+
+        The cache of the prefix is read in full, more than the n wanted,
+        so a few videos failing include are skipped without ranking the
+        prefix again; only when too many fail are the videos of every
+        title below the prefix ranked.
+
+        Args:
+            prefix: The case insensitive start of the titles.
+            n: Number of videos wanted.
+            include: Optional predicate a video_id must satisfy.
+
+        Returns:
+            Up to n video ids, best first.
+        """
+        prefix = prefix.lower()
+        node = self._trie.node(prefix)
+        if node is None:
+            return []
+        found = [video_id for _, _, video_id in node.data
+                 if include is None or include(video_id)]
+        if len(found) < n and len(node.data) == self._cached:
+            ranks = (self._ranks[video_id]
+                     for title in self._trie.complete(prefix)
+                     for video_id in self._titles[title]
+                     if include is None or include(video_id))
+            found = [video_id for _, _, video_id in heapq.nsmallest(n, ranks)]
+        return found[:n]
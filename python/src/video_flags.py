@@ -0,0 +1,78 @@
+"""A video flags class."""
+
+from .array_map import ArrayMap
+from collections.abc import MutableMapping
+
+
+class VideoFlags(MutableMapping):
+    """A class used to map flagged video ids to their flag reasons.
+
+    Flags are stored as an ArrayMap from library handles to indexes in a
+    list of the distinct reasons, so a flag costs two machine integers.
+    Video ids are only translated to handles at the interface.
+    """
+
+    def __init__(self, library):
+        """VideoFlags constructor.
+
+        Args:
+            library: The video library whose handles are stored.
+        """
+        self._library = library
+        self._flags = ArrayMap()
+        self._reasons = []
+        self._reason_ids = {}
+
+    def _reason_id(self, reason):
+        reason_id = self._reason_ids.get(reason)
+        if reason_id is None:
+            reason_id = self._reason_ids[reason] = len(self._reasons)
+            self._reasons.append(reason)
+        return reason_id
+
+    def _handle(self, video_id):
+        handle = self._library.handle(video_id)
+        if handle is None:
+            raise KeyError(video_id)
+        return handle
+
+    def __len__(self):
+        return len(self._flags)
+
+    def __iter__(self):
+        for video in self._library.videos_at(list(self._flags)):
+            yield video.video_id
+
+    def __contains__(self, video_id):
+        if not self._flags:
+            return False
+        handle = self._library.handle(video_id)
+        return handle is not None and handle in self._flags
+
+    def contains_handle(self, handle):
+        return handle in self._flags
+
+    def __getitem__(self, video_id):
+        reason_id = self._flags.get(self._handle(video_id))
+        if reason_id is None:
+            raise KeyError(video_id)
+        return self._reasons[reason_id]
+
+    def __setitem__(self, video_id, reason):
+        self._flags[self._handle(video_id)] = self._reason_id(reason)
+
+    def __delitem__(self, video_id):
+        handle = self._handle(video_id)
+        if handle not in self._flags:
+            raise KeyError(video_id)
+        del self._flags[handle]
+
+    def update(self, flags):
+        """Flags many videos in one batch.
+
+        Args:
+            flags: The reasons to flag videos with, keyed by video_id.
+        """
+        self._flags.update(
+            (self._handle(video_id), self._reason_id(reason))
+            for video_id, reason in flags.items())
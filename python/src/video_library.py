@@ -1,8 +1,18 @@
 """A video library class."""
 
+from .tag_similarity import TagSimilarityIndex
 from .video import Video
+from array import array
 from pathlib import Path
+import bisect
+import bz2
 import csv
+import gzip
+import lzma
+
+
+# Catalogue shipped alongside the sources, used when no other path is given.
+DEFAULT_CATALOGUE = Path(__file__).parent / "videos.txt"
 
 
 # Helper Wrapper around CSV reader to strip whitespace from around
@@ -11,22 +21,210 @@ def _csv_reader_with_strip(reader):
     yield from ((item.strip() for item in line) for line in reader)
 
 
+# Videos read between two calls of a read_catalogue progress callback.
+PROGRESS_EVERY = 1000
+
+
+# Leading bytes identifying each supported compression format.
+_COMPRESSED_OPENERS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+    (b"BZh", bz2.open),
+)
+
+
+def open_catalogue(path):
+    """Opens a catalogue file for reading as text.
+
+    gzip, xz and bz2 files are recognised by their magic bytes and decoded
+    as a stream, so the uncompressed catalogue never touches the disk.
+
+    Args:
+        path: Path of the, possibly compressed, catalogue file.
+    """
+    with open(path, "rb") as raw_file:
+        magic = raw_file.read(6)
+    for prefix, opener in _COMPRESSED_OPENERS:
+        if magic.startswith(prefix):
+            return opener(path, "rt", newline="")
+    return open(path, newline="")
+
+
+def read_catalogue(path=DEFAULT_CATALOGUE, progress=None):
+    """Yields every Video described in a catalogue file.
+
+    Args:
+        path: Path of the pipe separated catalogue file, optionally
+            compressed with gzip, xz or bz2.
+        progress: Optional callable given the number of videos read so
+            far, every PROGRESS_EVERY videos.
+
+    Raises:
+        ValueError: If a line does not have the three fields.
+    """
+    with open_catalogue(path) as video_file:
+        rows = csv.reader(video_file, delimiter="|")
+        reader = _csv_reader_with_strip(rows)
+        for count, video_info in enumerate(reader, 1):
+            try:
+                title, url, tags = video_info
+            except ValueError:
+                raise ValueError(
+                    f"{path}, line {rows.line_num}: expected "
+                    "'title | video_id | tags'") from None
+            yield Video(
+                title,
+                url,
+                [tag.strip() for tag in tags.split(",")] if tags else [],
+            )
+            if progress is not None and not count % PROGRESS_EVERY:
+                progress(count)
+
+
+def _trigrams(text):
+    """Returns the distinct three character substrings of a text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class LibraryDiff:
+    """A class used to represent the changes between two catalogues."""
+
+    def __init__(self, added=(), removed=(), changed=()):
+        """LibraryDiff constructor.
+
+        Args:
+            added: Videos only present in the new catalogue.
+            removed: Videos only present in the old catalogue.
+            changed: New versions of videos whose title or tags differ.
+        """
+        self.added = list(added)
+        self.removed = list(removed)
+        self.changed = list(changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
 class VideoLibrary:
     """A class used to represent a Video Library."""
 
-    def __init__(self):
-        """The VideoLibrary class is initialized."""
+    def __init__(self, catalogue_path=DEFAULT_CATALOGUE, progress=None):
+        """The VideoLibrary class is initialized.
+
+        Args:
+            catalogue_path: The catalogue file to load.
+            progress: Optional callable given the number of videos read
+                so far, as read_catalogue does.
+        """
+        self._catalogue_path = catalogue_path
         self._videos = {}
-        with open(Path(__file__).parent / "videos.txt") as video_file:
-            reader = _csv_reader_with_strip(
-                csv.reader(video_file, delimiter="|"))
-            for video_info in reader:
-                title, url, tags = video_info
-                self._videos[url] = Video(
-                    title,
-                    url,
-                    [tag.strip() for tag in tags.split(",")] if tags else [],
-                )
+        # Maps each tag to the ids carrying it, kept as an insertion
+        # ordered dict so single entries can be dropped on reload.
+        self._tags = {}
+        # Dense integer handle of every video_id ever loaded, kept if the
+        # video is removed and comes back, and the video behind each one;
+        # None while the video is removed.
+        self._handles = {}
+        self._handle_videos = []
+        # Maps every three character substring of the lowercased titles
+        # to the handles of the videos whose titles contain it, and the
+        # handles of titles too short to have one; search_titles only
+        # compares the term with the titles these select.
+        self._trigrams = {}
+        self._short_titles = set()
+        for video in read_catalogue(catalogue_path, progress):
+            self._add_video(video)
+        # Built with the catalogue, on whichever thread loads it; the
+        # sorted ids then follow reloads, the similarity index is rebuilt
+        # by every reload that changes the catalogue.
+        self._sorted_ids = sorted(self._videos)
+        self._similarity = TagSimilarityIndex(self._videos.values())
+
+    def _add_video(self, video):
+        self._videos[video.video_id] = video
+        handle = self._handles.get(video.video_id)
+        if handle is None:
+            self._handles[video.video_id] = len(self._handle_videos)
+            self._handle_videos.append(video)
+        else:
+            self._handle_videos[handle] = video
+        for tag in video.tags:
+            self._tags.setdefault(tag, {})[video.video_id] = None
+        title = video.title.lower()
+        handle = self._handles[video.video_id]
+        if len(title) < 3:
+            self._short_titles.add(handle)
+        index = self._trigrams
+        for trigram in _trigrams(title):
+            try:
+                index[trigram].append(handle)
+            except KeyError:
+                index[trigram] = array("i", (handle,))
+
+    def _unindex_video(self, video):
+        """Drops a video from the tag and title indexes."""
+        for tag in video.tags:
+            tagged = self._tags[tag]
+            tagged.pop(video.video_id, None)
+            if not tagged:
+                del self._tags[tag]
+        handle = self._handles[video.video_id]
+        self._short_titles.discard(handle)
+        for trigram in _trigrams(video.title.lower()):
+            postings = self._trigrams[trigram]
+            postings.remove(handle)
+            if not postings:
+                del self._trigrams[trigram]
+
+    def diff_catalogue(self):
+        """Re-reads the catalogue file and compares it with the library.
+
+        The library itself is left untouched, so it keeps serving lookups
+        while the file is parsed.
+
+        Returns:
+            A LibraryDiff describing what apply_diff would change.
+        """
+        diff = LibraryDiff()
+        seen = set()
+        for video in read_catalogue(self._catalogue_path):
+            seen.add(video.video_id)
+            old = self._videos.get(video.video_id)
+            if old is None:
+                diff.added.append(video)
+            elif (old.title, old.tags) != (video.title, video.tags):
+                diff.changed.append(video)
+        diff.removed = [video for video_id, video in self._videos.items()
+                        if video_id not in seen]
+        return diff
+
+    def apply_diff(self, diff):
+        """Applies the entries of a LibraryDiff to the library and its indexes.
+
+        Args:
+            diff: The LibraryDiff returned by diff_catalogue.
+        """
+        for video in diff.removed:
+            self._unindex_video(self._videos.pop(video.video_id))
+            self._handle_videos[self._handles[video.video_id]] = None
+        for video in diff.changed:
+            # Re-assigning an existing key keeps the catalogue order.
+            self._unindex_video(self._videos[video.video_id])
+            self._add_video(video)
+        for video in diff.added:
+            self._add_video(video)
+        if diff.removed:
+            self._sorted_ids = [video_id for video_id in self._sorted_ids
+                                if video_id in self._videos]
+        if diff.added:
+            # Sorting merges the sorted run of added ids in linear time.
+            self._sorted_ids.extend(sorted(video.video_id for video in diff.added))
+            self._sorted_ids.sort()
+        if diff:
+            self._similarity = TagSimilarityIndex(self._videos.values())
+
+    def __len__(self):
+        return len(self._videos)
 
     def get_all_videos(self):
         """Returns all available video information from the video library."""
@@ -43,3 +241,120 @@ class VideoLibrary:
             does not exist.
         """
         return self._videos.get(video_id, None)
+
+    def get_videos(self, video_ids):
+        """Looks up many videos at once.
+
+        Args:
+            video_ids: The video urls to look up.
+
+        Returns:
+            A dict mapping each existing video_id to its Video object.
+        """
+        videos = self._videos
+        return {video_id: videos[video_id]
+                for video_id in video_ids if video_id in videos}
+
+    def handle(self, video_id):
+        """Returns the integer handle of a video, None if it does not exist.
+
+        Handles are small, dense and stable across reloads, so containers
+        can hold them in arrays instead of the video ids.
+        """
+        handle = self._handles.get(video_id)
+        if handle is None or self._handle_videos[handle] is None:
+            return None
+        return handle
+
+    def video_at(self, handle):
+        """Returns the Video behind a handle, None if it was removed."""
+        return self._handle_videos[handle]
+
+    def videos_at(self, handles):
+        """Returns the Video behind each handle, None for removed ones."""
+        handle_videos = self._handle_videos
+        return [handle_videos[handle] for handle in handles]
+
+    def search_titles(self, search_term):
+        """Returns the videos whose titles contain the search_term.
+
+        Only the titles holding the rarest trigram of the term are
+        compared with it; for terms shorter than a trigram, those holding
+        any trigram that contains the term. Videos come in the order they
+        were first loaded.
+
+        Args:
+            search_term: The case insensitive query to look for.
+        """
+        term = search_term.lower()
+        if not term:
+            return self.get_all_videos()
+        videos = self._handle_videos
+        if len(term) >= 3:
+            postings = [self._trigrams.get(trigram)
+                        for trigram in _trigrams(term)]
+            if not all(postings):
+                return []
+            candidates = min(postings, key=len)
+            # A trigram's postings hold exactly the titles containing it.
+            exact = len(term) == 3
+        else:
+            candidates = {handle for handle in self._short_titles
+                          if term in videos[handle].title.lower()}
+            for trigram, postings in self._trigrams.items():
+                if term in trigram:
+                    candidates.update(postings)
+            exact = True
+        if exact:
+            return [videos[handle] for handle in sorted(candidates)]
+        return [videos[handle] for handle in sorted(candidates)
+                if term in videos[handle].title.lower()]
+
+    def get_videos_with_tag(self, video_tag):
+        """Returns the videos carrying the given tag.
+
+        Args:
+            video_tag: The tag, including its leading '#'.
+        """
+        return [self._videos[video_id]
+                for video_id in self._tags.get(video_tag, ())]
+
+    def similar_videos(self, video_id, k, include=None):
+        """Returns the videos sharing the most tags with a video.
+
+        Answered from the TagSimilarityIndex built with the catalogue.
+
+        Args:
+            video_id: The video to compare with.
+            k: Number of videos wanted.
+            include: Optional predicate a video_id must satisfy.
+
+        Returns:
+            Up to k (video_id, similarity) pairs, most similar first.
+        """
+        return self._similarity.similar(video_id, k, include)
+
+    def complete_ids(self, prefix, limit):
+        """Returns the video ids starting with a prefix, in sorted order.
+
+        Answered by bisecting the sorted ids for the range sharing the
+        prefix, so a completion costs the same however many ids match.
+
+        Args:
+            prefix: The start of the video ids.
+            limit: Maximum number of ids returned. When more ids match,
+                the last one returned is the greatest match.
+        """
+        ids = self._sorted_ids
+        start = bisect.bisect_left(ids, prefix)
+        if prefix:
+            # The smallest string greater than every id sharing the prefix.
+            end = bisect.bisect_left(
+                ids, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        else:
+            end = len(ids)
+        if limit <= 0:
+            return []
+        if end - start <= limit:
+            return ids[start:end]
+        return ids[start:start + limit - 1] + [ids[end - 1]]
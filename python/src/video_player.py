@@ -2,23 +2,217 @@
 
 from .video_library import VideoLibrary
 from .video_playlist import Playlist
+from .alias_table import AliasTable
+from .library_caches import LibraryCaches
+from .playback_scheduler import (PlaybackScheduler, shared_scheduler,
+                                 simulated_duration)
+from .popularity import PopularityTracker
+from .prefix_trie import PrefixTrie
+from .random_pool import FilteredPool
+from .timer_wheel import TimerWheel
+from .video_flags import VideoFlags
+import itertools
 import random
+import threading
+import time
+
+# Number of videos listed per page by SHOW_PLAYLIST.
+PLAYLIST_PAGE_SIZE = 20
+
+# Number of individual failures printed by the bulk commands.
+BULK_FAILURES_SHOWN = 10
+
+# Number of videos listed by MOST_PLAYED and TRENDING by default.
+POPULAR_SHOWN = 10
+
+# Seconds over which a play's weight in TRENDING halves.
+TRENDING_HALF_LIFE = 3600
+
+# Number of titles listed by SUGGEST.
+SUGGESTIONS_SHOWN = 10
+
+# Plays after which popularity weighted PLAY_RANDOM tables are rebuilt.
+POPULAR_REBUILD_PLAYS = 100
+
+# Most played videos given extra weight by popularity weighted PLAY_RANDOM.
+POPULAR_CANDIDATES = 100
+
+
+def _print_bulk_summary(summary, failures):
+    """Prints the outcome of a bulk command and its first failures."""
+    if not failures:
+        print(summary)
+        return
+    print(f"{summary}, {len(failures)} failed:")
+    for video_id, reason in failures[:BULK_FAILURES_SHOWN]:
+        print(f"  {video_id}: {reason}")
+    if len(failures) > BULK_FAILURES_SHOWN:
+        print(f"  ... and {len(failures) - BULK_FAILURES_SHOWN} more")
+
+
+def _format_seconds(seconds):
+    """Formats a duration as minutes:seconds."""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
 
 
 class VideoPlayer:
     """A class used to represent a Video Player."""
 
-    def __init__(self):
-        self._video_library = VideoLibrary()
+    def __init__(self, video_library=None, clock=time.monotonic,
+                 event_log=None, trending_half_life=TRENDING_HALF_LIFE,
+                 rng=None, scheduler=None, duration=simulated_duration,
+                 popularity=None, caches=None):
+        """The VideoPlayer class is initialized.
+
+        Args:
+            video_library: The storage backend to serve videos from, an
+                in-memory VideoLibrary by default.
+            clock: Returns the current time in seconds, used to expire
+                temporary flags.
+            event_log: A PlaybackEventLog receiving every playback state
+                transition, or None to record nothing.
+            trending_half_life: Seconds over which a play counts half as
+                much towards TRENDING.
+            rng: The random.Random PLAY_RANDOM and SHUFFLE draw with, seed
+                it for reproducible draws; the random module by default.
+            scheduler: The PlaybackScheduler advancing queued playback. By
+                default players on the monotonic clock share one for the
+                whole process, others get their own.
+            duration: Returns the length of a video_id in seconds.
+            popularity: A (most played, trending) pair of
+                PopularityTrackers to share between sessions, so they rank
+                every session's plays; a private pair by default.
+            caches: The LibraryCaches of SUGGEST and PLAY_RANDOM to share
+                between sessions of the same library and popularity; a
+                private one by default.
+        """
+        if video_library is None:
+            video_library = VideoLibrary()
+        self._video_library = video_library
         self._paused = False
         self._playing = None
         self._playlists = {}
-        self._flagged = {}
+        # Keys of self._playlists, for completing playlist names.
+        self._playlist_keys = PrefixTrie()
+        # Reverse index from video_id to the keys of the playlists holding it.
+        self._video_playlists = {}
+        self._flagged = VideoFlags(video_library)
+        # Alias tables of filtered or weighted PLAY_RANDOM draws, by source,
+        # each stored with the state it was built from.
+        self._random_tables = {}
+        self._library_version = 0
+        # Held while the library is diffed against the catalogue or a
+        # diff is applied, the former possibly on another thread.
+        self._reload_lock = threading.Lock()
+        self._flags_version = 0
+        self._plays = 0
+        self._rng = random if rng is None else rng
+        self._clock = clock
+        # Created with the first temporary flag; most sessions never need it.
+        self._flag_expiry = None
+        self._event_log = event_log
+        if popularity is None:
+            popularity = (PopularityTracker(clock=clock), PopularityTracker(
+                half_life=trending_half_life, clock=clock))
+        self._most_played, self._trending = popularity
+        if caches is None:
+            caches = LibraryCaches(video_library, self._most_played.estimate)
+        self._caches = caches
+        if scheduler is None:
+            scheduler = (shared_scheduler() if clock is time.monotonic
+                         else PlaybackScheduler(start=clock()))
+        self._scheduler = scheduler
+        self._duration = duration
+        # Video ids queued by PLAY_PLAYLIST and the position of the one
+        # that is, or was last, played from the queue.
+        self._queue = []
+        self._queue_index = None
+        # Whether the current video was started from the queue, so that
+        # it moves on to the next one when it ends.
+        self._queue_playing = False
+        # Seconds played before the last CONTINUE, and when that was; None
+        # while paused or stopped.
+        self._position = 0.0
+        self._resumed_at = None
 
     def number_of_videos(self):
-        num_videos = len(self._video_library.get_all_videos())
+        num_videos = len(self._video_library)
         print(f"{num_videos} videos in the library")
 
+    def reload_library(self):
+        """Re-reads the catalogue and applies only the videos that changed.
+
+        Videos removed from the catalogue are stopped, unflagged and dropped
+        from every playlist; changed videos are refreshed in place.
+        """
+        try:
+            prepared = self.diff_library()
+        except (OSError, ValueError) as e:
+            # The library is left as it was.
+            print(f"Cannot reload library: {e}")
+            return
+        self.apply_library_diff(prepared)
+
+    def diff_library(self):
+        """Re-reads the catalogue and compares it with the library.
+
+        The library is left untouched, so this may run on another thread
+        while commands are served, and only apply_library_diff has to run
+        between two commands.
+
+        Returns:
+            What apply_library_diff takes.
+
+        Raises:
+            OSError, ValueError: If the catalogue cannot be read.
+        """
+        with self._reload_lock:
+            return self._library_version, self._video_library.diff_catalogue()
+
+    def apply_library_diff(self, prepared):
+        """Applies a diff returned by diff_library, as reload_library does.
+
+        A diff taken before another reload was applied no longer
+        describes the library, and the catalogue is then diffed again.
+
+        Args:
+            prepared: The value returned by diff_library.
+        """
+        version, diff = prepared
+        with self._reload_lock:
+            if version != self._library_version:
+                try:
+                    diff = self._video_library.diff_catalogue()
+                except (OSError, ValueError) as e:
+                    print(f"Cannot reload library: {e}")
+                    return
+            self._apply_diff(diff)
+
+    def _apply_diff(self, diff):
+        """Applies a LibraryDiff to the library, playlists and playback."""
+        # Playlists and flags hold library handles, so removed videos
+        # leave them while their handles still resolve.
+        for video in diff.removed:
+            if video.video_id in self._flagged:
+                self._clear_flags([video.video_id])
+            for key in self._playlists_containing(video.video_id):
+                self._playlists[key].remove(video)
+            self._video_playlists.pop(video.video_id, None)
+        self._video_library.apply_diff(diff)
+        self._caches.apply_diff(diff)
+        self._random_tables.clear()
+        self._library_version += 1
+        for video in diff.removed:
+            if self._playing == video.video_id:
+                print(f"Stopping video: {video.title}")
+                self._log_event("STOP")
+                self._playing = None
+                self._paused = False
+                self._stop_clock()
+        print(f"Reloaded library: {len(diff.added)} added, "
+              f"{len(diff.removed)} removed, {len(diff.changed)} changed")
+
     def show_all_videos(self):
         """Returns all videos."""
 
@@ -34,8 +228,19 @@ class VideoPlayer:
         Args:
             video_id: The video_id to be played.
         """
+        self._play_video(video_id, "PLAY")
+
+    def _play_video(self, video_id, event, from_queue=False):
+        """Plays a video, logging the transition as the given event.
+
+        Args:
+            video_id: The video_id to be played.
+            event: The transition recorded in the event log.
+            from_queue: Whether the video was started from the queue and
+                should move on to the next queued video when it ends.
+        """
         new_video = self._video_library.get_video(video_id)
-        if not new_video:
+        if new_video is None:
             print("Cannot play video: Video does not exist")
         else:
             if (video_id in self._flagged):
@@ -45,9 +250,173 @@ class VideoPlayer:
                 if self._playing:
                     print(
                         f"Stopping video: {self._video_library.get_video(self._playing).title}")
+                    self._log_event("STOP")
                 self._playing = video_id
                 print(
                     f"Playing video: {self._video_library.get_video(self._playing).title}")
+                self._log_event(event)
+                self._record_play(video_id)
+                self._start_clock(from_queue, self._clock())
+
+    def _record_play(self, video_id):
+        """Counts a play towards the popularity rankings."""
+        self._plays += 1
+        self._most_played.record(video_id)
+        self._trending.record(video_id)
+        self._caches.record_play(video_id)
+
+    def _start_clock(self, from_queue, started_at):
+        """Starts the simulated playback of the current video."""
+        self._queue_playing = from_queue
+        self._position = 0.0
+        self._resumed_at = started_at
+        if from_queue:
+            self._scheduler.schedule(
+                self._video_ended, started_at + self._duration(self._playing))
+        else:
+            self._scheduler.cancel(self._video_ended)
+
+    def _stop_clock(self):
+        self._queue_playing = False
+        self._position = 0.0
+        self._resumed_at = None
+        self._scheduler.cancel(self._video_ended)
+
+    def _elapsed(self):
+        """Returns how many seconds of the current video have been played."""
+        position = self._position
+        if self._resumed_at is not None:
+            position += self._clock() - self._resumed_at
+        return min(position, self._duration(self._playing))
+
+    def _video_ended(self):
+        """Moves a queued video that played to its end on to the next one.
+
+        Called by the scheduler; the next video starts when the previous
+        one ended rather than when the wheel noticed, so a session that
+        was idle for a while catches up with every video it went through.
+        """
+        ended_at = (self._resumed_at + self._duration(self._playing)
+                    - self._position)
+        self._log_event("STOP")
+        index = self._next_playable(self._queue_index, 1)
+        if index is None:
+            self._playing = None
+            self._stop_clock()
+            return
+        self._queue_index = index
+        self._playing = self._queue[index]
+        self._log_event("AUTOPLAY")
+        self._record_play(self._playing)
+        self._start_clock(True, ended_at)
+
+    def advance_playback(self):
+        """Runs the end-of-video timers that are due.
+
+        Timers of every player sharing the scheduler run, not only this
+        player's.
+        """
+        self._scheduler.advance(self._clock())
+
+    def _next_playable(self, index, step, queue=None):
+        """Returns the next queue position holding a playable video.
+
+        Args:
+            index: The position to start after, None for before the queue.
+            step: 1 to look forwards, -1 to look backwards.
+            queue: The video ids to look through, the current queue by
+                default.
+        """
+        if queue is None:
+            queue = self._queue
+        index = -1 if index is None else index
+        while 0 <= index + step < len(queue):
+            index += step
+            video_id = queue[index]
+            if (video_id not in self._flagged
+                    and self._video_library.get_video(video_id) is not None):
+                return index
+        return None
+
+    def play_playlist(self, playlist_name):
+        """Queues the videos of a playlist and plays the first one.
+
+        Args:
+            playlist_name: The playlist name.
+        """
+        playlist = self._playlists.get(playlist_name.lower())
+        if playlist is None:
+            print(f"Cannot play playlist {playlist_name}: "
+                  "Playlist does not exist")
+            return
+        queue = [video.video_id for video in playlist.videos()]
+        if not queue:
+            print(f"Cannot play playlist {playlist_name}: Playlist is empty")
+            return
+        # The running queue is only replaced once the new one can play.
+        index = self._next_playable(None, 1, queue)
+        if index is None:
+            print(f"Cannot play playlist {playlist_name}: "
+                  "No playable videos")
+            return
+        print(f"Playing playlist: {playlist_name}")
+        self._queue = queue
+        self._queue_index = index
+        self._play_video(queue[index], "PLAY_PLAYLIST", from_queue=True)
+
+    def _skip(self, step, action, boundary):
+        """Plays the next or previous playable video of the queue."""
+        if not self._queue:
+            print(f"Cannot play {action} video: Queue is empty")
+            return
+        index = self._next_playable(self._queue_index, step)
+        if index is None:
+            print(f"Cannot play {action} video: {boundary} of queue")
+            return
+        self._queue_index = index
+        self._play_video(self._queue[index], action.upper(), from_queue=True)
+
+    def play_next_video(self):
+        """Skips to the next playable video of the queue."""
+        self._skip(1, "next", "End")
+
+    def play_previous_video(self):
+        """Goes back to the previous playable video of the queue."""
+        self._skip(-1, "previous", "Start")
+
+    def shuffle_queue(self):
+        """Shuffles the queued videos after the current one."""
+        if not self._queue:
+            print("Cannot shuffle queue: Queue is empty")
+            return
+        start = 0 if self._queue_index is None else self._queue_index + 1
+        upcoming = self._queue[start:]
+        self._rng.shuffle(upcoming)
+        self._queue[start:] = upcoming
+        print(f"Shuffled {len(upcoming)} queued videos")
+
+    def show_queue(self):
+        """Displays the queue, marking the current video and its position."""
+        if not self._queue:
+            print("Queue is empty")
+            return
+        print("Queue:")
+        found = self._video_library.get_videos(self._queue)
+        for index, video_id in enumerate(self._queue):
+            video = found.get(video_id)
+            line = video.parse_video() if video is not None else video_id
+            if index == self._queue_index and self._playing == video_id:
+                status = " - PAUSED" if self._paused else ""
+                print(f"  > {index + 1}. {line} - "
+                      f"{_format_seconds(self._elapsed())} / "
+                      f"{_format_seconds(self._duration(video_id))}{status}")
+            else:
+                print(f"    {index + 1}. {line}")
+
+    def _log_event(self, event):
+        """Emits a playback transition of the current video, if logging."""
+        if self._event_log is not None:
+            self._event_log.emit(event, self._playing)
 
     def stop_video(self):
         """Stops the current video."""
@@ -56,20 +425,151 @@ class VideoPlayer:
         else:
             print(
                 f"Stopping video: {self._video_library.get_video(self._playing).title}")
+            self._log_event("STOP")
             self._playing = None
+            self._stop_clock()
 
-    def play_random_video(self):
-        """Plays a random video from the video library."""
+    def play_random_video(self, source=None, popular=False):
+        """Plays a random unflagged video.
 
-        videos = self._video_library.get_all_videos()
-        for video in videos:
-            if video.video_id in self._flagged:
-                videos.remove(video)
-        if not len(videos):
+        Args:
+            source: A '#tag' or playlist name to draw from, the whole
+                library if None.
+            popular: Weight each video by one plus its play count.
+        """
+        if source is None and not popular:
+            video_id = self._caches.random_pool().choice(
+                self._rng, self._include_unflagged)
+        else:
+            table = self._random_table(source, popular)
+            if table is None:
+                return
+            video_id = table.sample(self._rng)
+            if popular and video_id is not None:
+                video_id = video_id.sample(self._rng)
+        if video_id is None:
             print("No videos available")
         else:
-            video = random.choice(videos)
-            self.play_video(video.video_id)
+            self._play_video(video_id, "PLAY_RANDOM")
+
+    def _random_table(self, source, popular):
+        """Returns the alias table to draw from, rebuilding it if stale.
+
+        The uniform table of a source holds its unflagged videos and is
+        rebuilt when the library is reloaded, a flag changes or the
+        playlist it was built from changes. That of the whole library is
+        the shared random pool, skipping flagged videos as it draws. A popularity weighted draw
+        gives each video a weight of one plus its play count: it picks
+        either the uniform table, with weight its size, or a table of the
+        most played videos of the source weighted by their counts, which
+        is rebuilt every POPULAR_REBUILD_PLAYS plays.
+
+        Returns:
+            An AliasTable whose members are video_ids or, for popularity
+            weighted draws, AliasTables. None, after printing why, if the
+            source playlist does not exist.
+        """
+        stamp = (self._library_version, self._flags_version)
+        if source is None:
+            key = None
+            in_source = lambda video: True
+        elif source.startswith("#"):
+            key = source
+            in_source = lambda video: source in video.tags
+        else:
+            playlist = self._playlists.get(source.lower())
+            if playlist is None:
+                print(f"Cannot play random video from {source}: "
+                      "Playlist does not exist")
+                return None
+            key = source.lower()
+            in_source = lambda video: playlist.contains(video.video_id)
+            stamp += (playlist, playlist.version())
+
+        if source is None:
+            pool = self._caches.random_pool()
+            uniform = FilteredPool(pool, self._include_unflagged,
+                                   len(pool) - len(self._flagged))
+        else:
+            cached = self._random_tables.get((key, False))
+            if cached is not None and cached[0] == stamp:
+                uniform = cached[1]
+            else:
+                if source.startswith("#"):
+                    videos = self._video_library.get_videos_with_tag(source)
+                else:
+                    videos = playlist.videos()
+                uniform = AliasTable(video.video_id for video in videos
+                                     if video.video_id not in self._flagged)
+                self._random_tables[(key, False)] = (stamp, uniform)
+        if not popular:
+            return uniform
+
+        stamp += (self._plays // POPULAR_REBUILD_PLAYS,)
+        cached = self._random_tables.get((key, True))
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        def include(video_id):
+            video = self._video_library.get_video(video_id)
+            return (video is not None and video_id not in self._flagged
+                    and in_source(video))
+
+        played = self._most_played.top(POPULAR_CANDIDATES, include)
+        tables = [uniform, AliasTable(
+            (video_id for video_id, _ in played),
+            [count for _, count in played])]
+        table = AliasTable(
+            tables, [len(uniform), sum(count for _, count in played)])
+        self._random_tables[(key, True)] = (stamp, table)
+        return table
+
+    def _include_unflagged(self, video_id):
+        return video_id not in self._flagged
+
+    def show_recommendations(self, video_id, n=POPULAR_SHOWN):
+        """Displays the unflagged videos sharing the most tags with a video.
+
+        Args:
+            video_id: The video to find similar ones for.
+            n: Number of videos to list.
+        """
+        video = self._video_library.get_video(video_id)
+        if video is None:
+            print("Cannot recommend videos: Video does not exist")
+            return
+        similar = self._video_library.similar_videos(
+            video_id, n, self._include_unflagged)
+        if not similar:
+            print(f"No videos similar to {video.title}")
+            return
+        print(f"Videos similar to {video.title}:")
+        found = self._video_library.get_videos(
+            similar_id for similar_id, _ in similar)
+        for rank, (similar_id, score) in enumerate(similar, 1):
+            print(f"  {rank}. {found[similar_id].parse_video()} - "
+                  f"similarity {score:.2f}")
+
+    def play_similar_video(self, video_id=None):
+        """Plays the unflagged video most similar to a video.
+
+        Args:
+            video_id: The video to start from, the one playing by default.
+        """
+        video_id = video_id or self._playing
+        if video_id is None:
+            print("Cannot play similar video: No video is currently playing")
+            return
+        if self._video_library.get_video(video_id) is None:
+            print("Cannot play similar video: Video does not exist")
+            return
+        similar = self._video_library.similar_videos(
+            video_id, 1, lambda similar_id: similar_id not in self._flagged
+            and similar_id != self._playing)
+        if not similar:
+            print("Cannot play similar video: No similar videos found")
+        else:
+            self._play_video(similar[0][0], "PLAY_SIMILAR")
 
     def pause_video(self):
         """Pauses the current video."""
@@ -81,6 +581,10 @@ class VideoPlayer:
                 print(
                     f"Pausing video: {self._video_library.get_video(self._playing).title}")
                 self._paused = True
+                self._log_event("PAUSE")
+                self._position = self._elapsed()
+                self._resumed_at = None
+                self._scheduler.cancel(self._video_ended)
             else:
                 print(
                     f"Video already paused: {self._video_library.get_video(self._playing).title}")
@@ -97,6 +601,63 @@ class VideoPlayer:
                 print(
                     f"Continuing video: {self._video_library.get_video(self._playing).title}")
                 self._paused = False
+                self._log_event("CONTINUE")
+                self._resumed_at = self._clock()
+                if self._queue_playing:
+                    self._scheduler.schedule(
+                        self._video_ended,
+                        self._resumed_at + self._duration(self._playing)
+                        - self._position)
+
+    def _show_popular(self, tracker, heading, n, count_format):
+        """Lists the top videos of a tracker, skipping flagged or removed ones."""
+        ranked = tracker.top(
+            n, lambda video_id: video_id not in self._flagged
+            and self._video_library.get_video(video_id) is not None)
+        if not ranked:
+            print("No videos have been played yet")
+            return
+        print(heading)
+        for rank, (video_id, count) in enumerate(ranked, 1):
+            video = self._video_library.get_video(video_id)
+            print(f"  {rank}. {video.parse_video()} - {count_format(count)}")
+
+    def show_most_played(self, n=POPULAR_SHOWN):
+        """Displays the videos played the most since startup.
+
+        Args:
+            n: Number of videos to list.
+        """
+        self._show_popular(self._most_played, "Most played videos:", n,
+                           lambda count: f"{count:.0f} plays")
+
+    def show_trending(self, n=POPULAR_SHOWN):
+        """Displays the videos played the most recently, by decayed count.
+
+        Args:
+            n: Number of videos to list.
+        """
+        self._show_popular(self._trending, "Trending videos:", n,
+                           lambda count: f"score {count:.2f}")
+
+    def show_suggestions(self, prefix, n=SUGGESTIONS_SHOWN):
+        """Displays the unflagged videos whose titles start with a prefix.
+
+        The most played come first, the others in alphabetical order.
+
+        Args:
+            prefix: The case insensitive start of the titles.
+            n: Number of videos to list.
+        """
+        video_ids = self._caches.suggestions().suggest(
+            prefix, n, self._include_unflagged)
+        if not video_ids:
+            print(f"No suggestions for {prefix}")
+            return
+        print(f"Suggestions for {prefix}:")
+        for i, video_id in enumerate(video_ids, 1):
+            video = self._video_library.get_video(video_id)
+            print(f"  {i}. {video.parse_video()}")
 
     def show_playing(self):
         """Displays video currently playing."""
@@ -117,40 +678,217 @@ class VideoPlayer:
             playlist_name: The playlist name.
         """
         if not self._playlists.get(playlist_name.lower(), None):
-            self._playlists[playlist_name.lower()] = Playlist(playlist_name)
+            self._playlists[playlist_name.lower()] = Playlist(
+                playlist_name, self._video_library)
+            self._playlist_keys.insert(playlist_name.lower())
             print(f"Successfully created new playlist: {playlist_name}")
         else:
             print("Cannot create playlist: A playlist with the same name already exists")
 
-    def add_to_playlist(self, playlist_name, video_id):
+    def add_to_playlist(self, playlist_name, video_id, position=None):
         """Adds a video to a playlist with a given name.
 
         Args:
             playlist_name: The playlist name.
             video_id: The video_id to be added.
+            position: The 1-based position to insert at, the end by default.
         """
         video = self._video_library.get_video(video_id)
 
         playlist = self._playlists.get(playlist_name.lower())
 
-        if playlist and video:
+        if playlist and video is not None:
             if (video_id in self._flagged):
                 print(f"Cannot add video to {playlist_name}: Video is currently flagged (reason: {self._flagged[video_id]})")
             else:    
-                if not video_id in playlist.videos():
-                    playlist.add(video)
-                    print(f"Added video to {playlist_name}: {video.title}")
-                else:
+                if playlist.contains(video_id):
                     print(
                         f"Cannot add video to {playlist_name}: Video already added")
+                elif position is not None and not 1 <= position <= playlist.size() + 1:
+                    print(f"Cannot add video to {playlist_name}: Invalid position")
+                else:
+                    if position is None:
+                        playlist.add(video)
+                    else:
+                        playlist.insert(position - 1, video)
+                    self._index_playlist_video(
+                        playlist_name.lower(), video_id)
+                    print(f"Added video to {playlist_name}: {video.title}")
 
         if not playlist:
             print(
                 f"Cannot add video to {playlist_name}: Playlist does not exist")
 
-        elif not video:
+        elif video is None:
             print(f"Cannot add video to {playlist_name}: Video does not exist")
 
+    def bulk_add_to_playlist(self, playlist_name, video_ids):
+        """Adds many videos to a playlist with a given name.
+
+        All ids are validated against the library in one lookup before
+        any of them is added.
+
+        Args:
+            playlist_name: The playlist name.
+            video_ids: The video_ids to be added, in order.
+
+        Returns:
+            The number of videos added and a list of (video_id, reason)
+            pairs for those that were not.
+        """
+        key = playlist_name.lower()
+        playlist = self._playlists.get(key)
+        if not playlist:
+            print(f"Cannot add videos to {playlist_name}: Playlist does not exist")
+            return 0, []
+        video_ids = list(video_ids)
+        found = self._video_library.get_videos(video_ids)
+        added, failures, seen = [], [], set()
+        for video_id in video_ids:
+            video = found.get(video_id)
+            if video is None:
+                failures.append((video_id, "Video does not exist"))
+            elif video_id in self._flagged:
+                failures.append((video_id, "Video is currently flagged "
+                                 f"(reason: {self._flagged[video_id]})"))
+            elif video_id in seen or playlist.contains(video_id):
+                failures.append((video_id, "Video already added"))
+            else:
+                seen.add(video_id)
+                added.append(video)
+        playlist.extend(added)
+        for video in added:
+            self._index_playlist_video(key, video.video_id)
+        _print_bulk_summary(
+            f"Added {len(added)} videos to {playlist_name}", failures)
+        return len(added), failures
+
+    def move_in_playlist(self, playlist_name, video_id, position):
+        """Moves a video to a new position within a playlist.
+
+        Args:
+            playlist_name: The playlist name.
+            video_id: The video_id to be moved.
+            position: The 1-based target position.
+        """
+        playlist = self._playlists.get(playlist_name.lower())
+        if not playlist:
+            print(f"Cannot move video in {playlist_name}: Playlist does not exist")
+        elif not playlist.contains(video_id):
+            print(f"Cannot move video in {playlist_name}: Video is not in playlist")
+        elif not 1 <= position <= playlist.size():
+            print(f"Cannot move video in {playlist_name}: Invalid position")
+        else:
+            playlist.move(video_id, position - 1)
+            video = playlist.get(position - 1)
+            print(f"Moved video in {playlist_name}: {video.title} to position {position}")
+
+    def duplicate_playlist(self, playlist_name, new_playlist_name):
+        """Creates a new playlist holding the videos of an existing one.
+
+        Args:
+            playlist_name: The playlist to copy.
+            new_playlist_name: The name of the new playlist.
+        """
+        playlist = self._playlists.get(playlist_name.lower())
+        if not playlist:
+            print(f"Cannot duplicate playlist {playlist_name}: Playlist does not exist")
+        elif new_playlist_name.lower() in self._playlists:
+            print("Cannot duplicate playlist: A playlist with the same name already exists")
+        else:
+            key = new_playlist_name.lower()
+            self._playlists[key] = playlist.duplicate(new_playlist_name)
+            self._playlist_keys.insert(key)
+            self._index_playlist(key)
+            print(f"Duplicated playlist {playlist_name} as {new_playlist_name}")
+
+    def combine_playlists(self, operation, target_name, source_names):
+        """Creates or overwrites a playlist from the union, intersection or
+        difference of existing playlists. Flagged videos are skipped.
+
+        Args:
+            operation: One of "union", "intersection" or "difference".
+            target_name: The playlist to create or overwrite.
+            source_names: The playlists to combine, in order. For a
+                difference, videos of the first playlist that are in none
+                of the others are kept.
+        """
+        sources = []
+        for name in source_names:
+            playlist = self._playlists.get(name.lower())
+            if not playlist:
+                print(f"Cannot create playlist {target_name} from {operation}: "
+                      f"Playlist {name} does not exist")
+                return
+            sources.append(playlist)
+
+        # The set algebra runs on library handles, not video ids.
+        first, others = sources[0], sources[1:]
+        if operation == "union":
+            handles = dict.fromkeys(itertools.chain.from_iterable(
+                playlist.handles() for playlist in sources))
+        elif operation == "intersection":
+            handles = [handle for handle in first.handles()
+                       if all(other.contains_handle(handle) for other in others)]
+        else:
+            handles = [handle for handle in first.handles()
+                       if not any(other.contains_handle(handle) for other in others)]
+        videos = self._video_library.videos_at(
+            handle for handle in handles
+            if not self._flagged.contains_handle(handle))
+
+        key = target_name.lower()
+        target = self._playlists.get(key)
+        if target:
+            self._unindex_playlist(key)
+            target.clear()
+        else:
+            target = self._playlists[key] = Playlist(
+                target_name, self._video_library)
+            self._playlist_keys.insert(key)
+        target.extend(videos)
+        for video in videos:
+            self._index_playlist_video(key, video.video_id)
+        print(f"Created {target.name()} from {operation} of "
+              f"{', '.join(source_names)}: {len(videos)} videos")
+
+    def snapshot_playlist(self, playlist_name):
+        """Records the current contents of a playlist as a new version.
+
+        Args:
+            playlist_name: The playlist name.
+        """
+        playlist = self._playlists.get(playlist_name.lower())
+        if not playlist:
+            print(f"Cannot snapshot playlist {playlist_name}: Playlist does not exist")
+        else:
+            version = playlist.snapshot()
+            print(f"Created snapshot {version} of {playlist_name}")
+
+    def restore_playlist(self, playlist_name, version):
+        """Brings a playlist back to a snapshot taken earlier.
+
+        Videos that have since left the library are skipped, and videos
+        changed by a catalogue reload are refreshed.
+
+        Args:
+            playlist_name: The playlist name.
+            version: The 1-based snapshot version.
+        """
+        key = playlist_name.lower()
+        playlist = self._playlists.get(key)
+        if not playlist:
+            print(f"Cannot restore playlist {playlist_name}: Playlist does not exist")
+            return
+        if not 1 <= version <= playlist.num_snapshots():
+            print(f"Cannot restore playlist {playlist_name}: Snapshot does not exist")
+            return
+        self._unindex_playlist(key)
+        playlist.restore(version)
+        playlist.prune()
+        self._index_playlist(key)
+        print(f"Restored {playlist_name} to snapshot {version}")
+
     def show_all_playlists(self):
         """Display all playlists."""
         if not len(self._playlists):
@@ -160,27 +898,39 @@ class VideoPlayer:
             for playlist in sorted(self._playlists.keys()):
                 print(f"{self._playlists[playlist].name()}")
 
-    def show_playlist(self, playlist_name):
+    def show_playlist(self, playlist_name, page=None,
+                      page_size=PLAYLIST_PAGE_SIZE):
         """Display all videos in a playlist with a given name.
 
         Args:
             playlist_name: The playlist name.
+            page: The 1-based page to show, or None for the whole playlist.
+            page_size: The number of videos on a page.
         """
         playlist = self._playlists.get(playlist_name.lower())
         if not playlist:
             print(
                 f"Cannot show playlist {playlist_name}: Playlist does not exist")
-        else:
-            print(f"Showing playlist: {playlist_name}")
+            return
+        num_pages = max(1, -(-playlist.size() // max(page_size, 1)))
+        if page is not None and (page_size < 1 or not 1 <= page <= num_pages):
+            print(f"Cannot show playlist {playlist_name}: Page does not exist")
+            return
+        print(f"Showing playlist: {playlist_name}")
+        if not playlist.size():
+            print(f"No videos here yet")
+            return
+        if page is None:
             videos = playlist.videos()
-            if not len(videos):
-                print(f"No videos here yet")
-            else:
-                for key in videos:
-                    out = videos[key].parse_video()
-                    if (key in self._flagged):
-                        out += f" - FLAGGED (reason: {self._flagged[key]}"
-                    print(out)
+        else:
+            videos = playlist.page((page - 1) * page_size, page_size)
+        for video in videos:
+            out = video.parse_video()
+            if (video.video_id in self._flagged):
+                out += f" - FLAGGED (reason: {self._flagged[video.video_id]}"
+            print(out)
+        if page is not None:
+            print(f"Page {page} of {num_pages}")
 
     def remove_from_playlist(self, playlist_name, video_id):
         """Removes a video to a playlist with a given name.
@@ -193,10 +943,11 @@ class VideoPlayer:
         video = self._video_library.get_video(video_id)
 
         if (playlist):
-            if (video):
-                videos_list = playlist.videos()
-                if video.video_id in videos_list:
+            if video is not None:
+                if playlist.contains(video.video_id):
                     playlist.remove(video)
+                    self._unindex_playlist_video(
+                        playlist_name.lower(), video.video_id)
                     print(f"Removed video from {playlist_name}: {video.title}")
                 else:
                     print(
@@ -219,6 +970,7 @@ class VideoPlayer:
             print(
                 f"Cannot clear playlist {playlist_name}: Playlist does not exist")
         else:
+            self._unindex_playlist(playlist_name.lower())
             playlist.clear()
             print(f"Successfully removed all videos from {playlist_name}")
 
@@ -233,19 +985,83 @@ class VideoPlayer:
             print(
                 f"Cannot delete playlist {playlist_name}: Playlist does not exist")
         else:
+            self._unindex_playlist(playlist_name)
             self._playlists.pop(playlist_name)
+            self._playlist_keys.remove(playlist_name)
             print(f"Deleted playlist: {playlist_name}")
 
+    def _index_playlist_video(self, playlist_key, video_id):
+        """Adds one playlist to the reverse index entry of a video."""
+        self._video_playlists.setdefault(video_id, set()).add(playlist_key)
+
+    def _unindex_playlist_video(self, playlist_key, video_id):
+        """Drops one playlist from the reverse index entry of a video."""
+        playlist_keys = self._video_playlists[video_id]
+        playlist_keys.discard(playlist_key)
+        if not playlist_keys:
+            del self._video_playlists[video_id]
+
+    def _index_playlist(self, playlist_key):
+        """Adds every video of a playlist to the reverse index."""
+        for video in self._playlists[playlist_key].videos():
+            self._index_playlist_video(playlist_key, video.video_id)
+
+    def _unindex_playlist(self, playlist_key):
+        """Drops every video of a playlist from the reverse index."""
+        for video in self._playlists[playlist_key].videos():
+            self._unindex_playlist_video(playlist_key, video.video_id)
+
+    def _playlists_containing(self, video_id):
+        """Returns the keys of the playlists holding a video."""
+        return set(self._video_playlists.get(video_id, ()))
+
+    def complete_playlist_names(self, prefix, limit):
+        """Returns the names of the playlists starting with a prefix.
+
+        Args:
+            prefix: The case insensitive start of the names.
+            limit: Maximum number of names returned.
+        """
+        return [self._playlists[key].name()
+                for key in self._playlist_keys.complete(prefix.lower(), limit)]
+
+    def complete_video_ids(self, prefix, limit):
+        """Returns the video ids starting with a prefix, in sorted order.
+
+        Args:
+            prefix: The start of the video ids.
+            limit: Maximum number of ids returned.
+        """
+        return self._video_library.complete_ids(prefix, limit)
+
+    def show_video_playlists(self, video_id):
+        """Display all playlists containing a given video.
+
+        Args:
+            video_id: The video_id to look up.
+        """
+        video = self._video_library.get_video(video_id)
+        if video is None:
+            print("Cannot show playlists: Video does not exist")
+            return
+        playlist_keys = self._playlists_containing(video_id)
+        if not playlist_keys:
+            print(f"{video.title} is not in any playlist")
+        else:
+            print(f"Playlists containing {video.title}:")
+            for key in sorted(playlist_keys):
+                print(f"{self._playlists[key].name()}")
+
     def search_videos(self, search_term):
         """Display all the videos whose titles contain the search_term.
 
         Args:
             search_term: The query to be used in search.
         """
-        videos = self._video_library.get_all_videos()
+        videos = self._video_library.search_titles(search_term)
         out = []
         for video in videos:
-            if search_term.lower() in video.title.lower() and video.video_id not in self._flagged:
+            if video.video_id not in self._flagged:
                 out.append(video)
         if not out:
             print(f"No search results for {search_term}")
@@ -269,11 +1085,7 @@ class VideoPlayer:
         Args:
             video_tag: The video tag to be used in search.
         """
-        videos = self._video_library.get_all_videos()
-        out = []
-        for video in videos:
-            if video_tag in video.tags:
-                out.append(video)
+        out = self._video_library.get_videos_with_tag(video_tag)
         if not out:
             print(f"No search results for {video_tag}")
         else:
@@ -290,23 +1102,140 @@ class VideoPlayer:
             except:
                 pass
 
-    def flag_video(self, video_id, flag_reason="Not supplied"):
+    def _set_flags(self, flags, ttl=None):
+        """Flags every video_id of a {video_id: reason} dict in one batch.
+
+        Args:
+            flags: The reasons to flag videos with, keyed by video_id.
+            ttl: Seconds after which the flags expire on their own, None
+                to keep them until the videos are allowed.
+
+        Raises:
+            ValueError: If ttl is not positive.
+        """
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Time to live must be positive, not {ttl}")
+        self._flagged.update(flags)
+        self._flags_version += 1
+        if ttl is not None:
+            if self._flag_expiry is None:
+                self._flag_expiry = TimerWheel(start=self._clock())
+            deadline = self._clock() + ttl
+            for video_id in flags:
+                self._flag_expiry.schedule(video_id, deadline)
+
+    def _clear_flags(self, video_ids):
+        """Removes the flags of the given video_ids in one batch."""
+        self._flags_version += 1
+        for video_id in video_ids:
+            del self._flagged[video_id]
+            if self._flag_expiry is not None:
+                self._flag_expiry.cancel(video_id)
+
+    def expire_flags(self):
+        """Removes the temporary flags whose time to live has passed.
+
+        Only the timers that are due are visited, so this is cheap enough
+        to run before every command.
+        """
+        if self._flag_expiry is None:
+            return
+        expired = self._flag_expiry.advance(self._clock())
+        if expired:
+            self._clear_flags(expired)
+
+    def _select_matching(self, field, pattern):
+        """Returns the videos whose tag or title matches a pattern.
+
+        Args:
+            field: "tag" to match a tag exactly, "title" to match titles
+                containing the pattern.
+            pattern: The tag or title search term.
+        """
+        if field == "tag":
+            return self._video_library.get_videos_with_tag(pattern)
+        return self._video_library.search_titles(pattern)
+
+    def flag_matching(self, field, pattern, flag_reason="Not supplied"):
+        """Flags every video whose tag or title matches a pattern.
+
+        Args:
+            field: "tag" or "title", see _select_matching.
+            pattern: The tag or title search term.
+            flag_reason: Reason for flagging the videos.
+        """
+        flags = {video.video_id: flag_reason
+                 for video in self._select_matching(field, pattern)
+                 if video.video_id not in self._flagged}
+        self._set_flags(flags)
+        print(f"Flagged {len(flags)} videos matching {field} {pattern} "
+              f"(reason: {flag_reason})")
+
+    def allow_matching(self, field, pattern):
+        """Removes the flags of every video whose tag or title matches a pattern.
+
+        Args:
+            field: "tag" or "title", see _select_matching.
+            pattern: The tag or title search term.
+        """
+        video_ids = [video.video_id
+                     for video in self._select_matching(field, pattern)
+                     if video.video_id in self._flagged]
+        self._clear_flags(video_ids)
+        print(f"Removed flag from {len(video_ids)} videos matching "
+              f"{field} {pattern}")
+
+    def flag_video(self, video_id, flag_reason="Not supplied", ttl=None):
         """Mark a video as flagged.
 
         Args:
             video_id: The video_id to be flagged.
             flag_reason: Reason for flagging the video.
+            ttl: Seconds after which the flag expires, None to keep it
+                until the video is allowed.
         """
         video = self._video_library.get_video(video_id)
-        if video:
+        if video is not None:
             if (video_id not in self._flagged):
-                self._flagged[video_id] = flag_reason
-                print(f"Successfully flagged video: {video.title} (reason: {self._flagged[video_id]})")
+                self._set_flags({video_id: flag_reason}, ttl)
+                out = f"Successfully flagged video: {video.title} (reason: {self._flagged[video_id]})"
+                if ttl is not None:
+                    out += f" for {ttl} seconds"
+                print(out)
             else:
                 print(f"Cannot flag video: Video is already flagged")
         else:
             print("Cannot flag video: Video does not exist")
 
+    def bulk_flag_videos(self, flags, ttl=None):
+        """Marks many videos as flagged.
+
+        All ids are validated against the library in one lookup before
+        any flag is applied.
+
+        Args:
+            flags: (video_id, flag_reason) pairs; a reason of None stands
+                for the default one.
+            ttl: Seconds after which the flags expire, None to keep them.
+
+        Returns:
+            The number of videos flagged and a list of (video_id, reason)
+            pairs for those that were not.
+        """
+        flags = list(flags)
+        found = self._video_library.get_videos(video_id for video_id, _ in flags)
+        flagged, failures = {}, []
+        for video_id, flag_reason in flags:
+            if video_id not in found:
+                failures.append((video_id, "Video does not exist"))
+            elif video_id in self._flagged or video_id in flagged:
+                failures.append((video_id, "Video is already flagged"))
+            else:
+                flagged[video_id] = flag_reason or "Not supplied"
+        self._set_flags(flagged, ttl)
+        _print_bulk_summary(f"Flagged {len(flagged)} videos", failures)
+        return len(flagged), failures
+
     def allow_video(self, video_id):
         """Removes a flag from a video.
 
@@ -314,12 +1243,115 @@ class VideoPlayer:
             video_id: The video_id to be allowed again.
         """
         video = self._video_library.get_video(video_id)
-        if video:
+        if video is not None:
             if (video_id in self._flagged):
-                del self._flagged[video_id]
+                self._clear_flags([video_id])
                 print(f"Successfully removed flag from video: {video.title}")
             else:
                 print("Cannot remove flag from video: Video is not flagged")
         else:
             print("Cannot remove flag from video: Video does not exist")
 
+    def save_state(self):
+        """Returns the playlists, flags and playback of the session as
+        plain data that json can store.
+
+        Videos are kept by video_id, and times relative to when the state
+        was saved, so that load_state can bring the session back in
+        another process, whose clock need not match this one.
+        """
+        now = self._clock()
+        flags = []
+        for video_id, reason in self._flagged.items():
+            deadline = (None if self._flag_expiry is None
+                        else self._flag_expiry.deadline(video_id))
+            flags.append([video_id, reason,
+                          None if deadline is None else deadline - now])
+        return {
+            "playlists": [playlist.save_state()
+                          for playlist in self._playlists.values()],
+            "flags": flags,
+            "playing": self._playing,
+            "paused": self._paused,
+            "position": self._elapsed() if self._playing else 0.0,
+            "queue": list(self._queue),
+            "queue_index": self._queue_index,
+            "queue_playing": self._queue_playing,
+        }
+
+    def load_state(self, state, idle=0.0):
+        """Restores a session saved by save_state into this empty player.
+
+        The time spent saved counts: temporary flags whose time to live
+        ran out expire with the next command, and a video that was playing
+        went on, through the rest of the queue if it was played from one.
+        Videos that have left the library since are dropped.
+
+        Args:
+            state: The data returned by save_state.
+            idle: Seconds since the state was saved.
+        """
+        now = self._clock()
+        for playlist_state in state["playlists"]:
+            playlist = Playlist.from_state(playlist_state, self._video_library)
+            key = playlist.name().lower()
+            self._playlists[key] = playlist
+            self._playlist_keys.insert(key)
+            for video in playlist.videos():
+                self._index_playlist_video(key, video.video_id)
+        flags = [(video_id, reason, ttl)
+                 for video_id, reason, ttl in state["flags"]
+                 if self._video_library.handle(video_id) is not None]
+        permanent = {video_id: reason
+                     for video_id, reason, ttl in flags if ttl is None}
+        if permanent:
+            self._set_flags(permanent)
+        for video_id, reason, ttl in flags:
+            # Flags whose time ran out while saved are not restored.
+            if ttl is not None and ttl > idle:
+                self._set_flags({video_id: reason}, ttl - idle)
+        self._queue = state["queue"]
+        self._queue_index = state["queue_index"]
+        playing = state["playing"]
+        if (playing is None
+                or self._video_library.get_video(playing) is None):
+            return
+        self._playing = playing
+        self._paused = state["paused"]
+        self._queue_playing = state["queue_playing"]
+        self._position = state["position"]
+        if not self._paused:
+            self._resumed_at = now - idle
+            if self._queue_playing:
+                self._scheduler.schedule(
+                    self._video_ended, self._resumed_at
+                    + self._duration(playing) - self._position)
+
+    def state_size(self):
+        """Returns what the memory of the session grows with.
+
+        Returns:
+            The number of playlists, of videos held by playlists and their
+            snapshots, of flags and queued videos and of videos held for
+            PLAY_RANDOM draws from a tag or playlist, or weighted by
+            popularity. The last are caches, rebuilt on demand rather than
+            saved; the SUGGEST index and the random pool of the whole
+            library are shared with other sessions and not counted.
+        """
+        videos = sum(playlist.stored_size()
+                     for playlist in self._playlists.values())
+        drawn = 0
+        for (_, popular), (_, table) in self._random_tables.items():
+            # Popular tables share the uniform one and add the most played.
+            drawn += POPULAR_CANDIDATES if popular else len(table)
+        return (len(self._playlists), videos,
+                len(self._flagged) + len(self._queue), drawn)
+
+    def close(self):
+        """Cancels the timers the player left on a shared scheduler and
+        drops its caches.
+
+        The player must not be used afterwards.
+        """
+        self._scheduler.cancel(self._video_ended)
+        self._random_tables.clear()
@@ -1,14 +1,22 @@
 """A video playlist class."""
 
-from typing import Sequence
+from typing import Iterable, Sequence
+from .indexed_list import IndexedList
 from .video import Video
 
 class Playlist:
-    """A class used to represent a Playlist."""
+    """A class used to represent a Playlist.
 
-    def __init__(self, name: str):
+    The videos are stored as library handles in an array-backed
+    IndexedList, and only looked up in the library when read.
+    """
+
+    def __init__(self, name: str, library):
         self._name = name
-        self._videos = {}
+        self._library = library
+        self._videos = IndexedList(typecode="i")
+        self._snapshots = []
+        self._version = 0
 
     def set_name(self, name: str):
         self._name = name
@@ -17,13 +25,141 @@ class Playlist:
         return self._name
 
     def videos(self) -> Sequence[Video]:
-        return self._videos
+        return self._library.videos_at(self._videos)
+
+    def handles(self) -> Sequence[int]:
+        """Returns the library handles of the videos, in order."""
+        return list(self._videos)
+
+    def version(self) -> int:
+        """Returns a counter bumped whenever videos are added or removed."""
+        return self._version
+
+    def size(self) -> int:
+        return len(self._videos)
+
+    def stored_size(self) -> int:
+        """Returns the number of videos held, snapshots included."""
+        return len(self._videos) + sum(map(len, self._snapshots))
+
+    def contains(self, video_id: str) -> bool:
+        handle = self._library.handle(video_id)
+        return handle is not None and handle in self._videos
+
+    def contains_handle(self, handle: int) -> bool:
+        return handle in self._videos
+
+    def index(self, video_id: str) -> int:
+        """Returns the 0-based position of a video in the playlist."""
+        return self._videos.index(self._library.handle(video_id))
+
+    def get(self, index: int) -> Video:
+        """Returns the video at a 0-based position."""
+        return self._library.video_at(self._videos.at(index))
+
+    def page(self, start: int, count: int) -> Iterable[Video]:
+        """Returns up to count videos starting at a 0-based position."""
+        return self._library.videos_at(
+            self._videos.slice(start, start + count))
 
     def add(self, video: Video):
-        self._videos[video.video_id] = video
+        self._videos.append(self._library.handle(video.video_id))
+        self._version += 1
+
+    def extend(self, videos: Iterable[Video]):
+        """Adds many videos at the end in one pass."""
+        handle = self._library.handle
+        try:
+            self._videos.extend(handle(video.video_id) for video in videos)
+        finally:
+            self._version += 1
+
+    def insert(self, index: int, video: Video):
+        """Adds a video before a 0-based position."""
+        self._videos.insert(index, self._library.handle(video.video_id))
+        self._version += 1
+
+    def move(self, video_id: str, index: int):
+        """Moves a video to a new 0-based position."""
+        self._videos.move(self._library.handle(video_id), index)
 
     def remove(self, video):
-        del self._videos[video.video_id]
+        self._videos.remove(self._library.handle(video.video_id))
+        self._version += 1
+
+    def prune(self) -> int:
+        """Drops the videos that have left the library.
+
+        Returns:
+            The number of videos dropped.
+        """
+        handles = list(self._videos)
+        gone = [handle for handle, video in zip(
+            handles, self._library.videos_at(handles)) if video is None]
+        for handle in gone:
+            self._videos.remove(handle)
+        if gone:
+            self._version += 1
+        return len(gone)
 
     def clear(self):
-        self._videos = {}
+        self._videos.clear()
+        self._version += 1
+
+    def duplicate(self, name: str) -> "Playlist":
+        """Returns a playlist with the same videos, sharing their storage.
+
+        The copy is O(1); either playlist copies only the parts it later
+        modifies. Snapshots are not carried over.
+        """
+        playlist = Playlist(name, self._library)
+        playlist._videos = self._videos.copy()
+        return playlist
+
+    def snapshot(self) -> int:
+        """Records the current videos and returns the 1-based version."""
+        self._snapshots.append(self._videos.copy())
+        return len(self._snapshots)
+
+    def num_snapshots(self) -> int:
+        return len(self._snapshots)
+
+    def restore(self, version: int):
+        """Replaces the videos with those recorded by snapshot()."""
+        self._videos = self._snapshots[version - 1].copy()
+        self._version += 1
+
+    def save_state(self) -> dict:
+        """Returns the playlist and its snapshots as plain data.
+
+        Videos are listed by video_id, since handles only mean something
+        to the library instance that issued them.
+        """
+        def video_ids(handles):
+            return [video.video_id
+                    for video in self._library.videos_at(list(handles))
+                    if video is not None]
+
+        return {
+            "name": self._name,
+            "videos": video_ids(self._videos),
+            "snapshots": [video_ids(snapshot) for snapshot in self._snapshots],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, library) -> "Playlist":
+        """Rebuilds a playlist from the data returned by save_state().
+
+        Videos that are no longer in the library are dropped.
+        """
+        def handles(video_ids):
+            found = map(library.handle, video_ids)
+            return IndexedList(
+                [handle for handle in found if handle is not None],
+                typecode="i")
+
+        playlist = cls(state["name"], library)
+        playlist._videos = handles(state["videos"])
+        playlist._snapshots = [handles(video_ids)
+                               for video_ids in state["snapshots"]]
+        return playlist
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from src.array_map import ArrayMap
+
+
+def test_matches_a_dict():
+    rng = random.Random(3)
+    mapping, expected = ArrayMap(), {}
+    for _ in range(2000):
+        key = rng.randrange(300)
+        if rng.random() < 0.6:
+            mapping[key] = expected[key] = rng.randrange(10)
+        elif key in expected:
+            del mapping[key]
+            del expected[key]
+        assert (key in mapping) == (key in expected)
+        assert mapping.get(key) == expected.get(key)
+    assert list(mapping.items()) == sorted(expected.items())
+    with pytest.raises(KeyError):
+        mapping[1000]
+    with pytest.raises(KeyError):
+        del mapping[1000]
+
+
+def test_large_updates_are_merged():
+    mapping = ArrayMap({5: 1, 500: 2})
+    mapping.update((key, key) for key in range(0, 1000, 2))
+    assert len(mapping) == 501
+    assert mapping[500] == 500 and mapping[5] == 1
+    clone = mapping.copy()
+    del clone[0]
+    assert 0 in mapping and 0 not in clone
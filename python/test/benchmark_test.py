@@ -0,0 +1,62 @@
+from bench.benchmark import (
+    BENCHMARKS, UNBENCHMARKED_VERBS, compare, run_benchmarks)
+from bench.catalogue_generator import generate_videos, write_catalogue
+from bench.similarity import run as run_similarity
+from src.command_completer import COMMAND_ARGUMENTS
+from src.video_library import VideoLibrary
+
+
+def test_generator_is_reproducible_and_configurable():
+    videos = list(generate_videos(200, title_words=(3, 3), num_tags=5,
+                                  tags_per_video=(2, 2), seed=1))
+    assert videos == list(generate_videos(200, title_words=(3, 3), num_tags=5,
+                                          tags_per_video=(2, 2), seed=1))
+    assert len({video_id for _, video_id, _ in videos}) == 200
+    assert all(len(title.split()) == 3 for title, _, _ in videos)
+    assert all(len(tags) == 2 for _, _, tags in videos)
+
+
+def test_written_catalogue_loads(tmp_path):
+    path = write_catalogue(tmp_path / "videos.txt.gz", 50, seed=2)
+    library = VideoLibrary(path)
+    expected = list(generate_videos(50, seed=2))
+    assert len(library) == 50
+    title, video_id, tags = expected[7]
+    assert library.get_video(video_id).title == title
+    assert list(library.get_video(video_id).tags) == tags
+
+
+def test_run_benchmarks_covers_every_command(tmp_path):
+    results = run_benchmarks([20], min_time=0, max_iterations=2,
+                             work_dir=tmp_path)
+    scale = results["scales"]["20"]
+    assert scale["load_peak_bytes"] > 0
+    assert set(scale["commands"]) == {name for name, _, _, _ in BENCHMARKS}
+    assert compare(results, results, 0.2) == []
+
+
+def test_every_command_has_a_benchmark():
+    benchmarked = {verb for _, verbs, _, _ in BENCHMARKS for verb in verbs}
+    assert benchmarked <= set(COMMAND_ARGUMENTS)
+    assert set(COMMAND_ARGUMENTS) - benchmarked == set(UNBENCHMARKED_VERBS)
+
+
+def test_compare_flags_regressions():
+    def document(load_seconds, play_us):
+        return {"scales": {"1000": {
+            "load_seconds": load_seconds, "load_peak_bytes": 100,
+            "commands": {"play_video": {"mean_us": play_us}}}}}
+
+    regressions = compare(document(1.0, 3.0), document(1.0, 2.0), 0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("1000 play_video mean_us")
+    assert compare(document(1.1, 2.0), document(1.0, 2.0), 0.2) == []
+
+
+def test_similarity_measurements():
+    results = run_similarity([300], queries=20)
+    scale = results["scales"]["300"]
+    assert scale["index_bytes"] > 0
+    assert scale["build_peak_bytes"] >= scale["index_bytes"]
+    assert scale["similar"]["queries"] == 20
+    assert 0 <= scale["similar"]["p50_ms"] <= scale["similar"]["max_ms"]
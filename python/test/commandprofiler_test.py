@@ -0,0 +1,58 @@
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.video_player import VideoPlayer
+
+
+def test_profile_next_writes_one_report_per_command(capfd, tmp_path):
+    parser = CommandParser(VideoPlayer(), profile_dir=tmp_path)
+    parser.execute_command(["PROFILE_NEXT", "2"])
+    parser.execute_command(["NUMBER_OF_VIDEOS"])
+    with pytest.raises(CommandException):
+        parser.execute_command(["PLAY"])
+    parser.execute_command(["SHOW_ALL_VIDEOS"])
+
+    reports = sorted(tmp_path.iterdir())
+    assert [report.name.split("-")[-1] for report in reports] == [
+        "NUMBER_OF_VIDEOS.txt", "PLAY.txt"]
+    text = reports[0].read_text()
+    assert "Command: NUMBER_OF_VIDEOS" in text
+    assert "Top functions by cumulative time:" in text
+    assert "number_of_videos" in text
+    assert "Top allocation sites:" in text
+
+
+def test_profile_on_and_off(capfd, tmp_path):
+    parser = CommandParser(VideoPlayer(), profile_dir=tmp_path / "reports")
+    parser.execute_command(["PROFILE", "ON"])
+    parser.execute_command(["NUMBER_OF_VIDEOS"])
+    parser.execute_command(["NUMBER_OF_VIDEOS"])
+    parser.execute_command(["PROFILE", "OFF"])
+    parser.execute_command(["NUMBER_OF_VIDEOS"])
+    out, err = capfd.readouterr()
+
+    assert len(list((tmp_path / "reports").iterdir())) == 2
+    assert "Profiling stopped" in out
+
+
+def test_report_names_only_use_safe_verbs(capfd, tmp_path):
+    parser = CommandParser(VideoPlayer(), profile_dir=tmp_path / "reports")
+    parser.execute_command(["PROFILE_NEXT", "2"])
+    parser.execute_command(["../../escape"])
+    parser.execute_command(["play_random"])
+
+    reports = sorted((tmp_path / "reports").iterdir())
+    assert [report.name.split("-")[-1] for report in reports] == [
+        "UNKNOWN.txt", "PLAY_RANDOM.txt"]
+    assert list(tmp_path.iterdir()) == [tmp_path / "reports"]
+
+
+def test_report_write_errors_are_printed(capfd, tmp_path):
+    blocker = tmp_path / "reports"
+    blocker.write_text("not a directory")
+    parser = CommandParser(VideoPlayer(), profile_dir=blocker)
+    parser.execute_command(["PROFILE_NEXT", "1"])
+    parser.execute_command(["NUMBER_OF_VIDEOS"])
+    out, err = capfd.readouterr()
+    assert "Cannot write profile report:" in out
+    assert "5 videos in the library" in out
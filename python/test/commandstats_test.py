@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.command_stats import CommandStats, LatencyHistogram
+from src.video_player import VideoPlayer
+
+
+def test_histogram_buckets_are_contiguous_and_tight():
+    previous = -1
+    for index in range(200):
+        upper = LatencyHistogram.bucket_upper_bound(index)
+        assert upper > previous
+        assert LatencyHistogram.bucket_index(upper) == index
+        assert LatencyHistogram.bucket_index(previous + 1) == index
+        assert upper - previous <= max(1, (previous + 1) // 8 + 1)
+        previous = upper
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for value in range(1, 1001):
+        histogram.record(value)
+    assert histogram.count == 1000
+    assert 450 <= histogram.percentile(50) <= 570
+    assert 900 <= histogram.percentile(99) <= 1000
+    assert histogram.percentile(100) == 1000
+
+
+def test_parser_records_calls_and_errors(capfd, tmp_path):
+    stats = CommandStats(sample_every=1)
+    parser = CommandParser(VideoPlayer(), stats)
+    parser.execute_command(["NUMBER_OF_VIDEOS"])
+    parser.execute_command(["number_of_videos"])
+    parser.execute_command(["NOT_A_COMMAND"])
+    with pytest.raises(CommandException):
+        parser.execute_command(["PLAY"])
+    parser.execute_command(["STATS", "JSON", str(tmp_path / "stats.json")])
+    parser.execute_command(["STATS", "PROMETHEUS", str(tmp_path / "stats.prom")])
+
+    document = json.loads((tmp_path / "stats.json").read_text())
+    assert document["NUMBER_OF_VIDEOS"]["calls"] == 2
+    assert document["NUMBER_OF_VIDEOS"]["errors"] == 0
+    assert document["UNKNOWN"]["calls"] == 1
+    assert document["PLAY"]["errors"] == 1
+    prometheus = (tmp_path / "stats.prom").read_text()
+    assert 'yt_command_calls_total{verb="NUMBER_OF_VIDEOS"} 2' in prometheus
+    assert ('yt_command_latency_seconds_bucket{verb="PLAY",le="+Inf"} 1'
+            in prometheus)
+
+
+def test_histogram_cumulative_counts():
+    histogram = LatencyHistogram()
+    for value in (1, 20, 20, 5000):
+        histogram.record(value)
+    assert list(histogram.cumulative_counts([0, 10, 100, 10_000, 10**6])) == [
+        (0, 0), (10, 1), (100, 3), (10_000, 4), (10**6, 4)]
+
+
+def test_prometheus_exports_every_bucket_of_every_verb():
+    stats = CommandStats(sample_every=1)
+    stats.record("PLAY", 3_000)
+    stats.record("PLAY", 2_000_000)
+    stats.record("STOP")
+    lines = stats.to_prometheus().splitlines()
+    for verb, counts in (("PLAY", (0, 0, 1, 1)), ("STOP", (0, 0, 0, 0))):
+        buckets = [line for line in lines
+                   if line.startswith(f'yt_command_latency_seconds_bucket{{verb="{verb}"')]
+        assert len(buckets) == len(CommandStats.PROMETHEUS_BUCKETS) + 1
+        assert [int(line.split()[-1]) for line in buckets[:4]] == list(counts)
+    assert 'yt_command_latency_seconds_bucket{verb="PLAY",le="0.0025"} 2' in lines
+    assert 'yt_command_latency_seconds_bucket{verb="PLAY",le="+Inf"} 2' in lines
+    assert 'yt_command_latency_seconds_bucket{verb="STOP",le="+Inf"} 0' in lines
+
+
+def test_show_marks_verbs_never_timed(capfd):
+    stats = CommandStats(sample_every=1)
+    stats.record("PLAY", 3_000)
+    stats.record("STOP")
+    stats.show()
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert lines[1].split() == ["PLAY", "1", "0", "3.0", "3.0", "3.0"]
+    assert lines[2].split() == ["STOP", "1", "0", "-", "-", "-"]
+
+
+def test_stats_disabled(capfd):
+    parser = CommandParser(VideoPlayer())
+    parser.execute_command(["STATS"])
+    out, err = capfd.readouterr()
+    assert "Command statistics are disabled" in out
+
+
+def test_sampled_timing_counts_every_call(capfd):
+    stats = CommandStats(sample_every=4)
+    parser = CommandParser(VideoPlayer(), stats)
+    for _ in range(10):
+        parser.execute_command(["NUMBER_OF_VIDEOS"])
+    assert stats.verbs() == ["NUMBER_OF_VIDEOS"]
+    assert stats.calls["NUMBER_OF_VIDEOS"] == 10
+    assert stats.latency("NUMBER_OF_VIDEOS").count == 3
+
+
+def test_sampled_calls_count_unknown_verbs_and_errors(capfd):
+    stats = CommandStats(sample_every=100)
+    parser = CommandParser(VideoPlayer(), stats)
+    parser.execute_command(["number_of_videos"])
+    parser.execute_command(["NOT_A_COMMAND"])
+    with pytest.raises(CommandException):
+        parser.execute_command(["PLAY"])
+    assert stats.calls == {"NUMBER_OF_VIDEOS": 1, "UNKNOWN": 1, "PLAY": 1}
+    assert stats.errors == {"PLAY": 1}
+
+
+def test_sample_every_must_be_positive():
+    with pytest.raises(ValueError):
+        CommandStats(sample_every=0)
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from src.command_completer import CommandCompleter
+from src.prefix_trie import PrefixTrie
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def test_trie_matches_a_sorted_scan():
+    rng = random.Random(4)
+
+    def word():
+        return "".join(rng.choice("abc") for _ in range(rng.randint(0, 6)))
+
+    keys = {word() for _ in range(100)}
+    trie = PrefixTrie(keys)
+    for _ in range(2000):
+        key = word()
+        if rng.random() < 0.5:
+            trie.insert(key)
+            keys.add(key)
+        else:
+            trie.remove(key)
+            keys.discard(key)
+        assert len(trie) == len(keys)
+        assert (key in trie) == (key in keys)
+        prefix = word()[:3]
+        expected = sorted(key for key in keys if key.startswith(prefix))
+        assert trie.complete(prefix) == expected
+        limit = rng.randint(1, 4)
+        if len(expected) > limit:
+            expected = expected[:limit - 1] + expected[-1:]
+        assert trie.complete(prefix, limit) == expected
+
+
+def test_removal_merges_edges():
+    trie = PrefixTrie(["video_1", "video_12", "video_2"])
+    trie.remove("video_1")
+    trie.remove("video_2")
+    assert trie._root.children["v"].label == "video_12"
+    assert trie.complete("video_") == ["video_12"]
+    assert trie.complete("videos") == []
+
+
+@pytest.fixture
+def completer():
+    player = VideoPlayer()
+    for name in ("Cats", "cars", "Dogs"):
+        player.create_playlist(name)
+    return player, CommandCompleter(player, limit=3)
+
+
+def test_completes_verbs_ids_and_playlists(completer):
+    player, completer = completer
+    assert completer.candidates("", 0, "show_p") == [
+        "SHOW_PLAYING", "SHOW_PLAYLIST"]
+    assert completer.candidates("PLAY ", 5, "a") == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+    # More than three ids match: the last one offered is the greatest.
+    assert completer.candidates("play ", 5, "") == [
+        "amazing_cats_video_id", "another_cat_video_id", "nothing_video_id"]
+    assert completer.candidates("ADD_TO_PLAYLIST ", 16, "CA") == [
+        "cars", "Cats"]
+    assert completer.candidates("ADD_TO_PLAYLIST cats ", 21, "f") == [
+        "funny_dogs_video_id"]
+    assert completer.candidates("PLAYLIST_UNION a b c ", 21, "d") == ["Dogs"]
+    assert completer.candidates("FLAG_VIDEO x ", 13, "") == []
+    assert completer.candidates("SEARCH_VIDEOS ", 14, "a") == []
+
+
+def test_playlist_names_follow_the_session(completer, capfd):
+    player, completer = completer
+    player.delete_playlist("cars")
+    player.duplicate_playlist("dogs", "Dogs2")
+    player.combine_playlists("union", "cafe", ["cats", "dogs"])
+    assert completer.candidates("SHOW_PLAYLIST ", 14, "") == [
+        "cafe", "Cats", "Dogs2"]
+    assert completer.candidates("SHOW_PLAYLIST ", 14, "ca") == ["cafe", "Cats"]
+
+
+@pytest.mark.parametrize("make_library", [
+    lambda path: VideoLibrary(path),
+    lambda path: SqliteVideoLibrary(catalogue_path=path),
+])
+def test_ids_follow_reloads(tmp_path, make_library):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("A | a_1 | #x\nB | a_2 | #x\nC | b_1 | #y\n")
+    library = make_library(catalogue)
+    assert library.complete_ids("a", 5) == ["a_1", "a_2"]
+    assert library.complete_ids("", 2) == ["a_1", "b_1"]
+    assert library.complete_ids("c", 5) == []
+    catalogue.write_text("A | a_1 | #x\nC | b_1 | #y\nD | a_3 | #y\n")
+    library.apply_diff(library.diff_catalogue())
+    assert library.complete_ids("a_", 5) == ["a_1", "a_3"]
+
+
+def test_library_ids_complete_like_the_trie(tmp_path):
+    rng = random.Random(7)
+    ids = {"".join(rng.choice("ab_") for _ in range(rng.randint(1, 5)))
+           for _ in range(80)}
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("".join(f"T | {video_id} | #x\n" for video_id in ids))
+    library = VideoLibrary(catalogue)
+    trie = PrefixTrie(ids)
+    for _ in range(500):
+        prefix = "".join(rng.choice("ab_") for _ in range(rng.randint(0, 3)))
+        limit = rng.randint(0, 6)
+        assert library.complete_ids(prefix, limit) == trie.complete(prefix, limit)
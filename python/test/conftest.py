@@ -0,0 +1,14 @@
+import pytest
+
+from src import video_player
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.video_library import VideoLibrary
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def library_backend(request, monkeypatch):
+    """Makes VideoPlayer() default to each storage backend in turn."""
+    backend = {"memory": VideoLibrary, "sqlite": SqliteVideoLibrary}[
+        request.param]
+    monkeypatch.setattr(video_player, "VideoLibrary", backend)
+    return request.param
@@ -0,0 +1,45 @@
+from bench.catalogue_generator import write_catalogue
+from bench.cross_impl import (compare_outputs, generate_commands, print_report,
+                              run_harness, split_outputs)
+
+
+def test_generated_commands_are_reproducible():
+    commands = generate_commands(100, 500, seed=3)
+    assert commands == generate_commands(100, 500, seed=3)
+    assert len(commands) == 500
+    verbs = {command.split()[0] for command in commands}
+    assert "PLAY" in verbs and "ADD_TO_PLAYLIST" in verbs
+    assert not verbs & {"PLAY_RANDOM", "SEARCH_VIDEOS", "SEARCH_VIDEOS_WITH_TAG"}
+
+
+def test_split_and_compare_outputs():
+    python = ("Hello\nbanner\nYT> 3 videos in the library\nYT> Playing video: A"
+              "  \nYT> YouTube has now terminated its execution.\n")
+    cpp = ("Hello banner\nYT> 3 videos in the library\nYT> Playing video: B\n"
+           "YT> YouTube has now terminated it's execution.\n")
+    commands = ["NUMBER_OF_VIDEOS", "PLAY b_id"]
+    outputs = {"python": split_outputs(python, 2), "cpp": split_outputs(cpp, 2)}
+    assert outputs["python"] == ["3 videos in the library", "Playing video: A"]
+    assert compare_outputs(commands, outputs) == [
+        (1, "PLAY b_id",
+         {"cpp": "Playing video: B", "python": "Playing video: A"})]
+    assert split_outputs("banner\nYT> crashed", 3) == ["crashed", "", ""]
+
+
+def test_harness_skips_missing_implementations(capfd, tmp_path):
+    catalogue = write_catalogue(tmp_path / "videos.txt", 30)
+    commands = generate_commands(30, 20)
+    results = run_harness(commands, catalogue, tmp_path, repeats=1,
+                          cpp_binary=tmp_path / "missing",
+                          java_classes=tmp_path / "missing")
+    assert list(results["implementations"]) == ["python"]
+    python = results["implementations"]["python"]
+    assert python["peak_rss_bytes"] > 0
+    assert python["startup_seconds"] > 0
+    assert results["disagreements"] == 0
+    capfd.readouterr()
+
+    print_report(results)
+    lines = capfd.readouterr().out.splitlines()
+    assert lines[1].split()[0] == "python"
+    assert lines[2] == "0 of 20 commands answered differently"
@@ -0,0 +1,73 @@
+import pytest
+
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.video_flags import VideoFlags
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+@pytest.mark.parametrize("make_library", [
+    lambda path: VideoLibrary(path),
+    lambda path: SqliteVideoLibrary(catalogue_path=path),
+])
+def test_handles_survive_reloads(tmp_path, make_library):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("A | a_id | #x\nB | b_id | #x\nC | c_id | #y\n")
+    library = make_library(catalogue)
+    handles = {video_id: library.handle(video_id)
+               for video_id in ("a_id", "b_id", "c_id")}
+    assert len(set(handles.values())) == 3
+    assert library.handle("missing") is None
+    assert library.video_at(handles["b_id"]).title == "B"
+
+    catalogue.write_text("A | a_id | #x\nC2 | c_id | #y\nD | d_id | #z\n")
+    library.apply_diff(library.diff_catalogue())
+    assert library.handle("b_id") is None
+    assert library.handle("c_id") == handles["c_id"]
+    assert [video and video.title for video in library.videos_at(
+        [handles["c_id"], handles["b_id"], handles["a_id"]])] == [
+            "C2", None, "A"]
+    assert library.handle("d_id") not in handles.values()
+
+
+def test_flags_store_handles():
+    library = VideoLibrary()
+    flags = VideoFlags(library)
+    flags.update({"funny_dogs_video_id": "dogs", "amazing_cats_video_id": "cats"})
+    flags["another_cat_video_id"] = "cats"
+    assert "funny_dogs_video_id" in flags and "missing" not in flags
+    assert flags["another_cat_video_id"] == "cats"
+    assert flags.contains_handle(library.handle("amazing_cats_video_id"))
+    del flags["amazing_cats_video_id"]
+    assert sorted(flags) == ["another_cat_video_id", "funny_dogs_video_id"]
+    assert flags._reasons == ["dogs", "cats"]
+    with pytest.raises(KeyError):
+        flags["missing"]
+    with pytest.raises(KeyError):
+        del flags["amazing_cats_video_id"]
+
+
+def test_playlists_follow_changed_and_removed_videos(tmp_path, capfd):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("A | a_id | #x\nB | b_id | #x\nC | c_id | #y\n")
+    player = VideoPlayer(VideoLibrary(catalogue))
+    player.create_playlist("mix")
+    for video_id in ("c_id", "a_id", "b_id"):
+        player.add_to_playlist("mix", video_id)
+    player.snapshot_playlist("mix")
+    player.combine_playlists("intersection", "copy", ["mix", "mix"])
+    catalogue.write_text("A2 | a_id | #x\nC | c_id | #y\n")
+    player.reload_library()
+    capfd.readouterr()
+    player.show_playlist("copy")
+    player.restore_playlist("mix", 1)
+    player.show_playlist("mix")
+    assert capfd.readouterr().out.splitlines() == [
+        "Showing playlist: copy",
+        "C (c_id) [#y]",
+        "A2 (a_id) [#x]",
+        "Restored mix to snapshot 1",
+        "Showing playlist: mix",
+        "C (c_id) [#y]",
+        "A2 (a_id) [#x]",
+    ]
@@ -0,0 +1,143 @@
+import random
+
+import pytest
+
+from src.indexed_list import IndexedList
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(IndexedList, "BLOCK_SIZE", 4)
+
+
+@pytest.mark.parametrize("typecode", [None, "i"])
+def test_positional_operations_match_list(small_blocks, typecode):
+    rng = random.Random(7)
+    items = IndexedList(typecode=typecode)
+    expected = []
+    for value in range(500):
+        op = rng.random()
+        if op < 0.5 or not expected:
+            index = rng.randint(0, len(expected))
+            items.insert(index, value)
+            expected.insert(index, value)
+        elif op < 0.75:
+            key = rng.choice(expected)
+            assert items.remove(key) == key
+            expected.remove(key)
+        else:
+            key = rng.choice(expected)
+            index = rng.randrange(len(expected))
+            items.move(key, index)
+            expected.remove(key)
+            expected.insert(index, key)
+        assert len(items) == len(expected)
+
+    assert list(items) == expected
+    for index, key in enumerate(expected):
+        assert items.at(index) == key
+        assert items.index(key) == index
+    assert list(items.slice(10, 30)) == expected[10:30]
+    assert list(items.slice(len(expected) - 3, len(expected) + 5)) == expected[-3:]
+
+
+def test_keyed_items_and_replace():
+    items = IndexedList([("a", 1), ("b", 2)], key=lambda item: item[0])
+    items.replace(("a", 3))
+
+    assert "a" in items and "c" not in items
+    assert items.get("a") == ("a", 3)
+    assert items.get("c") is None
+    assert list(items) == [("a", 3), ("b", 2)]
+
+
+@pytest.mark.parametrize("typecode", [None, "i"])
+def test_rejects_duplicates_and_bad_indexes(typecode):
+    items = IndexedList([1, 2], typecode=typecode)
+    with pytest.raises(KeyError):
+        items.append(1)
+    with pytest.raises(IndexError):
+        items.at(2)
+    with pytest.raises(IndexError):
+        items.insert(3, 5)
+    with pytest.raises(KeyError):
+        items.extend([*range(3, 600), 5])
+    assert list(items) == list(range(1, 600)) and items.index(599) == 598
+    items.clear()
+    assert len(items) == 0 and list(items) == []
+
+
+@pytest.mark.parametrize("typecode", [None, "i"])
+def test_copy_on_write(small_blocks, typecode):
+    original = IndexedList(range(50), typecode=typecode)
+    clone = original.copy()
+    clone.remove(10)
+    clone.insert(0, 100)
+    original.move(49, 0)
+
+    assert list(original) == [49] + list(range(49))
+    assert list(clone) == [100] + [i for i in range(50) if i != 10]
+    assert 10 in original and 10 not in clone
+    assert 100 in clone and 100 not in original
+    shared = [uid for uid in original._blocks
+              if original._blocks[uid] is clone._blocks.get(uid)]
+    assert shared
+
+
+def test_array_storage():
+    items = IndexedList(range(1000), typecode="i")
+    assert all(type(block).__name__ == "array" for block in items._blocks.values())
+    with pytest.raises(ValueError):
+        IndexedList(typecode="i", key=abs)
+
+
+@pytest.mark.parametrize("typecode", [None, "i"])
+def test_copies_diverge_independently(small_blocks, monkeypatch, typecode):
+    monkeypatch.setattr(IndexedList, "KEY_BUCKETS", 4)
+    monkeypatch.setattr(IndexedList, "BUCKET_CHANGES", 2)
+    rng = random.Random(11)
+    lists = [IndexedList(range(200), typecode=typecode)]
+    expected = [list(range(200))]
+    next_key = 200
+    for step in range(2000):
+        which = rng.randrange(len(lists))
+        items, values = lists[which], expected[which]
+        op = rng.random()
+        if op < 0.05:
+            lists.append(items.copy())
+            expected.append(list(values))
+        elif op < 0.5 or not values:
+            index = rng.randint(0, len(values))
+            items.insert(index, next_key)
+            values.insert(index, next_key)
+            next_key += 1
+        else:
+            key = rng.choice(values)
+            items.remove(key)
+            values.remove(key)
+        if step % 100 == 0:
+            for items, values in zip(lists, expected):
+                assert list(items) == values
+                assert all(key in items for key in values)
+    for items, values in zip(lists, expected):
+        assert list(items) == values
+        assert [items.index(key) for key in values] == list(range(len(values)))
+        present = set(values)
+        assert not any(key in items for key in range(next_key)
+                       if key not in present)
+
+
+@pytest.mark.parametrize("typecode", [None, "i"])
+def test_writes_after_a_copy_copy_only_the_changed_keys(typecode):
+    original = IndexedList(typecode=typecode)
+    original.extend(range(100000))
+    clone = original.copy()
+    # Splitting a block moves BLOCK_SIZE keys to a new one.
+    for key in range(100000, 100000 + IndexedList.BLOCK_SIZE + 1):
+        clone.insert(1, key)
+    clone.remove(5)
+    assert all(mine is theirs
+               for mine, theirs in zip(original._where, clone._where))
+    changed = sum(len(changes) for changes in clone._changes if changes)
+    assert changed <= 3 * IndexedList.BLOCK_SIZE
+    assert 5 in original and 5 not in clone and clone.index(100000) == 257
@@ -0,0 +1,104 @@
+import io
+from pathlib import Path
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from src.command_completer import CommandCompleter
+from src.library_loader import LibraryLoader
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def test_player_answers_while_the_library_loads(capfd):
+    release = threading.Event()
+
+    def load(progress):
+        progress(1000)
+        release.wait()
+        return VideoLibrary()
+
+    loader = LibraryLoader(load)
+    player = VideoPlayer(loader)
+    player.create_playlist("mix")
+    assert not loader.ready()
+    assert capfd.readouterr().out == "Successfully created new playlist: mix\n"
+
+    timer = threading.Timer(0.05, release.set)
+    timer.start()
+    progress = io.StringIO()
+    assert isinstance(loader.wait(interval=0.01, file=progress), VideoLibrary)
+    lines = progress.getvalue().split("\r")
+    assert lines[1].startswith("Loading video library: ")
+    assert lines[-1].startswith("Loaded video library: 5 videos in ")
+    assert loader.ready()
+
+    player.add_to_playlist("mix", "amazing_cats_video_id")
+    player.number_of_videos()
+    assert capfd.readouterr().out.splitlines() == [
+        "Added video to mix: Amazing Cats",
+        "5 videos in the library",
+    ]
+    progress = io.StringIO()
+    loader.wait(file=progress)
+    assert progress.getvalue() == ""
+
+
+def test_completions_never_wait_for_the_load():
+    release = threading.Event()
+
+    def load(progress):
+        release.wait()
+        return VideoLibrary()
+
+    loader = LibraryLoader(load)
+    completer = CommandCompleter(VideoPlayer(loader))
+    assert completer.candidates("PLAY ", 5, "a") == []
+    assert completer.candidates("", 0, "PAU") == ["PAUSE"]
+    release.set()
+    loader.wait(file=io.StringIO())
+    assert completer.candidates("PLAY ", 5, "a") == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+
+    def fail(progress):
+        raise FileNotFoundError("videos.txt")
+
+    failed = LibraryLoader(fail)
+    failed.future.exception()
+    assert failed.complete_ids("a", 10) == []
+
+
+def test_load_errors_reach_the_waiter():
+    def load(progress):
+        raise FileNotFoundError("videos.txt")
+
+    loader = LibraryLoader(load)
+    with pytest.raises(FileNotFoundError):
+        loader.wait(file=io.StringIO())
+    with pytest.raises(FileNotFoundError):
+        len(loader)
+
+
+def test_repl_survives_a_failed_load(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-m", "src.run",
+         "--catalogue", str(tmp_path / "missing.txt")],
+        input="NUMBER_OF_VIDEOS\nCREATE_PLAYLIST mix\nEXIT\n",
+        capture_output=True, text=True, cwd=Path(__file__).parent.parent,
+        timeout=60)
+    assert result.returncode == 0
+    assert "Traceback" not in result.stderr
+    out = result.stdout
+    assert "Cannot load video library: [Errno 2] No such file or directory" in out
+    assert "Successfully created new playlist: mix" in out
+    assert "Thank you and goodbye!" in out
+
+
+def test_catalogue_reports_progress(tmp_path):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("".join(f"V{i} | v{i} | #x\n" for i in range(2500)))
+    seen = []
+    VideoLibrary(catalogue, seen.append)
+    assert seen == [1000, 2000]
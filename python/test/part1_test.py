@@ -1,7 +1,12 @@
+import pytest
 import re
 from src.video_player import VideoPlayer
 
 
+# Every test runs against both storage backends.
+pytestmark = pytest.mark.usefixtures("library_backend")
+
+
 def test_number_of_videos(capfd):
     player = VideoPlayer()
     player.number_of_videos()
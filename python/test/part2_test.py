@@ -1,6 +1,11 @@
+import pytest
 from src.video_player import VideoPlayer
 
 
+# Every test runs against both storage backends.
+pytestmark = pytest.mark.usefixtures("library_backend")
+
+
 def test_create_playlist(capfd):
     player = VideoPlayer()
     player.create_playlist("my_PLAYlist")
@@ -235,3 +240,223 @@ def test_delete_playlist_nonexistent(capfd):
     lines = out.splitlines()
     assert len(lines) == 1
     assert "Cannot delete playlist my_cool_playlist: Playlist does not exist" in lines[0]
+
+
+def test_show_video_playlists(capfd):
+    player = VideoPlayer()
+    player.create_playlist("B_playlist")
+    player.create_playlist("a_playlist")
+    player.create_playlist("c_playlist")
+    player.add_to_playlist("B_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("a_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("c_playlist", "amazing_cats_video_id")
+    player.remove_from_playlist("c_playlist", "amazing_cats_video_id")
+    player.show_video_playlists("amazing_cats_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 10
+    assert "Playlists containing Amazing Cats:" in lines[7]
+    assert "a_playlist" in lines[8]
+    assert "B_playlist" in lines[9]
+
+
+def test_show_video_playlists_after_clear_and_delete(capfd):
+    player = VideoPlayer()
+    player.create_playlist("a_playlist")
+    player.create_playlist("b_playlist")
+    player.add_to_playlist("a_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("b_playlist", "amazing_cats_video_id")
+    player.clear_playlist("a_playlist")
+    player.delete_playlist("b_playlist")
+    player.show_video_playlists("amazing_cats_video_id")
+    player.show_video_playlists("does_not_exist")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 8
+    assert "Amazing Cats is not in any playlist" in lines[6]
+    assert "Cannot show playlists: Video does not exist" in lines[7]
+
+
+def test_add_to_playlist_at_position_and_move(capfd):
+    player = VideoPlayer()
+    player.create_playlist("my_playlist")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("my_playlist", "funny_dogs_video_id", 1)
+    player.add_to_playlist("my_playlist", "nothing_video_id", 5)
+    player.move_in_playlist("my_playlist", "funny_dogs_video_id", 2)
+    player.show_playlist("my_playlist")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 8
+    assert "Added video to my_playlist: Funny Dogs" in lines[2]
+    assert "Cannot add video to my_playlist: Invalid position" in lines[3]
+    assert "Moved video in my_playlist: Funny Dogs to position 2" in lines[4]
+    assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[6]
+    assert "Funny Dogs (funny_dogs_video_id) [#dog #animal]" in lines[7]
+
+
+def test_show_playlist_page(capfd):
+    player = VideoPlayer()
+    player.create_playlist("my_playlist")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("my_playlist", "funny_dogs_video_id")
+    player.add_to_playlist("my_playlist", "nothing_video_id")
+    player.show_playlist("my_playlist", 2, 2)
+    player.show_playlist("my_playlist", 3, 2)
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 8
+    assert "Showing playlist: my_playlist" in lines[4]
+    assert "Video about nothing (nothing_video_id) []" in lines[5]
+    assert "Page 2 of 2" in lines[6]
+    assert "Cannot show playlist my_playlist: Page does not exist" in lines[7]
+
+
+def test_duplicate_playlist(capfd):
+    player = VideoPlayer()
+    player.create_playlist("my_playlist")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.duplicate_playlist("my_playlist", "my_copy")
+    player.duplicate_playlist("my_playlist", "MY_COPY")
+    player.add_to_playlist("my_copy", "funny_dogs_video_id")
+    player.show_playlist("my_playlist")
+    player.show_video_playlists("amazing_cats_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 10
+    assert "Duplicated playlist my_playlist as my_copy" in lines[2]
+    assert ("Cannot duplicate playlist: A playlist with the same name already "
+            "exists") in lines[3]
+    assert "Showing playlist: my_playlist" in lines[5]
+    assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[6]
+    assert "Playlists containing Amazing Cats:" in lines[7]
+    assert "my_copy" in lines[8]
+    assert "my_playlist" in lines[9]
+
+
+def test_duplicated_playlists_follow_edits(capfd):
+    player = VideoPlayer()
+    player.create_playlist("a")
+    player.add_to_playlist("a", "amazing_cats_video_id")
+    player.add_to_playlist("a", "funny_dogs_video_id")
+    player.duplicate_playlist("a", "b")
+    player.remove_from_playlist("b", "amazing_cats_video_id")
+    player.duplicate_playlist("b", "c")
+    capfd.readouterr()
+    player.show_video_playlists("amazing_cats_video_id")
+    player.show_video_playlists("funny_dogs_video_id")
+    player.clear_playlist("b")
+    player.delete_playlist("c")
+    player.add_to_playlist("b", "nothing_video_id")
+    player.show_video_playlists("funny_dogs_video_id")
+    player.show_video_playlists("nothing_video_id")
+    out, err = capfd.readouterr()
+    assert out.splitlines() == [
+        "Playlists containing Amazing Cats:",
+        "a",
+        "Playlists containing Funny Dogs:",
+        "a",
+        "b",
+        "c",
+        "Successfully removed all videos from b",
+        "Deleted playlist: c",
+        "Added video to b: Video about nothing",
+        "Playlists containing Funny Dogs:",
+        "a",
+        "Playlists containing Video about nothing:",
+        "b",
+    ]
+
+
+def test_snapshot_and_restore_playlist(capfd):
+    player = VideoPlayer()
+    player.create_playlist("my_playlist")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.snapshot_playlist("my_playlist")
+    player.clear_playlist("my_playlist")
+    player.add_to_playlist("my_playlist", "funny_dogs_video_id")
+    player.restore_playlist("my_playlist", 1)
+    player.restore_playlist("my_playlist", 2)
+    player.show_playlist("my_playlist")
+    player.show_video_playlists("funny_dogs_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 10
+    assert "Created snapshot 1 of my_playlist" in lines[2]
+    assert "Restored my_playlist to snapshot 1" in lines[5]
+    assert "Cannot restore playlist my_playlist: Snapshot does not exist" in lines[6]
+    assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[8]
+    assert "Funny Dogs is not in any playlist" in lines[9]
+
+
+def test_duplicated_and_restored_playlists_are_indexed():
+    player = VideoPlayer()
+    player.create_playlist("a")
+    player.add_to_playlist("a", "amazing_cats_video_id")
+    player.snapshot_playlist("a")
+    player.duplicate_playlist("a", "b")
+    player.clear_playlist("a")
+    player.restore_playlist("a", 1)
+    assert player._video_playlists == {"amazing_cats_video_id": {"a", "b"}}
+    player.delete_playlist("b")
+    player.clear_playlist("a")
+    assert player._video_playlists == {}
+
+
+def _make_playlist(player, name, *video_ids):
+    player.create_playlist(name)
+    for video_id in video_ids:
+        player.add_to_playlist(name, video_id)
+
+
+def test_combine_playlists(capfd):
+    player = VideoPlayer()
+    _make_playlist(player, "a", "amazing_cats_video_id", "funny_dogs_video_id",
+                   "nothing_video_id")
+    _make_playlist(player, "b", "funny_dogs_video_id", "life_at_google_video_id",
+                   "nothing_video_id")
+    player.flag_video("nothing_video_id")
+    capfd.readouterr()
+
+    player.combine_playlists("union", "u", ["a", "b"])
+    player.combine_playlists("intersection", "i", ["a", "b"])
+    player.combine_playlists("difference", "a", ["a", "b"])
+    player.combine_playlists("union", "x", ["a", "missing"])
+    player.show_playlist("u")
+    player.show_playlist("a")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 10
+    assert "Created u from union of a, b: 3 videos" in lines[0]
+    assert "Created i from intersection of a, b: 1 videos" in lines[1]
+    assert "Created a from difference of a, b: 1 videos" in lines[2]
+    assert "Cannot create playlist x from union: Playlist missing does not exist" in lines[3]
+    assert "Amazing Cats" in lines[5]
+    assert "Funny Dogs" in lines[6]
+    assert "Life at Google" in lines[7]
+    assert "Showing playlist: a" in lines[8]
+    assert "Amazing Cats" in lines[9]
+
+
+def test_bulk_add_to_playlist(capfd):
+    player = VideoPlayer()
+    _make_playlist(player, "my_playlist", "funny_dogs_video_id")
+    player.flag_video("nothing_video_id", "dont_like")
+    capfd.readouterr()
+    added, failures = player.bulk_add_to_playlist(
+        "my_playlist", ["amazing_cats_video_id", "does_not_exist",
+                        "funny_dogs_video_id", "amazing_cats_video_id",
+                        "nothing_video_id", "life_at_google_video_id"])
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert added == 2
+    assert len(lines) == 5
+    assert "Added 2 videos to my_playlist, 4 failed:" in lines[0]
+    assert "does_not_exist: Video does not exist" in lines[1]
+    assert "funny_dogs_video_id: Video already added" in lines[2]
+    assert "amazing_cats_video_id: Video already added" in lines[3]
+    assert ("nothing_video_id: Video is currently flagged "
+            "(reason: dont_like)") in lines[4]
+    assert [v.video_id for v in player._playlists["my_playlist"].videos()] == [
+        "funny_dogs_video_id", "amazing_cats_video_id",
+        "life_at_google_video_id"]
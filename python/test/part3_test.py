@@ -1,7 +1,12 @@
+import pytest
 from src.video_player import VideoPlayer
 from unittest import mock
 
 
+# Every test runs against both storage backends.
+pytestmark = pytest.mark.usefixtures("library_backend")
+
+
 @mock.patch('builtins.input', lambda *args: 'No')
 def test_search_videos_with_no_answer(capfd):
     player = VideoPlayer()
@@ -1,8 +1,15 @@
 from unittest import mock
 
+import pytest
+
+from src.command_parser import CommandException, CommandParser
 from src.video_player import VideoPlayer
 
 
+# Every test runs against both storage backends.
+pytestmark = pytest.mark.usefixtures("library_backend")
+
+
 def test_flag_video_with_reason(capfd):
     player = VideoPlayer()
     player.flag_video("amazing_cats_video_id", "dont_like_cats")
@@ -269,3 +276,96 @@ def test_allow_video_show_playlist(capfd):
     assert "Successfully removed flag from video: Amazing Cats" in lines[5]
     assert "Showing playlist: my_playlist" in lines[6]
     assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[7]
+
+
+def test_bulk_flag_video_from_file(capfd, tmp_path):
+    flags = tmp_path / "flags.txt"
+    flags.write_text("amazing_cats_video_id | dont_like_cats\n"
+                     "does_not_exist\n"
+                     "\n"
+                     "funny_dogs_video_id\n")
+    player = VideoPlayer()
+    parser = CommandParser(player)
+    parser.execute_command(
+        ["BULK_FLAG_VIDEO", f"@{flags}", "amazing_cats_video_id"])
+    player.play_video("amazing_cats_video_id")
+    player.play_video("funny_dogs_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 5
+    assert "Flagged 2 videos, 2 failed:" in lines[0]
+    assert "does_not_exist: Video does not exist" in lines[1]
+    assert "amazing_cats_video_id: Video is already flagged" in lines[2]
+    assert ("Cannot play video: Video is currently flagged "
+            "(reason: dont_like_cats)") in lines[3]
+    assert ("Cannot play video: Video is currently flagged "
+            "(reason: Not supplied)") in lines[4]
+
+
+def test_flag_and_allow_matching(capfd):
+    player = VideoPlayer()
+    player.flag_matching("tag", "#animal", "no_pets")
+    player.allow_matching("title", "cat")
+    player.play_video("funny_dogs_video_id")
+    player.play_video("another_cat_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 4
+    assert "Flagged 3 videos matching tag #animal (reason: no_pets)" in lines[0]
+    assert "Removed flag from 2 videos matching title cat" in lines[1]
+    assert ("Cannot play video: Video is currently flagged "
+            "(reason: no_pets)") in lines[2]
+    assert "Playing video: Another Cat Video" in lines[3]
+
+
+def test_flag_matching_updates_random_candidates(capfd):
+    player = VideoPlayer()
+    player.play_random_video()
+    player.flag_matching("tag", "#animal")
+    player.flag_matching("title", "o")
+    player.play_random_video()
+    player.allow_matching("tag", "#career")
+    player.play_random_video()
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert "Flagged 2 videos matching title o (reason: Not supplied)" in out
+    assert "No videos available" in out
+    assert "Playing video: Life at Google" in lines[-1]
+
+
+def test_flag_video_with_ttl_expires(capfd):
+    now = [1000.0]
+    player = VideoPlayer(clock=lambda: now[0])
+    player.flag_video("amazing_cats_video_id", "dont_like_cats", 60)
+    player.bulk_flag_videos([("funny_dogs_video_id", None)], ttl=30)
+    now[0] += 45
+    player.expire_flags()
+    player.play_video("funny_dogs_video_id")
+    player.play_video("amazing_cats_video_id")
+    now[0] += 15
+    player.expire_flags()
+    player.play_video("amazing_cats_video_id")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 6
+    assert ("Successfully flagged video: Amazing Cats (reason: dont_like_cats) "
+            "for 60 seconds") in lines[0]
+    assert "Playing video: Funny Dogs" in lines[2]
+    assert ("Cannot play video: Video is currently flagged "
+            "(reason: dont_like_cats)") in lines[3]
+    assert "Stopping video: Funny Dogs" in lines[4]
+    assert "Playing video: Amazing Cats" in lines[5]
+
+
+def test_flag_video_rejects_non_positive_ttls():
+    player = VideoPlayer()
+    parser = CommandParser(player)
+    for ttl in ("0", "-5"):
+        with pytest.raises(CommandException):
+            parser.execute_command(
+                ["FLAG_VIDEO", "amazing_cats_video_id", "spam", ttl])
+        with pytest.raises(CommandException):
+            parser.execute_command(
+                ["BULK_FLAG_VIDEO", f"ttl={ttl}", "amazing_cats_video_id"])
+    with pytest.raises(ValueError):
+        player.bulk_flag_videos([("funny_dogs_video_id", None)], ttl=0)
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from src.playback_log import PlaybackEventLog
+from src.video_player import VideoPlayer
+
+
+def _events(path):
+    return [line.split("\t")[1:] for line in path.read_text().splitlines()]
+
+
+def test_player_logs_every_transition(capfd, tmp_path):
+    log = PlaybackEventLog(tmp_path / "events.log", clock=lambda: 12.5)
+    player = VideoPlayer(event_log=log)
+    player.play_video("amazing_cats_video_id")
+    player.pause_video()
+    player.pause_video()
+    player.continue_video()
+    player.play_video("life_at_google_video_id")
+    player.stop_video()
+    player.stop_video()
+    player.play_video("does_not_exist")
+    player.play_random_video()
+    log.close()
+    lines = (tmp_path / "events.log").read_text().splitlines()
+    assert lines[0] == "12.500000\tPLAY\tamazing_cats_video_id"
+    assert [event for event, _ in _events(tmp_path / "events.log")] == [
+        "PLAY", "PAUSE", "CONTINUE", "STOP", "PLAY", "STOP", "PLAY_RANDOM"]
+    assert _events(tmp_path / "events.log")[3] == ["STOP", "amazing_cats_video_id"]
+    assert log.dropped == 0
+
+
+def test_drop_policy_counts_dropped_events(tmp_path):
+    log = PlaybackEventLog(tmp_path / "events.log", capacity=4,
+                           flush_interval=60)
+    # Hold the writer inside its next drain so the buffer cannot empty.
+    release = threading.Event()
+    write = log._file.write
+    log._file.write = lambda text: (release.wait(), write(text))
+    for i in range(4):
+        assert log.emit("PLAY", f"v{i}")
+    assert len(log) == 4
+    assert not log.emit("PLAY", "v4")
+    assert not log.emit("PLAY", "v5")
+    assert log.dropped == 2
+    release.set()
+    log.flush()
+    assert len(log) == 0
+    assert log.emit("PLAY", "v6")
+    log.close()
+    assert [video_id for _, video_id in _events(tmp_path / "events.log")] == [
+        "v0", "v1", "v2", "v3", "v6"]
+
+
+def test_block_policy_waits_for_room(tmp_path):
+    log = PlaybackEventLog(tmp_path / "events.log", capacity=2,
+                           policy="block", batch_size=2, flush_interval=0.01)
+    for i in range(50):
+        assert log.emit("PLAY", f"v{i}")
+    log.close()
+    assert log.dropped == 0
+    assert [video_id for _, video_id in _events(tmp_path / "events.log")] == [
+        f"v{i}" for i in range(50)]
+
+
+def test_files_are_rotated(tmp_path):
+    path = tmp_path / "events.log"
+    log = PlaybackEventLog(path, batch_size=1, max_bytes=100, backups=2,
+                           clock=lambda: 1.0)
+    # Lines are 23 bytes long, so every fifth one fills a file.
+    for i in range(32):
+        log.emit("PLAY", f"video_{i:02d}")
+        log.flush()
+    log.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "events.log", "events.log.1", "events.log.2"]
+    assert [video_id for _, video_id in _events(path)] == [
+        "video_30", "video_31"]
+    assert [video_id for _, video_id in _events(tmp_path / "events.log.1")] == [
+        f"video_{i}" for i in range(25, 30)]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        PlaybackEventLog("unused.log", policy="ignore")
+
+
+@pytest.mark.filterwarnings(
+    "ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_block_policy_drops_once_the_writer_dies(tmp_path):
+    log = PlaybackEventLog(tmp_path / "events.log", capacity=2,
+                           policy="block", flush_interval=0.01)
+
+    def fail(text):
+        raise OSError("No space left on device")
+
+    log._file.write = fail
+    assert log.emit("PLAY", "v0")
+    assert log.emit("PLAY", "v1")
+    log._thread.join(5)
+    assert not log._thread.is_alive()
+    assert not log.emit("PLAY", "v2")
+    assert log.dropped == 1
+    log.close()
+
+
+def test_events_from_many_threads_are_all_written(tmp_path):
+    log = PlaybackEventLog(tmp_path / "events.log", capacity=8,
+                           policy="block", flush_interval=0.01)
+
+    def produce(name):
+        for i in range(200):
+            log.emit("PLAY", f"{name}{i}")
+
+    threads = [threading.Thread(target=produce, args=(name,))
+               for name in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.close()
+    video_ids = [video_id for _, video_id in _events(tmp_path / "events.log")]
+    assert sorted(video_ids) == sorted(
+        f"{name}{i}" for name in "abcd" for i in range(200))
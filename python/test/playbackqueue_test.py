@@ -0,0 +1,163 @@
+import random
+
+import pytest
+
+from src.command_parser import CommandParser
+from src.playback_scheduler import PlaybackScheduler
+from src.video_player import VideoPlayer
+
+
+DURATIONS = {
+    "funny_dogs_video_id": 100,
+    "amazing_cats_video_id": 50,
+    "another_cat_video_id": 30,
+    "life_at_google_video_id": 60,
+    "nothing_video_id": 10,
+}
+
+
+@pytest.fixture
+def session():
+    now = [0.0]
+    player = VideoPlayer(clock=lambda: now[0], duration=DURATIONS.get,
+                         rng=random.Random(0))
+    parser = CommandParser(player)
+    player.create_playlist("mix")
+    for video_id in ("funny_dogs_video_id", "amazing_cats_video_id",
+                     "another_cat_video_id"):
+        player.add_to_playlist("mix", video_id)
+    return now, player, parser
+
+
+def _run(parser, capfd, *commands):
+    capfd.readouterr()
+    for command in commands:
+        parser.execute_command(command.split())
+    return capfd.readouterr().out.splitlines()
+
+
+def test_next_prev_and_boundaries(capfd, session):
+    now, player, parser = session
+    assert _run(parser, capfd, "NEXT", "SHUFFLE") == [
+        "Cannot play next video: Queue is empty",
+        "Cannot shuffle queue: Queue is empty",
+    ]
+    assert _run(parser, capfd, "PLAY_PLAYLIST MIX", "PREV", "NEXT", "NEXT",
+                "NEXT", "PREV") == [
+        "Playing playlist: MIX",
+        "Playing video: Funny Dogs",
+        "Cannot play previous video: Start of queue",
+        "Stopping video: Funny Dogs",
+        "Playing video: Amazing Cats",
+        "Stopping video: Amazing Cats",
+        "Playing video: Another Cat Video",
+        "Cannot play next video: End of queue",
+        "Stopping video: Another Cat Video",
+        "Playing video: Amazing Cats",
+    ]
+    player.flag_video("another_cat_video_id")
+    assert _run(parser, capfd, "NEXT") == [
+        "Cannot play next video: End of queue"]
+
+
+def test_position_respects_pause_and_autoplay(capfd, session):
+    now, player, parser = session
+    _run(parser, capfd, "PLAY_PLAYLIST mix")
+    now[0] = 40.0
+    _run(parser, capfd, "PAUSE")
+    now[0] = 500.0
+    assert _run(parser, capfd, "SHOW_QUEUE") == [
+        "Queue:",
+        "  > 1. Funny Dogs (funny_dogs_video_id) [#dog #animal] - 0:40 / 1:40"
+        " - PAUSED",
+        "    2. Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "    3. Another Cat Video (another_cat_video_id) [#cat #animal]",
+    ]
+    _run(parser, capfd, "CONTINUE")
+    # Funny Dogs ends at 560, Amazing Cats plays until 610.
+    now[0] = 600.0
+    assert _run(parser, capfd, "SHOW_PLAYING", "SHOW_QUEUE")[:3] == [
+        "Currently playing: Amazing Cats (amazing_cats_video_id) "
+        "[#cat #animal]",
+        "Queue:",
+        "    1. Funny Dogs (funny_dogs_video_id) [#dog #animal]",
+    ]
+    # Another Cat Video ends at 640 and the queue is exhausted.
+    now[0] = 1000.0
+    assert _run(parser, capfd, "SHOW_PLAYING") == [
+        "No video is currently playing"]
+    assert _run(parser, capfd, "PREV") == [
+        "Playing video: Amazing Cats"]
+
+
+def test_failed_play_playlist_keeps_the_queue(capfd, session):
+    now, player, parser = session
+    player.create_playlist("flagged")
+    player.add_to_playlist("flagged", "nothing_video_id")
+    player.flag_video("nothing_video_id")
+    assert _run(parser, capfd, "PLAY_PLAYLIST mix",
+                "PLAY_PLAYLIST flagged") == [
+        "Playing playlist: mix",
+        "Playing video: Funny Dogs",
+        "Cannot play playlist flagged: No playable videos",
+    ]
+    assert _run(parser, capfd, "SHOW_QUEUE")[:2] == [
+        "Queue:",
+        "  > 1. Funny Dogs (funny_dogs_video_id) [#dog #animal] - 0:00 / 1:40",
+    ]
+    # Funny Dogs ends at 100 and autoplay moves on through mix.
+    now[0] = 120.0
+    assert _run(parser, capfd, "SHOW_PLAYING") == [
+        "Currently playing: Amazing Cats (amazing_cats_video_id) "
+        "[#cat #animal]"]
+
+
+def test_direct_play_leaves_the_queue(capfd, session):
+    now, player, parser = session
+    _run(parser, capfd, "PLAY_PLAYLIST mix", "PLAY nothing_video_id")
+    now[0] = 1000.0
+    assert _run(parser, capfd, "SHOW_PLAYING", "NEXT") == [
+        "Currently playing: Video about nothing (nothing_video_id) []",
+        "Stopping video: Video about nothing",
+        "Playing video: Amazing Cats",
+    ]
+
+
+def test_shuffle_keeps_played_videos(capfd, session):
+    now, player, parser = session
+    for video_id in ("life_at_google_video_id", "nothing_video_id"):
+        player.add_to_playlist("mix", video_id)
+    _run(parser, capfd, "PLAY_PLAYLIST mix", "NEXT")
+    assert _run(parser, capfd, "SHUFFLE") == ["Shuffled 3 queued videos"]
+    queue = _run(parser, capfd, "SHOW_QUEUE")
+    assert queue[1].startswith("    1. Funny Dogs")
+    assert queue[2].startswith("  > 2. Amazing Cats")
+    assert sorted(line[7:] for line in queue[3:]) == [
+        "Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "Life at Google (life_at_google_video_id) [#google #career]",
+        "Video about nothing (nothing_video_id) []",
+    ]
+
+
+def test_sessions_share_one_scheduler(capfd):
+    now = [0.0]
+    scheduler = PlaybackScheduler(start=0.0)
+    players = [VideoPlayer(clock=lambda: now[0], scheduler=scheduler,
+                           duration=lambda video_id: 5)
+               for _ in range(3)]
+    for player in players:
+        player.create_playlist("cats")
+        player.add_to_playlist("cats", "amazing_cats_video_id")
+        player.add_to_playlist("cats", "another_cat_video_id")
+        player.play_playlist("cats")
+    assert len(scheduler) == 3
+    now[0] = 6.0
+    players[0].advance_playback()
+    assert len(scheduler) == 3
+    now[0] = 11.0
+    players[0].advance_playback()
+    assert len(scheduler) == 0
+    capfd.readouterr()
+    for player in players:
+        player.show_playing()
+    assert capfd.readouterr().out == "No video is currently playing\n" * 3
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.popularity import CountMinSketch, PopularityTracker, SpaceSaving
+from src.video_player import VideoPlayer
+
+
+def test_sketch_never_undercounts():
+    rng = random.Random(4)
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {}
+    for _ in range(5000):
+        key = f"k{int(rng.paretovariate(1.2))}"
+        counts[key] = counts.get(key, 0) + 1
+        sketch.add(key)
+    total = sum(counts.values())
+    for key, count in counts.items():
+        assert count <= sketch.estimate(key) <= count + 2.72 / 64 * total
+    assert sketch.estimate("never_seen") <= 2.72 / 64 * total
+
+
+def test_space_saving_keeps_heavy_hitters():
+    rng = random.Random(5)
+    summary = SpaceSaving(capacity=10)
+    stream = ["hot"] * 300 + ["warm"] * 150 + [f"cold{i}" for i in range(1000)]
+    rng.shuffle(stream)
+    for key in stream:
+        summary.add(key)
+    counts = dict(summary.items())
+    assert len(summary) == 10
+    assert counts["hot"] >= 300 and counts["warm"] >= 150
+
+
+def test_tracker_ranks_and_decays():
+    now = [0.0]
+    tracker = PopularityTracker(width=256, capacity=5, half_life=10,
+                                clock=lambda: now[0])
+    for key, plays in (("a", 4), ("b", 2), ("c", 1)):
+        for _ in range(plays):
+            tracker.record(key)
+    assert tracker.top(2) == [("a", 4.0), ("b", 2.0)]
+    now[0] = 10.0
+    assert tracker.estimate("a") == pytest.approx(2.0)
+    for _ in range(3):
+        tracker.record("c")
+    assert [key for key, _ in tracker.top(3)] == ["c", "a", "b"]
+    assert tracker.top(3, lambda key: key != "c")[0] == ("a", pytest.approx(2.0))
+    # Long idle periods rescale the counts instead of overflowing.
+    now[0] = 10_000.0
+    tracker.record("d")
+    assert tracker.top(1) == [("d", 1.0)]
+    assert tracker.estimate("a") == pytest.approx(0.0)
+
+
+def test_most_played_and_trending(capfd):
+    now = [0.0]
+    player = VideoPlayer(clock=lambda: now[0], trending_half_life=60)
+    parser = CommandParser(player)
+    parser.execute_command(["MOST_PLAYED"])
+    for _ in range(3):
+        player.play_video("amazing_cats_video_id")
+    now[0] = 120.0
+    player.play_video("funny_dogs_video_id")
+    player.play_video("funny_dogs_video_id")
+    player.play_video("life_at_google_video_id")
+    player.flag_video("life_at_google_video_id")
+    capfd.readouterr()
+    parser.execute_command(["MOST_PLAYED"])
+    parser.execute_command(["TRENDING", "1"])
+    lines = capfd.readouterr().out.splitlines()
+    assert lines == [
+        "Most played videos:",
+        "  1. Amazing Cats (amazing_cats_video_id) [#cat #animal] - 3 plays",
+        "  2. Funny Dogs (funny_dogs_video_id) [#dog #animal] - 2 plays",
+        "Trending videos:",
+        "  1. Funny Dogs (funny_dogs_video_id) [#dog #animal] - score 2.00",
+    ]
+    with pytest.raises(CommandException):
+        parser.execute_command(["TRENDING", "0"])
+    with pytest.raises(CommandException):
+        parser.execute_command(["MOST_PLAYED", "1", "2"])
+
+
+def test_nothing_played(capfd):
+    VideoPlayer().show_trending()
+    assert capfd.readouterr().out == "No videos have been played yet\n"
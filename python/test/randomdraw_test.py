@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from src.alias_table import AliasTable
+from src.command_parser import CommandException, CommandParser
+from src.random_pool import RandomPool
+from src.video_player import VideoPlayer
+
+
+def test_alias_table_follows_the_weights():
+    rng = random.Random(1)
+    table = AliasTable("abcd", [1, 2, 0, 7])
+    counts = {member: 0 for member in "abcd"}
+    for _ in range(20000):
+        counts[table.sample(rng)] += 1
+    assert counts["c"] == 0
+    assert counts["a"] / 20000 == pytest.approx(0.1, abs=0.02)
+    assert counts["b"] / 20000 == pytest.approx(0.2, abs=0.02)
+    assert counts["d"] / 20000 == pytest.approx(0.7, abs=0.02)
+    assert set(AliasTable("xyz").sample(rng) for _ in range(200)) == set("xyz")
+    assert AliasTable([]).sample(rng) is None
+
+
+@pytest.mark.parametrize("accepted", [range(0, 100, 2), [97]])
+def test_pool_draws_uniformly_among_accepted_members(accepted):
+    rng = random.Random(6)
+    pool = RandomPool(range(100))
+    accepted = set(accepted)
+    counts = {member: 0 for member in accepted}
+    for _ in range(200 * len(accepted)):
+        counts[pool.choice(rng, accepted.__contains__)] += 1
+    assert min(counts.values()) > 100
+    assert pool.choice(rng, lambda member: False) is None
+
+
+def _played(capfd):
+    return [line[len("Playing video: "):]
+            for line in capfd.readouterr().out.splitlines()
+            if line.startswith("Playing video: ")]
+
+
+def test_random_from_tag_and_playlist(capfd):
+    player = VideoPlayer(rng=random.Random(2))
+    parser = CommandParser(player)
+    for _ in range(20):
+        parser.execute_command(["PLAY_RANDOM", "#cat"])
+    assert set(_played(capfd)) == {"Amazing Cats", "Another Cat Video"}
+
+    player.flag_video("amazing_cats_video_id")
+    for _ in range(10):
+        parser.execute_command(["PLAY_RANDOM", "#cat"])
+    assert set(_played(capfd)) == {"Another Cat Video"}
+
+    player.create_playlist("Mix")
+    player.add_to_playlist("mix", "funny_dogs_video_id")
+    parser.execute_command(["PLAY_RANDOM", "MIX"])
+    assert _played(capfd) == ["Funny Dogs"]
+    player.add_to_playlist("mix", "life_at_google_video_id")
+    player.remove_from_playlist("mix", "funny_dogs_video_id")
+    parser.execute_command(["PLAY_RANDOM", "mix"])
+    assert _played(capfd) == ["Life at Google"]
+
+    player.clear_playlist("mix")
+    parser.execute_command(["PLAY_RANDOM", "mix"])
+    parser.execute_command(["PLAY_RANDOM", "missing"])
+    parser.execute_command(["PLAY_RANDOM", "#no_such_tag"])
+    assert capfd.readouterr().out.splitlines() == [
+        "Successfully removed all videos from mix",
+        "No videos available",
+        "Cannot play random video from missing: Playlist does not exist",
+        "No videos available",
+    ]
+    with pytest.raises(CommandException):
+        parser.execute_command(["PLAY_RANDOM", "#cat", "#dog"])
+
+
+def test_popular_draws_favour_played_videos(capfd):
+    player = VideoPlayer(rng=random.Random(3))
+    for _ in range(200):
+        player.play_video("funny_dogs_video_id")
+    capfd.readouterr()
+    for _ in range(300):
+        player.play_random_video(popular=True)
+    played = _played(capfd)
+    assert played.count("Funny Dogs") > 200
+    assert len(set(played)) > 1
+
+
+def test_seeded_draws_are_reproducible(capfd):
+    def draws(seed):
+        player = VideoPlayer(rng=random.Random(seed))
+        for _ in range(10):
+            player.play_random_video()
+            player.play_random_video("#animal")
+        return _played(capfd)
+
+    assert draws(7) == draws(7)
@@ -0,0 +1,154 @@
+import os
+import threading
+
+import pytest
+
+from src.catalogue_watcher import CatalogueWatcher
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.video_library import DEFAULT_CATALOGUE, VideoLibrary
+from src.video_player import VideoPlayer
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def catalogue_player(request, tmp_path):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text(DEFAULT_CATALOGUE.read_text())
+    if request.param == "sqlite":
+        library = SqliteVideoLibrary(catalogue_path=catalogue)
+    else:
+        library = VideoLibrary(catalogue)
+    return catalogue, library, VideoPlayer(library)
+
+
+def _rewrite(catalogue, old, new):
+    catalogue.write_text(catalogue.read_text().replace(old, new))
+
+
+def test_reload_without_changes(capfd, catalogue_player):
+    catalogue, library, player = catalogue_player
+    player.reload_library()
+    out, err = capfd.readouterr()
+    assert "Reloaded library: 0 added, 0 removed, 0 changed" in out
+
+
+def test_reload_applies_diff(capfd, catalogue_player):
+    catalogue, library, player = catalogue_player
+    _rewrite(catalogue, "Funny Dogs | funny_dogs_video_id |  #dog , #animal\n",
+             "")
+    _rewrite(catalogue, "Amazing Cats |", "Amazing Kittens |")
+    with open(catalogue, "a") as f:
+        f.write("\nNew Video | new_video_id | #new\n")
+    player.reload_library()
+    out, err = capfd.readouterr()
+
+    assert "Reloaded library: 1 added, 1 removed, 1 changed" in out
+    assert len(library) == 5
+    assert library.get_video("funny_dogs_video_id") is None
+    assert library.get_video("amazing_cats_video_id").title == "Amazing Kittens"
+    assert [v.video_id for v in library.get_videos_with_tag("#new")] == [
+        "new_video_id"]
+    assert [v.video_id for v in library.get_videos_with_tag("#dog")] == []
+    assert [v.video_id for v in library.search_titles("kitten")] == [
+        "amazing_cats_video_id"]
+
+
+def test_reload_updates_playlists_and_playing(capfd, catalogue_player):
+    catalogue, library, player = catalogue_player
+    player.create_playlist("my_playlist")
+    player.add_to_playlist("my_playlist", "funny_dogs_video_id")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.play_video("funny_dogs_video_id")
+    _rewrite(catalogue, "Funny Dogs | funny_dogs_video_id |  #dog , #animal\n",
+             "")
+    _rewrite(catalogue, "Amazing Cats |", "Amazing Kittens |")
+    player.reload_library()
+    player.show_playing()
+    player.show_playlist("my_playlist")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+
+    assert "Stopping video: Funny Dogs" in lines[4]
+    assert "No video is currently playing" in lines[6]
+    assert "Showing playlist: my_playlist" in lines[7]
+    assert "Amazing Kittens (amazing_cats_video_id) [#cat #animal]" in lines[8]
+    assert len(lines) == 9
+
+
+def test_watcher_polls_modifications(tmp_path):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text(DEFAULT_CATALOGUE.read_text())
+    calls = []
+    watcher = CatalogueWatcher(catalogue, lambda: calls.append(1))
+
+    assert not watcher.poll()
+    catalogue.write_text(DEFAULT_CATALOGUE.read_text() + "\nA | a_id |")
+    os.utime(catalogue, ns=(0, 1))
+    assert watcher.poll()
+    assert not watcher.poll()
+    assert calls == [1]
+
+
+def test_reload_of_a_malformed_catalogue_keeps_the_library(
+        capfd, catalogue_player):
+    catalogue, library, player = catalogue_player
+    with open(catalogue, "a") as f:
+        f.write("\nNo video id here\n")
+    player.reload_library()
+    player.number_of_videos()
+    out, err = capfd.readouterr()
+    assert out.splitlines() == [
+        f"Cannot reload library: {catalogue}, line 6: expected "
+        "'title | video_id | tags'",
+        "5 videos in the library",
+    ]
+
+
+def test_watcher_survives_callback_errors(tmp_path, capfd):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text(DEFAULT_CATALOGUE.read_text())
+    calls = []
+
+    def callback():
+        calls.append(1)
+        raise ValueError("bad catalogue")
+
+    watcher = CatalogueWatcher(catalogue, callback, interval=0.01)
+    watcher.start()
+    try:
+        for size in (1, 2):
+            catalogue.write_text(DEFAULT_CATALOGUE.read_text() + "\n" * size)
+            for _ in range(200):
+                if len(calls) == size:
+                    break
+                threading.Event().wait(0.01)
+    finally:
+        watcher.stop()
+    assert calls == [1, 1]
+    assert "ValueError: bad catalogue" in capfd.readouterr().err
+
+
+def test_diffs_taken_on_another_thread_apply_between_commands(
+        capfd, catalogue_player):
+    catalogue, library, player = catalogue_player
+    _rewrite(catalogue, "Amazing Cats |", "Amazing Kittens |")
+    prepared = []
+    thread = threading.Thread(
+        target=lambda: prepared.append(player.diff_library()))
+    thread.start()
+    thread.join()
+    # Diffing leaves the library untouched.
+    assert library.get_video("amazing_cats_video_id").title == "Amazing Cats"
+    player.apply_library_diff(prepared[0])
+
+    # A diff that another reload overtook is taken again.
+    stale = player.diff_library()
+    _rewrite(catalogue, "Amazing Kittens |", "Amazing Cats |")
+    player.reload_library()
+    player.apply_library_diff(stale)
+    out, err = capfd.readouterr()
+    assert out.splitlines() == [
+        "Reloaded library: 0 added, 0 removed, 1 changed",
+        "Reloaded library: 0 added, 0 removed, 1 changed",
+        "Reloaded library: 0 added, 0 removed, 0 changed",
+    ]
+    assert library.get_video("amazing_cats_video_id").title == "Amazing Cats"
@@ -0,0 +1,60 @@
+from bench.replay import print_report, replay
+from src.command_trace import CommandTraceRecorder, read_trace
+from src.video_player import VideoPlayer
+
+
+def test_recorder_round_trip(tmp_path):
+    times = iter([10.0, 10.5, 12.25, 13.0])
+    recorder = CommandTraceRecorder(tmp_path / "trace.txt", lambda: next(times))
+    recorder.record("play  amazing_cats_video_id")
+    recorder.record("NUMBER_OF_VIDEOS")
+    recorder.record("")
+    recorder.close()
+    assert list(read_trace(tmp_path / "trace.txt")) == [
+        (0.5, ["play", "amazing_cats_video_id"]),
+        (2.25, ["NUMBER_OF_VIDEOS"]),
+        (3.0, []),
+    ]
+
+
+def test_replay_keeps_the_recorded_pace_scaled():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    trace = [(1.0, ["NUMBER_OF_VIDEOS"]), (3.0, ["PLAY", "amazing_cats_video_id"]),
+             (3.0, ["STOP"])]
+    results = replay(trace, VideoPlayer(), speed=2, clock=lambda: now[0],
+                     sleep=sleep)
+    assert sleeps == [0.5, 1.0]
+    assert results["commands"] == 3
+    assert results["seconds"] == 1.5
+
+
+def test_replay_as_fast_as_possible_reports_every_verb(capfd):
+    trace = [(0.0, ["PLAY", "amazing_cats_video_id"]),
+             (0.0, ["play", "life_at_google_video_id"]),
+             (0.0, ["PLAY"]),
+             (0.0, ["SEARCH_VIDEOS", "cat"]),
+             (0.0, ["NOT_A_COMMAND"]),
+             (60.0, [])]
+    results = replay(trace, VideoPlayer(), speed=None,
+                     sleep=lambda seconds: 1 / 0)
+    assert results["commands"] == 6
+    assert results["max_lag_seconds"] == 0
+    assert set(results["verbs"]) == {"PLAY", "SEARCH_VIDEOS", "UNKNOWN"}
+    play = results["verbs"]["PLAY"]
+    assert (play["calls"], play["errors"]) == (3, 1)
+    assert 0 < play["p50_us"] <= play["p99_us"] <= play["p999_us"]
+    assert play["throughput"] > 0
+    assert capfd.readouterr().out == ""
+
+    print_report(results)
+    lines = capfd.readouterr().out.splitlines()
+    assert lines[0].startswith("6 commands in ")
+    assert lines[1].split() == ["VERB", "CALLS", "ERRORS", "PER_SEC",
+                                "P50_US", "P99_US", "P999_US"]
+    assert lines[2].split()[:3] == ["PLAY", "3", "1"]
@@ -0,0 +1,177 @@
+import zlib
+from unittest import mock
+
+import pytest
+
+from src.playback_scheduler import simulated_duration
+from src.session_manager import SessionManager, estimate_bytes
+from src.video_player import POPULAR_CANDIDATES
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+    return now
+
+
+def _manager(tmp_path, clock, **options):
+    options.setdefault("wall_clock", lambda: clock[0])
+    return SessionManager(tmp_path, clock=lambda: clock[0], **options)
+
+
+def _run(manager, capfd, tenant, *commands):
+    capfd.readouterr()
+    for command in commands:
+        manager.execute(tenant, command.split())
+    return capfd.readouterr().out.splitlines()
+
+
+def test_idle_sessions_are_saved_and_restored(tmp_path, capfd, clock):
+    manager = _manager(tmp_path, clock, max_active=1)
+    _run(manager, capfd, "alice",
+         "CREATE_PLAYLIST Mix",
+         "ADD_TO_PLAYLIST mix amazing_cats_video_id",
+         "ADD_TO_PLAYLIST mix funny_dogs_video_id",
+         "SNAPSHOT_PLAYLIST mix",
+         "REMOVE_FROM_PLAYLIST mix amazing_cats_video_id",
+         "FLAG_VIDEO nothing_video_id dull")
+    assert _run(manager, capfd, "bob", "SHOW_ALL_PLAYLISTS") == [
+        "No playlists exist yet"]
+    assert "alice" not in manager and len(manager) == 1
+    assert len(list(tmp_path.glob("*/*.session"))) == 1
+
+    assert _run(manager, capfd, "alice",
+                "SHOW_PLAYLIST mix",
+                "RESTORE_PLAYLIST mix 1",
+                "SHOW_VIDEO_PLAYLISTS amazing_cats_video_id",
+                "PLAY nothing_video_id") == [
+        "Showing playlist: mix",
+        "Funny Dogs (funny_dogs_video_id) [#dog #animal]",
+        "Restored mix to snapshot 1",
+        "Playlists containing Amazing Cats:",
+        "Mix",
+        "Cannot play video: Video is currently flagged (reason: dull)",
+    ]
+    assert (manager.saves, manager.loads) == (1, 1)
+    # Bob only browsed, so nothing of his is kept.
+    assert "bob" not in manager
+    assert len(list(tmp_path.glob("*/*.session"))) == 1
+
+
+def test_time_passes_while_a_session_is_saved(tmp_path, capfd, clock):
+    manager = _manager(tmp_path, clock, max_active=1)
+    _run(manager, capfd, "alice",
+         "CREATE_PLAYLIST mix",
+         "ADD_TO_PLAYLIST mix amazing_cats_video_id",
+         "ADD_TO_PLAYLIST mix another_cat_video_id",
+         "FLAG_VIDEO funny_dogs_video_id spam 30",
+         "PLAY_PLAYLIST mix")
+    manager.execute("bob", ["PLAY", "nothing_video_id"])
+    clock[0] = simulated_duration("amazing_cats_video_id") + 10
+    assert _run(manager, capfd, "alice",
+                "SHOW_PLAYING", "PLAY funny_dogs_video_id") == [
+        "Currently playing: Another Cat Video (another_cat_video_id) "
+        "[#cat #animal]",
+        "Stopping video: Another Cat Video",
+        "Playing video: Funny Dogs",
+    ]
+    assert _run(manager, capfd, "bob", "SHOW_PLAYING") == [
+        "Currently playing: Video about nothing (nothing_video_id) []"]
+    assert _run(manager, capfd, "bob", "MOST_PLAYED") == [
+        "Most played videos:",
+        "  1. Amazing Cats (amazing_cats_video_id) [#cat #animal] - 1 plays",
+        "  2. Another Cat Video (another_cat_video_id) [#cat #animal] - 1 plays",
+        "  3. Funny Dogs (funny_dogs_video_id) [#dog #animal] - 1 plays",
+        "  4. Video about nothing (nothing_video_id) [] - 1 plays",
+    ]
+
+
+def test_paused_playback_resumes_where_it_stopped(tmp_path, capfd, clock):
+    manager = _manager(tmp_path, clock, max_active=1)
+    _run(manager, capfd, "alice", "PLAY amazing_cats_video_id")
+    clock[0] = 20
+    _run(manager, capfd, "alice", "PAUSE")
+    manager.execute("bob", ["NUMBER_OF_VIDEOS"])
+    clock[0] = 5000
+    assert _run(manager, capfd, "alice", "SHOW_PLAYING") == [
+        "Currently playing: Amazing Cats (amazing_cats_video_id) "
+        "[#cat #animal] - PAUSED"]
+    manager.close()
+    state = next(tmp_path.glob("*/*.session")).read_bytes()
+    assert b'"position":20' in zlib.decompress(state)
+
+
+def test_memory_budget_and_quota(tmp_path, capfd, clock):
+    session = estimate_bytes(0, 0, 0)
+    manager = _manager(tmp_path, clock,
+                       memory_budget=estimate_bytes(1, 3, 0) + session,
+                       quota=estimate_bytes(1, 2, 0))
+    for tenant in ("a", "b", "c"):
+        manager.execute(tenant, ["NUMBER_OF_VIDEOS"])
+    assert len(manager) == 3 and manager.active_bytes() == 3 * session
+    lines = _run(manager, capfd, "a",
+                 "CREATE_PLAYLIST mix",
+                 "BULK_ADD_TO_PLAYLIST mix amazing_cats_video_id "
+                 "funny_dogs_video_id another_cat_video_id",
+                 "ADD_TO_PLAYLIST mix nothing_video_id",
+                 "REMOVE_FROM_PLAYLIST mix funny_dogs_video_id")
+    assert lines[-2:] == [
+        "Cannot add_to_playlist: Session storage quota exceeded",
+        "Removed video from mix: Funny Dogs",
+    ]
+    assert manager.session_bytes("a") == estimate_bytes(1, 2, 0)
+    # The least recently used session was saved to make room.
+    assert list(manager._sessions) == ["c", "a"]
+    assert manager.active_bytes() == estimate_bytes(1, 2, 0) + session
+    manager.execute("b", ["NUMBER_OF_VIDEOS"])
+    assert list(manager._sessions) == ["a", "b"]
+
+
+def test_idle_time_survives_a_restart(tmp_path, capfd, clock):
+    wall = [1_000_000.0]
+    manager = _manager(tmp_path, clock, wall_clock=lambda: wall[0])
+    clock[0] = 50_000
+    _run(manager, capfd, "alice",
+         "FLAG_VIDEO funny_dogs_video_id spam 30",
+         "FLAG_VIDEO amazing_cats_video_id spam 300")
+    manager.close()
+    # The next process starts its monotonic clock again from zero.
+    clock[0] = 0
+    wall[0] += 60
+    manager = _manager(tmp_path, clock, wall_clock=lambda: wall[0])
+    assert _run(manager, capfd, "alice",
+                "PLAY funny_dogs_video_id", "PLAY amazing_cats_video_id") == [
+        "Playing video: Funny Dogs",
+        "Cannot play video: Video is currently flagged (reason: spam)",
+    ]
+
+
+def test_sessions_that_cannot_be_saved_stay_in_memory(tmp_path, capfd, clock):
+    manager = _manager(tmp_path, clock, max_active=1)
+    _run(manager, capfd, "alice", "CREATE_PLAYLIST mix")
+    with mock.patch("src.session_manager.os.replace",
+                    side_effect=OSError("No space left on device")):
+        manager.execute("bob", ["CREATE_PLAYLIST", "jazz"])
+    out, err = capfd.readouterr()
+    assert out == "Successfully created new playlist: jazz\n"
+    assert "Cannot save session of alice: No space left on device" in err
+    assert list(manager._sessions) == ["alice", "bob"]
+    assert list(tmp_path.glob("*/*.tmp")) == []
+
+    manager.execute("bob", ["SHOW_ALL_PLAYLISTS"])
+    assert list(manager._sessions) == ["bob"]
+    assert _run(manager, capfd, "alice", "SHOW_ALL_PLAYLISTS") == [
+        "Showing all playlists:", "mix"]
+
+
+def test_caches_count_towards_the_estimate(tmp_path, capfd, clock):
+    manager = _manager(tmp_path, clock, quota=estimate_bytes(0, 0, 0))
+    _run(manager, capfd, "alice", "SUGGEST a", "PLAY_RANDOM",
+         "PLAY_RANDOM POPULAR")
+    # SUGGEST and PLAY_RANDOM read caches shared by every session; only
+    # the popularity weighted table is the session's own.
+    assert manager.session_bytes("alice") == estimate_bytes(
+        0, 0, 0, POPULAR_CANDIDATES)
+    # Caches are not saved state, so they do not use up the quota.
+    assert _run(manager, capfd, "alice", "CREATE_PLAYLIST mix") == [
+        "Successfully created new playlist: mix"]
@@ -0,0 +1,102 @@
+import threading
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.video_player import VideoPlayer
+from unittest import mock
+
+
+def test_library_has_all_videos():
+    library = SqliteVideoLibrary()
+    assert len(library) == 5
+    assert len(library.get_all_videos()) == 5
+
+
+def test_parses_tags_correctly():
+    library = SqliteVideoLibrary()
+    video = library.get_video("amazing_cats_video_id")
+
+    assert video is not None
+    assert video.title == "Amazing Cats"
+    assert video.video_id == "amazing_cats_video_id"
+    assert video.tags == ("#cat", "#animal")
+
+
+def test_parses_video_correctly_without_tags():
+    library = SqliteVideoLibrary()
+    video = library.get_video("nothing_video_id")
+
+    assert video is not None
+    assert video.title == "Video about nothing"
+    assert video.tags == ()
+
+
+def test_get_video_nonexistent():
+    library = SqliteVideoLibrary()
+    assert library.get_video("does_not_exist") is None
+
+
+def test_search_titles_is_substring_and_case_insensitive():
+    library = SqliteVideoLibrary()
+    ids = [video.video_id for video in library.search_titles("CAT")]
+    assert ids == ["amazing_cats_video_id", "another_cat_video_id"]
+    assert [v.video_id for v in library.search_titles("go")] == [
+        "life_at_google_video_id"]
+    assert library.search_titles("100%") == []
+
+
+def test_get_videos_with_tag():
+    library = SqliteVideoLibrary()
+    ids = [video.video_id for video in library.get_videos_with_tag("#dog")]
+    assert ids == ["funny_dogs_video_id"]
+    assert library.get_videos_with_tag("#unknown") == []
+
+
+def test_reuses_imported_database(tmp_path):
+    db_path = tmp_path / "videos.db"
+    SqliteVideoLibrary(str(db_path))
+    with mock.patch.object(SqliteVideoLibrary, "_import") as do_import:
+        library = SqliteVideoLibrary(str(db_path))
+    do_import.assert_not_called()
+    assert len(library) == 5
+
+
+@mock.patch('builtins.input', lambda *args: 'No')
+def test_player_with_sqlite_backend(capfd):
+    player = VideoPlayer(SqliteVideoLibrary())
+    player.number_of_videos()
+    player.search_videos("cat")
+    player.search_videos_tag("#google")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert "5 videos in the library" in lines[0]
+    assert "1) Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[2]
+    assert "2) Another Cat Video (another_cat_video_id) [#cat #animal]" in lines[3]
+    assert "1) Life at Google (life_at_google_video_id) [#google #career]" in lines[7]
+
+
+def test_threads_share_the_connection(tmp_path):
+    catalogue = tmp_path / "videos.txt"
+    versions = ["".join(f"{name}{i} | v{i} | #x\n" for i in range(200))
+                for name in ("A", "B")]
+    catalogue.write_text(versions[0])
+    library = SqliteVideoLibrary(catalogue_path=catalogue)
+    done = threading.Event()
+    seen = []
+
+    def read():
+        while not done.is_set():
+            titles = {video.title[0] for video in library.get_all_videos()}
+            seen.append(titles)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(20):
+            catalogue.write_text(versions[(i + 1) % 2])
+            library.apply_diff(library.diff_catalogue())
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    # Readers only ever see whole catalogues, never half a reload.
+    assert seen and all(len(titles) == 1 for titles in seen)
@@ -0,0 +1,83 @@
+import random
+from unittest import mock
+
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.session_manager import SessionManager
+from src.title_suggestions import TitleSuggestions
+from src.video import Video
+from src.video_player import VideoPlayer
+
+
+def test_cached_ranking_matches_a_full_sort():
+    rng = random.Random(5)
+    videos = [Video("".join(rng.choice("ab ") for _ in range(rng.randint(1, 5))),
+                    f"v{i}", []) for i in range(300)]
+    plays = {video.video_id: 0 for video in videos}
+    excluded = {video.video_id for video in videos[:40]}
+    suggestions = TitleSuggestions(videos, plays.get, cached=6)
+    for _ in range(2000):
+        video_id = rng.choice(videos).video_id
+        action = rng.random()
+        if action < 0.4:
+            plays[video_id] += 1
+            suggestions.update(video_id)
+        elif action < 0.7:
+            excluded.add(video_id)
+        else:
+            excluded.discard(video_id)
+        prefix = "".join(rng.choice("AB ") for _ in range(rng.randint(0, 3)))
+        expected = sorted(
+            (-plays[video.video_id], video.title.lower(), video.video_id)
+            for video in videos if video.title.lower().startswith(prefix.lower())
+            and video.video_id not in excluded)
+        assert suggestions.suggest(
+            prefix, 4, lambda video_id: video_id not in excluded) == [
+            video_id for _, _, video_id in expected[:4]]
+
+
+def test_sessions_share_one_index_and_skip_their_own_flags(tmp_path, capfd):
+    manager = SessionManager(tmp_path)
+    manager.execute("alice", ["FLAG_VIDEO", "amazing_cats_video_id"])
+    with mock.patch("src.library_caches.TitleSuggestions",
+                    wraps=TitleSuggestions) as build:
+        manager.execute("alice", ["SUGGEST", "a"])
+        manager.execute("bob", ["SUGGEST", "a"])
+    assert build.call_count == 1
+    assert capfd.readouterr().out.splitlines()[1:] == [
+        "Suggestions for a:",
+        "  1. Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "Suggestions for a:",
+        "  1. Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "  2. Another Cat Video (another_cat_video_id) [#cat #animal]",
+    ]
+
+
+def test_suggest_ranks_played_then_alphabetical(capfd):
+    player = VideoPlayer()
+    parser = CommandParser(player)
+    parser.execute_command(["SUGGEST", "a"])
+    parser.execute_command(["PLAY", "another_cat_video_id"])
+    parser.execute_command(["SUGGEST", "A"])
+    player.flag_video("another_cat_video_id")
+    parser.execute_command(["SUGGEST", "a"])
+    parser.execute_command(["SUGGEST", "video", "about"])
+    parser.execute_command(["SUGGEST", "zebra"])
+    assert capfd.readouterr().out.splitlines() == [
+        "Suggestions for a:",
+        "  1. Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "  2. Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "Playing video: Another Cat Video",
+        "Suggestions for A:",
+        "  1. Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "  2. Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "Successfully flagged video: Another Cat Video (reason: Not supplied)",
+        "Suggestions for a:",
+        "  1. Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "Suggestions for video about:",
+        "  1. Video about nothing (nothing_video_id) []",
+        "No suggestions for zebra",
+    ]
+    with pytest.raises(CommandException):
+        parser.execute_command(["SUGGEST"])
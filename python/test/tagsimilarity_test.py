@@ -0,0 +1,130 @@
+import io
+import threading
+from unittest import mock
+
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.library_loader import LibraryLoader
+from src.sqlite_video_library import SqliteVideoLibrary
+from src.tag_similarity import TagSimilarityIndex
+from src.video import Video
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def _index(*tag_lists):
+    return TagSimilarityIndex(
+        Video(f"Video {i}", f"v{i}", tags) for i, tags in enumerate(tag_lists))
+
+
+def test_rare_shared_tags_rank_first():
+    index = _index(["#common", "#rare"], ["#common"], ["#rare"],
+                   ["#common", "#rare"], ["#common"], [])
+    assert [video_id for video_id, _ in index.similar("v0", 5)] == [
+        "v3", "v2", "v1", "v4"]
+    scores = dict(index.similar("v0", 5))
+    assert scores["v3"] > scores["v2"] > scores["v1"] == scores["v4"] > 0
+    assert index.similar("v0", 2, lambda video_id: video_id != "v3") == [
+        ("v2", scores["v2"]), ("v1", scores["v1"])]
+    assert index.similar("v5", 3) == []
+    assert index.similar("missing", 3) == []
+
+
+def test_common_tags_only_refine_the_candidates():
+    index = _index(*([["#common"]] * 50 + [["#common", "#rare"]] * 3))
+    index.SCAN_LIMIT = 10
+    # The rare tag's postings fit the limit, the common tag's do not.
+    assert [video_id for video_id, _ in index.similar("v50", 5)] == [
+        "v51", "v52"]
+    assert index.similar("v0", 3)[0][1] == pytest.approx(1.0)
+
+
+def test_recommend_and_play_similar(capfd):
+    player = VideoPlayer()
+    parser = CommandParser(player)
+    parser.execute_command(["RECOMMEND", "amazing_cats_video_id"])
+    parser.execute_command(["PLAY_SIMILAR"])
+    parser.execute_command(["PLAY", "amazing_cats_video_id"])
+    parser.execute_command(["PLAY_SIMILAR"])
+    player.flag_video("amazing_cats_video_id")
+    parser.execute_command(["RECOMMEND", "another_cat_video_id", "1"])
+    parser.execute_command(["RECOMMEND", "nothing_video_id"])
+    parser.execute_command(["RECOMMEND", "missing_video_id"])
+    lines = capfd.readouterr().out.splitlines()
+    assert lines == [
+        "Videos similar to Amazing Cats:",
+        "  1. Another Cat Video (another_cat_video_id) [#cat #animal] - "
+        "similarity 1.00",
+        "  2. Funny Dogs (funny_dogs_video_id) [#dog #animal] - similarity 0.30",
+        "Cannot play similar video: No video is currently playing",
+        "Playing video: Amazing Cats",
+        "Stopping video: Amazing Cats",
+        "Playing video: Another Cat Video",
+        "Successfully flagged video: Amazing Cats (reason: Not supplied)",
+        "Videos similar to Another Cat Video:",
+        "  1. Funny Dogs (funny_dogs_video_id) [#dog #animal] - similarity 0.30",
+        "No videos similar to Video about nothing",
+        "Cannot recommend videos: Video does not exist",
+    ]
+    with pytest.raises(CommandException):
+        parser.execute_command(["RECOMMEND", "amazing_cats_video_id", "0"])
+
+
+@pytest.mark.parametrize("make_library", [
+    lambda path: VideoLibrary(path),
+    lambda path: SqliteVideoLibrary(catalogue_path=path),
+])
+def test_index_follows_reloads(tmp_path, make_library):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("A | a_id | #x\nB | b_id | #x\nC | c_id | #y\n")
+    library = make_library(catalogue)
+    assert library.similar_videos("a_id", 5) == [("b_id", pytest.approx(1.0))]
+    catalogue.write_text("A | a_id | #x\nB | b_id | #y\nC | c_id | #x\n")
+    library.apply_diff(library.diff_catalogue())
+    assert library.similar_videos("a_id", 5) == [("c_id", pytest.approx(1.0))]
+
+
+def test_index_is_built_on_the_loading_thread(tmp_path):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("A | a_id | #x\nB | b_id | #x\n")
+    built_on = []
+
+    def build(videos):
+        built_on.append(threading.current_thread().name)
+        return TagSimilarityIndex(videos)
+
+    with mock.patch("src.video_library.TagSimilarityIndex", build):
+        loader = LibraryLoader(lambda progress: VideoLibrary(catalogue))
+        loader.wait(file=io.StringIO())
+        assert loader.similar_videos("a_id", 5) == [
+            ("b_id", pytest.approx(1.0))]
+    assert built_on == ["library-loader"]
+
+
+def test_index_from_tag_rows_matches_videos():
+    tag_lists = [["#a", "#b"], ["#b"], [], ["#a", "#b", "#a"], ["#c", "#b"]]
+    rows = [(f"v{i}", tag) for i, tags in enumerate(tag_lists)
+            for tag in tags or [None]]
+    from_rows = TagSimilarityIndex.from_tag_rows(iter(rows))
+    from_videos = _index(*tag_lists)
+    for i in range(len(tag_lists)):
+        assert from_rows.similar(f"v{i}", 5) == from_videos.similar(f"v{i}", 5)
+
+
+def test_sqlite_index_is_streamed_on_first_use(tmp_path):
+    catalogue = tmp_path / "videos.txt"
+    catalogue.write_text("A | a_id | #x\nB | b_id | #x\nC | c_id |\n")
+    SqliteVideoLibrary(tmp_path / "videos.db", catalogue)
+    with mock.patch.object(SqliteVideoLibrary, "get_all_videos") as get_all, \
+            mock.patch.object(TagSimilarityIndex, "_build",
+                              autospec=True,
+                              side_effect=TagSimilarityIndex._build) as build:
+        library = SqliteVideoLibrary(tmp_path / "videos.db", catalogue)
+        assert not build.called
+        assert library.similar_videos("a_id", 5) == [
+            ("b_id", pytest.approx(1.0))]
+        assert library.similar_videos("b_id", 5) == [
+            ("a_id", pytest.approx(1.0))]
+    assert build.call_count == 1
+    assert not get_all.called
@@ -0,0 +1,79 @@
+import random
+
+from src.timer_wheel import TimerWheel
+
+
+def test_expires_timers_at_their_deadline():
+    rng = random.Random(3)
+    wheel = TimerWheel(slots=4, levels=3)
+    deadlines = {key: rng.uniform(0, 200) for key in range(300)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    cancelled = set(range(0, 300, 7))
+    for key in cancelled:
+        wheel.cancel(key)
+
+    now = 0
+    while now < 210:
+        now += rng.uniform(0, 5)
+        for key in wheel.advance(now):
+            assert key not in cancelled
+            assert deadlines.pop(key) <= now
+        assert all(deadline > now - 1 for key, deadline in deadlines.items()
+                   if key not in cancelled)
+    assert set(deadlines) == cancelled
+    assert len(wheel) == 0
+
+
+def test_reschedule_and_past_deadlines():
+    wheel = TimerWheel(start=100)
+    wheel.schedule("a", 150)
+    wheel.schedule("a", 120)
+    wheel.schedule("b", 50)
+
+    assert "a" in wheel
+    assert wheel.advance(100) == ["b"]
+    assert wheel.advance(119) == []
+    assert wheel.advance(120) == ["a"]
+    assert "a" not in wheel
+
+
+def test_reports_deadlines_of_pending_timers():
+    wheel = TimerWheel(resolution=0.5, slots=4, levels=2)
+    wheel.schedule("soon", 1.2)
+    wheel.schedule("later", 40)
+    wheel.schedule("past", -1)
+    assert wheel.deadline("soon") == 1.5
+    assert wheel.deadline("later") == 40
+    assert wheel.deadline("past") == -1
+    assert wheel.deadline("missing") is None
+    wheel.advance(2)
+    assert wheel.deadline("soon") is None
+    assert wheel.deadline("later") == 40
+
+
+def test_long_idle_periods_are_jumped_over():
+    wheel = TimerWheel(resolution=1, slots=64, levels=4)
+    month = 30 * 24 * 3600
+    wheel.schedule("month", month)
+    wheel.schedule("hour", 3600)
+    steps = []
+    next_event = wheel._next_event
+
+    def counted(limit):
+        steps.append(limit)
+        return next_event(limit)
+
+    wheel._next_event = counted
+    assert wheel.advance(month - 1) == ["hour"]
+    assert wheel.advance(month) == ["month"]
+    assert len(steps) < 100
+
+
+def test_single_wheel_holds_timers_a_turn_ahead():
+    wheel = TimerWheel(resolution=1, slots=8, levels=1)
+    wheel.schedule("far", 21)
+    wheel.schedule("near", 5)
+    assert wheel.advance(13) == ["near"]
+    assert wheel.advance(20) == []
+    assert wheel.advance(21) == ["far"]
@@ -1,4 +1,11 @@
-from src.video_library import VideoLibrary
+import random
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from src.video_library import DEFAULT_CATALOGUE, VideoLibrary
 
 
 def test_library_has_all_videos():
@@ -24,3 +31,35 @@ def test_parses_video_correctly_without_tags():
     assert video.title == "Video about nothing"
     assert video.video_id == "nothing_video_id"
     assert video.tags == ()
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, lzma.compress, bz2.compress])
+def test_reads_compressed_catalogue(tmp_path, compress):
+    catalogue = tmp_path / "videos.txt.z"
+    catalogue.write_bytes(compress(DEFAULT_CATALOGUE.read_bytes()))
+    library = VideoLibrary(catalogue)
+
+    assert len(library.get_all_videos()) == 5
+    assert library.get_video("funny_dogs_video_id").tags == ("#dog", "#animal")
+
+
+def test_search_titles_matches_a_scan_across_reloads(tmp_path):
+    rng = random.Random(5)
+    words = ["cat", "Dog", "ab", "x", "catalogue", "dogma", "A", "tab"]
+
+    def write_catalogue(count):
+        catalogue.write_text("".join(
+            f"{' '.join(rng.choices(words, k=rng.randint(1, 3)))} | v{i} |\n"
+            for i in rng.sample(range(count * 2), count)))
+
+    catalogue = tmp_path / "videos.txt"
+    write_catalogue(200)
+    library = VideoLibrary(catalogue)
+    for _ in range(3):
+        for term in ["cat", "CAT", "og", "a", "b c", "atal", "x", "zzz", ""]:
+            expected = {video.video_id for video in library.get_all_videos()
+                        if term.lower() in video.title.lower()}
+            found = [video.video_id for video in library.search_titles(term)]
+            assert len(found) == len(expected) and set(found) == expected
+        write_catalogue(200)
+        library.apply_diff(library.diff_catalogue())